@@ -0,0 +1,70 @@
+import os
+import tempfile
+import time
+
+import click
+import numpy as np
+
+from sknlp.data import (
+    SimpleIndexedRecordIO, BlockCompressedRecordIO, RecordFileDataset
+)
+
+
+def _copy_records(src, idx_path, rec_path, **kwargs):
+    if os.path.splitext(rec_path)[1] == '.crec':
+        writer = BlockCompressedRecordIO(idx_path, rec_path, 'w', **kwargs)
+    else:
+        writer = SimpleIndexedRecordIO(idx_path, rec_path, 'w')
+    for i in range(len(src)):
+        writer.write(src[i].encode('utf-8'))
+    writer.close()
+
+
+def _epoch_time(dataset, batch_size, shuffle):
+    indices = np.arange(len(dataset))
+    if shuffle:
+        np.random.shuffle(indices)
+    start = time.time()
+    for i in range(0, len(indices), batch_size):
+        dataset.read_batch(indices[i:i + batch_size])
+    return time.time() - start
+
+
+@click.command()
+@click.argument('rec_file')
+@click.option('--batch-size', default=64, help='每批读取的记录数')
+@click.option('--block-size', default=256, help='每个压缩块的记录数')
+@click.option('--n-epochs', default=3, help='测试的轮数')
+def benchmark(rec_file, batch_size, block_size, n_epochs):
+    """
+    比较``REC_FILE``在不同存储格式下的磁盘占用和每轮读取时间.
+
+    顺序读取对应不打乱的预测, 随机读取对应训练时的打乱.
+    """
+    src = RecordFileDataset(rec_file)
+    formats = [('rec', '.rec', {})] + [
+        (compression, '.crec',
+         {'compression': compression, 'block_size': block_size})
+        for compression in ('zlib', 'lzma')
+    ]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, ext, kwargs in formats:
+            idx_path = os.path.join(temp_dir, f'{name}.idx')
+            rec_path = os.path.join(temp_dir, f'{name}{ext}')
+            _copy_records(src, idx_path, rec_path, **kwargs)
+            size = os.path.getsize(rec_path) + os.path.getsize(idx_path)
+            dataset = RecordFileDataset(rec_path)
+            for shuffle in (False, True):
+                seconds = np.mean([
+                    _epoch_time(dataset, batch_size, shuffle)
+                    for _ in range(n_epochs)
+                ])
+                click.echo(
+                    f'{name:5} {"random" if shuffle else "sequential":10} '
+                    f'size: {size / 2 ** 20:.2f}MB, '
+                    f'epoch time: {seconds:.3f}s'
+                )
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -1,26 +1,34 @@
+import csv
+import json
+import multiprocessing
 import os
+import random
+from typing import (
+    IO, Callable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+)
 
 import click
-import numpy as np
-import pandas as pd
 
-from sknlp.dataset import SimpleIndexedRecordIO
+from sknlp.data import (
+    SimpleIndexedRecordIO, BlockCompressedRecordIO, RecordFileDataset
+)
+
+
+# 全角转半角: 全角空格转为空格, 其他全角字符根据与半角字符的偏移转化
+W2N_TABLE = str.maketrans({
+    12288: 32, **{code: code - 65248 for code in range(65281, 65375)}
+})
 
 
 def str_w2n(wide_str):
     """
     全角转半角
     """
-    chars = []
-    for uchar in wide_str:
-        inside_code = ord(uchar)
-        if inside_code == 12288:  # 全角空格直接转换
-            inside_code = 32
-        elif (inside_code >= 65281 and inside_code <= 65374):
-            # 全角字符（除空格）根据关系转化
-            inside_code -= 65248
-        chars.append(chr(inside_code))
-    return ''.join(chars)
+    return wide_str.translate(W2N_TABLE)
+
+
+def _clean(text):
+    return str_w2n(text).replace('\t', ' ')
 
 
 def _create_tags(length, suffix):
@@ -34,70 +42,303 @@ def _create_tags(length, suffix):
     return tags
 
 
-def msra2rec(file_dir):
-    for data_type in ('test', 'train'):
-        filename = os.path.join(file_dir, f'{data_type}.txt')
-        idx = os.path.join(file_dir, f'{data_type}.idx')
-        rec = os.path.join(file_dir, f'{data_type}.rec')
-
-        dataset = SimpleIndexedRecordIO(idx, rec, 'w')
-        dataset.open()
-        with open(filename) as f:
-            for line in f:
-                texts = []
-                tags = []
-                for cell in line.split():
-                    text, tag = cell.split('/')
-                    tag = tag.upper()
-                    texts.append(str_w2n(text).replace('\t', ' '))
-                    tags.append('|'.join(_create_tags(len(text), tag)))
-                r = '\t'.join([''.join(texts), '|'.join(tags)]).encode('utf-8')
-                dataset.write(r)
-        dataset.close()
-
-
-def waimai2rec(file_dir):
-    filename = 'waimai_10k.csv'
-    df = pd.read_csv(os.path.join(file_dir, filename), dtype=str)
-    df.fillna('', inplace=True)
-    size = df.shape[0]
-    idx = np.random.permutation(size)
-
-    train_size = int(size * 0.7)
-    train = df.loc[idx[:train_size]]
-    test = df.loc[idx[train_size:]]
-    data = {'train': train, 'test': test}
-    for data_type in ('train', 'test'):
-        idx = os.path.join(file_dir, f'{data_type}.idx')
-        rec = os.path.join(file_dir, f'{data_type}.rec')
-
-        dataset = SimpleIndexedRecordIO(idx, rec, 'w')
-        dataset.open()
-        for i, row in data[data_type].iterrows():
-            dataset.write('\t'.join([
-                str_w2n(row.review).replace('\t', ' '),
-                row.label]).encode('utf-8'))
-        dataset.close()
-
-
-def intent2rec(file_dir):
-    for data_type in ('train', 'test'):
-        df = pd.read_csv(os.path.join(file_dir, f'{data_type}.csv'),
-                         sep='\t', dtype=str)
-        df.fillna('', inplace=True)
-        idx = os.path.join(file_dir, f'{data_type}.idx')
-        rec = os.path.join(file_dir, f'{data_type}.rec')
-
-        dataset = SimpleIndexedRecordIO(idx, rec, 'w')
-        dataset.open()
-        for i, row in df.iterrows():
-            intent = row.intent
-            if intent == 'nonsense':
-                intent = ''
-            dataset.write('\t'.join([
-                str_w2n(row.text).replace('\t', ' '), intent]).encode('utf-8'))
-        dataset.close()
+def msra_record(line):
+    texts = []
+    tags = []
+    for cell in line.split():
+        text, tag = cell.rsplit('/', 1)
+        tag = tag.upper()
+        texts.append(_clean(text))
+        tags.append('|'.join(_create_tags(len(text), tag)))
+    return '\t'.join([''.join(texts), '|'.join(tags)])
+
+
+def waimai_record(label, review):
+    return '\t'.join([_clean(review), label])
+
+
+def intent_record(text, intent):
+    if intent == 'nonsense':
+        intent = ''
+    return '\t'.join([_clean(text), intent])
+
+
+def tsv_record(line):
+    text, *labels = line.split('\t')
+    return '\t'.join([str_w2n(text), *labels])
+
+
+class RecordFormat(NamedTuple):
+    """
+    输入文件格式.
+
+    to_record: 将一条记录转换为输出记录的函数, 按行读取时参数为一行,
+        按csv读取时参数为``columns``对应的各列
+    delimiter: csv的分隔符, 为None时按行读取, 每行一条记录;
+        否则按csv解析, 引号中的字段可以包含换行
+    columns: 按表头中的列名选取的列, 为None时没有表头
+    test_ratio: 默认随机划分到测试集的记录比例
+    """
+    to_record: Callable[..., str]
+    delimiter: Optional[str] = None
+    columns: Optional[Tuple[str, ...]] = None
+    test_ratio: float = 0.0
+
+
+FORMATS = {
+    'msra': RecordFormat(msra_record),
+    # 与原来的waimai2rec一致, 按7:3随机划分训练集和测试集
+    'waimai': RecordFormat(waimai_record, ',', ('label', 'review'), 0.3),
+    'intent': RecordFormat(intent_record, '\t', ('text', 'intent')),
+    'tsv': RecordFormat(tsv_record)
+}
+
+
+def _record_ends(f: IO[bytes], delimiter: Optional[str]) -> Iterator[int]:
+    """
+    从``f``的当前位置依次读取记录, 返回每条记录结束(即下一条记录开始)的位置.
+    """
+    if delimiter is None:
+        for _ in iter(f.readline, b''):
+            yield f.tell()
+        return
+    position = f.tell()
+
+    def lines():
+        nonlocal position
+        for line in iter(f.readline, b''):
+            position = f.tell()
+            yield line.decode('utf-8')
+
+    # csv.reader只在记录未结束时读取下一行, 读出一条记录时position为记录的结束位置
+    for _ in csv.reader(lines(), delimiter=delimiter):
+        yield position
+
+
+def split_file(
+    filename: str, num_shards: int, delimiter: Optional[str] = None,
+    header: bool = False
+) -> List[Tuple[int, int]]:
+    """
+    将文件按字节数大致均分为``num_shards``个范围, 范围的边界都是记录的起始位置.
+
+    按行读取时, 边界移动到下一行的行首.
+    csv格式的记录可能跨行, 边界不能只看换行符, 需要顺序解析一遍文件得到.
+    有表头时, 第一个范围从表头之后开始.
+    """
+    size = os.path.getsize(filename)
+    targets = [size * i // num_shards for i in range(1, num_shards)]
+    with open(filename, 'rb') as f:
+        ends = _record_ends(f, delimiter)
+        bounds = [next(ends, size) if header else 0]
+        for target in targets:
+            position = bounds[-1]
+            if delimiter is None and target > position:
+                f.seek(target - 1)
+                # 前一个字节是换行符时, target就是行首
+                f.readline()
+                position = f.tell()
+            while position < target:
+                position = next(ends, size)
+            bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def read_lines(filename: str, start: int, end: int) -> Iterator[str]:
+    """
+    读取``[start, end)``范围内的行(包括换行符),
+    ``start``和``end``需要是``split_file``得到的记录边界.
+    """
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                return
+            yield line.decode('utf-8')
+
+
+def read_columns(
+    filename: str, delimiter: str, columns: Sequence[str]
+) -> List[int]:
+    """
+    按表头中的列名查找``columns``的下标, 表头中没有的列抛出ValueError.
+    """
+    with open(filename, encoding='utf-8-sig', newline='') as f:
+        header = next(csv.reader(f, delimiter=delimiter), [])
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f'{filename} has no column {", ".join(missing)}')
+    return [header.index(column) for column in columns]
+
+
+def read_records(
+    filename: str, fmt: str, start: int, end: int,
+    column_indices: Optional[Sequence[int]] = None
+) -> Iterator[str]:
+    """
+    读取``[start, end)``范围内的记录并转换为输出记录, 跳过空行.
+    csv格式的记录缺少的列为空字符串.
+    """
+    record_format = FORMATS[fmt]
+    lines = read_lines(filename, start, end)
+    if record_format.delimiter is None:
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if line:
+                yield record_format.to_record(line)
+        return
+    for row in csv.reader(lines, delimiter=record_format.delimiter):
+        if row:
+            yield record_format.to_record(*(
+                row[i] if i < len(row) else '' for i in column_indices
+            ))
+
+
+def shard_name(prefix: str, shard: int, num_shards: int, ext: str) -> str:
+    return f'{prefix}-{shard:05}-of-{num_shards:05}{ext}'
+
+
+def convert_shard(task) -> List[Tuple[str, int]]:
+    """
+    转换一个分片, 返回各输出(训练集, 测试集)的文件名和记录数.
+
+    ``test_ratio > 0``时有两个输出, 每条记录以``test_ratio``的概率
+    写入测试集, 随机数种子由``seed``决定, 重新运行时划分不变.
+    分片先写入临时文件, 完成后重命名, 已经存在的分片直接跳过,
+    所以中断后重新运行只转换未完成的分片.
+    """
+    (
+        filename, fmt, start, end, outputs, compression, column_indices,
+        test_ratio, seed
+    ) = task
+    if all(
+        os.path.exists(rec_path) and os.path.exists(idx_path)
+        for rec_path, idx_path in outputs
+    ):
+        return [
+            (rec_path, RecordFileDataset.count(rec_path))
+            for rec_path, _ in outputs
+        ]
+
+    writers = []
+    for rec_path, idx_path in outputs:
+        tmp_rec, tmp_idx = rec_path + '.tmp', idx_path + '.tmp'
+        if compression is None:
+            writers.append(SimpleIndexedRecordIO(tmp_idx, tmp_rec, 'w'))
+        else:
+            writers.append(BlockCompressedRecordIO(
+                tmp_idx, tmp_rec, 'w', compression=compression
+            ))
+    rng = random.Random(seed)
+    counts = [0] * len(writers)
+    for record in read_records(filename, fmt, start, end, column_indices):
+        split = int(len(writers) > 1 and rng.random() < test_ratio)
+        writers[split].write(record.encode('utf-8'))
+        counts[split] += 1
+    for writer, (rec_path, idx_path) in zip(writers, outputs):
+        writer.close()
+        # 索引最后重命名, 索引存在即说明分片已完整写入
+        os.replace(rec_path + '.tmp', rec_path)
+        os.replace(idx_path + '.tmp', idx_path)
+    return [(rec_path, count) for (rec_path, _), count in zip(outputs, counts)]
+
+
+def write_manifest(
+    manifest_path: str, shards: List[Tuple[str, int]]
+) -> None:
+    """
+    写入全局索引, 记录每个分片的文件名(相对路径), 记录数和全局起始下标.
+    """
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    entries, start = [], 0
+    for rec_path, count in shards:
+        entries.append({
+            'file': os.path.relpath(os.path.abspath(rec_path), directory),
+            'count': count,
+            'start': start
+        })
+        start += count
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(json.dumps({'count': start, 'shards': entries}, indent=2))
+    os.replace(tmp_path, manifest_path)
+
+
+@click.command()
+@click.argument('input_file', type=click.Path(exists=True, dir_okay=False))
+@click.argument('output_prefix')
+@click.option(
+    '--format', 'fmt', type=click.Choice(sorted(FORMATS)), default='tsv',
+    help='输入文件格式'
+)
+@click.option('--num-shards', default=1, help='输出的分片数')
+@click.option('--n-jobs', default=os.cpu_count(), help='并行转换的进程数')
+@click.option(
+    '--compression', type=click.Choice(['zlib', 'lzma']), default=None,
+    help='输出块压缩的.crec文件'
+)
+@click.option(
+    '--test-ratio', type=float, default=None,
+    help='随机划分到测试集的记录比例, 默认由格式决定(waimai为0.3, 其他为0)'
+)
+@click.option('--seed', default=0, help='划分测试集的随机数种子')
+def raw2rec(
+    input_file, output_prefix, fmt, num_shards, n_jobs, compression,
+    test_ratio, seed
+):
+    """
+    将INPUT_FILE并行转换为OUTPUT_PREFIX-xxxxx-of-xxxxx.rec/.idx分片,
+    并写入全局索引OUTPUT_PREFIX.manifest.json.
+
+    每条记录转换为一条输出记录, 文本做全角转半角.
+    waimai和intent是有表头的csv/tsv文件, 按列名读取, 字段可以包含换行.
+    划分测试集时, 训练集和测试集分别输出为OUTPUT_PREFIX-train和
+    OUTPUT_PREFIX-test前缀的分片和全局索引.
+    中断后重新运行会跳过已完成的分片.
+    """
+    record_format = FORMATS[fmt]
+    if test_ratio is None:
+        test_ratio = record_format.test_ratio
+    column_indices = None
+    if record_format.columns is not None:
+        column_indices = read_columns(
+            input_file, record_format.delimiter, record_format.columns
+        )
+    prefixes = [output_prefix]
+    if test_ratio > 0:
+        prefixes = [f'{output_prefix}-train', f'{output_prefix}-test']
+    output_dir = os.path.dirname(output_prefix)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    ext = '.rec' if compression is None else '.crec'
+    tasks = [
+        (
+            input_file, fmt, start, end,
+            [
+                (
+                    shard_name(prefix, shard, num_shards, ext),
+                    shard_name(prefix, shard, num_shards, '.idx')
+                )
+                for prefix in prefixes
+            ],
+            compression, column_indices, test_ratio, f'{seed}:{shard}'
+        )
+        for shard, (start, end) in enumerate(split_file(
+            input_file, num_shards, record_format.delimiter,
+            header=record_format.columns is not None
+        ))
+    ]
+    shards = [[] for _ in prefixes]
+    with multiprocessing.Pool(max(1, min(n_jobs, num_shards))) as pool:
+        for outputs in pool.imap(convert_shard, tasks):
+            for split, (rec_path, count) in enumerate(outputs):
+                click.echo(f'{rec_path}: {count} records')
+                shards[split].append((rec_path, count))
+    for prefix, split_shards in zip(prefixes, shards):
+        write_manifest(f'{prefix}.manifest.json', split_shards)
 
 
 if __name__ == '__main__':
-    intent2rec('datasets/intent')
+    raw2rec()
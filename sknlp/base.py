@@ -8,7 +8,7 @@ except ImportError:
     hvd = None
 
 from .data import NLPDataset
-from .data.sampler import BatchSampler
+from .data.sampler import BatchSampler, StreamBatchSampler
 from .data.dataloader import PrefetchDataLoader, DataLoader
 
 logger = logging.getLogger(__name__)
@@ -194,13 +194,27 @@ class BaseModel:
     def _build_dataloader(
         self, dataset, batch_size, shuffle=True, last_batch='keep'
     ):
-        batch_sampler = BatchSampler(
-            dataset, batch_size,
-            sampler='bucket' if shuffle else 'sequential',
-            last_batch=last_batch, batchify_fn=self._batchify_fn(),
-            num_parts=1 if hvd is None else hvd.size(),
-            part_index=0 if hvd is None else hvd.rank()
-        )
+        num_parts = 1 if hvd is None else hvd.size()
+        part_index = 0 if hvd is None else hvd.rank()
+        if num_parts > 1 and getattr(dataset, 'is_sharded', False):
+            # 整个分片分配给各进程, 每个进程只读取自己的文件
+            dataset = dataset.shard(num_parts, part_index)
+            num_parts, part_index = 1, 0
+        if getattr(dataset, 'is_streaming', False):
+            batch_sampler = StreamBatchSampler(
+                dataset, batch_size,
+                buffer_size=dataset.shuffle_buffer_size if shuffle else None,
+                shuffle=shuffle, last_batch=last_batch,
+                batchify_fn=self._batchify_fn(),
+                num_parts=num_parts, part_index=part_index
+            )
+        else:
+            batch_sampler = BatchSampler(
+                dataset, batch_size,
+                sampler='bucket' if shuffle else 'sequential',
+                last_batch=last_batch, batchify_fn=self._batchify_fn(),
+                num_parts=num_parts, part_index=part_index
+            )
         if self._prefetch > 0:
             return PrefetchDataLoader(batch_sampler, batch_size)
         else:
@@ -216,10 +230,32 @@ class BaseModel:
 
 class DeepSupervisedModel(BaseModel):
 
-    def __init__(self, vocab=None, label2idx=None, **kwargs):
+    # 由X, y构建的验证和评估数据集缓存预处理后样本的字节数,
+    # 每轮验证和score中的第二次遍历不再重复预处理
+    EVAL_CACHE_BYTES = 256 * 1024 * 1024
+
+    def __init__(
+        self, vocab=None, label2idx=None, max_vocab_size=None, min_freq=1,
+        num_oov_buckets=0, n_jobs=1, **kwargs
+    ):
+        """
+        max_vocab_size, min_freq, num_oov_buckets:
+          Budget of the vocab built from the training data, see
+          `NLPDataset`. Out-of-vocabulary tokens are hashed into
+          `num_oov_buckets` extra embedding rows instead of `<unk>`.
+        n_jobs:
+          Number of processes used to scan and segment the datasets built
+          from X, y, see `Segmenter.cut_batch`.
+        """
         super().__init__(**kwargs)
         self._vocab = vocab
+        self._n_jobs = n_jobs
         self._label2idx = label2idx
+        self._vocab_options = {
+            'max_vocab_size': max_vocab_size,
+            'min_freq': min_freq,
+            'num_oov_buckets': num_oov_buckets
+        }
         self._loss = None
         self.meta = dict()
 
@@ -229,7 +265,10 @@ class DeepSupervisedModel(BaseModel):
         """
         raise NotImplementedError('build is not implemented.')
 
-    def _get_or_build_dataset(self, dataset, X, y):
+    def _get_or_build_dataset(
+        self, dataset, X, y, sample_cache_bytes=None, cache_dir=None,
+        n_jobs=None
+    ):
         """
         Implement this function to build dataset.
         """
@@ -241,7 +280,7 @@ class DeepSupervisedModel(BaseModel):
         last_batch='keep', n_epochs=15, optimizer='adam', lr=1e-3,
         lr_update_factor: float = 0.9, lr_update_epochs: int = 5,
         clip=5.0, checkpoint=None, save_frequency=1,
-        prefetch=0, multigpu=False,
+        prefetch=0, multigpu=False, cache_dir=None,
     ):
         """
         Fit model.
@@ -268,9 +307,15 @@ class DeepSupervisedModel(BaseModel):
           If not None, save model using `checkpoint` as prefix.
         save_frequency: int
           If checkpoint is not None, save model every `save_frequency` epochs.
+        cache_dir: str
+          If not None, preprocessing results of `X, y` and `valid_X, valid_y`
+          (vocab, label2idx, lengths and token ids) are cached under
+          `cache_dir` and reused by later runs on the same data.
         """
         self._prefetch = prefetch
-        train_dataset = self._get_or_build_dataset(train_dataset, X, y)
+        train_dataset = self._get_or_build_dataset(
+            train_dataset, X, y, cache_dir=cache_dir
+        )
 
         if self._vocab is None:
             self._vocab = train_dataset._vocab
@@ -282,7 +327,8 @@ class DeepSupervisedModel(BaseModel):
 
         if valid_X and valid_y and valid_dataset is None:
             valid_dataset = self._get_or_build_dataset(
-                valid_dataset, valid_X, valid_y
+                valid_dataset, valid_X, valid_y,
+                sample_cache_bytes=self.EVAL_CACHE_BYTES, cache_dir=cache_dir
             )
 
         dataloader = self._build_dataloader(
@@ -0,0 +1,159 @@
+from collections import Counter, defaultdict
+import functools
+import heapq
+import re
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+
+# 预切分: 连续的字母/数字/汉字为一段, 其他非空白字符单独成段,
+# 合并不会跨越段的边界
+PRETOKENIZE_PATTERN = re.compile(r'\w+|\S')
+
+
+def pretokenize(text: str) -> List[str]:
+    return PRETOKENIZE_PATTERN.findall(text)
+
+
+def _merge_word(
+    word: Tuple[str, ...], pair: Tuple[str, str], new_token: str
+) -> Tuple[str, ...]:
+    merged = []
+    i = 0
+    while i < len(word):
+        if (i < len(word) - 1 and word[i] == pair[0]
+                and word[i + 1] == pair[1]):
+            merged.append(new_token)
+            i += 2
+        else:
+            merged.append(word[i])
+            i += 1
+    return tuple(merged)
+
+
+class BPE:
+    """
+    Byte-pair encoding子词切分.
+
+    文本先按``PRETOKENIZE_PATTERN``预切分, 每段从单个字符开始,
+    按训练得到的顺序依次合并相邻的子词, 合并不跨越段的边界.
+    每段的切分结果保存在有界的LRU缓存中, 语料中反复出现的段只需计算一次.
+
+    Parameters
+    ----------
+    merges: ``Sequence[Tuple[str, str]]``
+        按优先级排列的合并规则
+    cache_size: ``int``
+        缓存的段数
+    """
+
+    def __init__(
+        self, merges: Sequence[Tuple[str, str]], cache_size: int = 100000
+    ) -> None:
+        self.merges = [tuple(pair) for pair in merges]
+        self.cache_size = cache_size
+        self._ranks: Dict[Tuple[str, str], int] = {
+            pair: rank for rank, pair in enumerate(self.merges)
+        }
+        self._encode_word = functools.lru_cache(maxsize=cache_size)(
+            self._bpe
+        )
+
+    def __getstate__(self):
+        return {'merges': self.merges, 'cache_size': self.cache_size}
+
+    def __setstate__(self, d):
+        self.__init__(d['merges'], cache_size=d['cache_size'])
+
+    @classmethod
+    def train(
+        cls, texts: Iterable[str], vocab_size: int, min_freq: int = 2,
+        cache_size: int = 100000
+    ) -> 'BPE':
+        """
+        从语料训练合并规则.
+
+        Parameters
+        ----------
+        texts: ``Iterable[str]``
+            训练语料
+        vocab_size: ``int``
+            目标子词表大小, 包括语料中出现的所有字符
+        min_freq: ``int``
+            合并的相邻子词对的最小频率, 最高频的子词对低于该频率时提前停止
+        cache_size: ``int``
+            见``BPE``
+        """
+        counter: Counter = Counter()
+        for text in texts:
+            counter.update(pretokenize(text))
+        words = [tuple(word) for word in counter]
+        freqs = list(counter.values())
+        alphabet = {char for word in words for char in word}
+
+        pair_counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        where = defaultdict(set)
+        for i, word in enumerate(words):
+            for pair in zip(word, word[1:]):
+                pair_counts[pair] += freqs[i]
+                where[pair].add(i)
+        # 计数变化后不删除堆中的旧项, 弹出时与当前计数比较
+        heap = [(-count, pair) for pair, count in pair_counts.items()]
+        heapq.heapify(heap)
+
+        merges: List[Tuple[str, str]] = []
+        while heap and len(alphabet) + len(merges) < vocab_size:
+            count, pair = heapq.heappop(heap)
+            current = pair_counts.get(pair, 0)
+            if -count != current:
+                if current > 0:
+                    heapq.heappush(heap, (-current, pair))
+                continue
+            if current < min_freq:
+                break
+            merges.append(pair)
+            new_token = pair[0] + pair[1]
+            changed = set()
+            for i in where.pop(pair):
+                word = words[i]
+                for p in zip(word, word[1:]):
+                    pair_counts[p] -= freqs[i]
+                word = _merge_word(word, pair, new_token)
+                for p in zip(word, word[1:]):
+                    pair_counts[p] += freqs[i]
+                    where[p].add(i)
+                    changed.add(p)
+                words[i] = word
+            del pair_counts[pair]
+            for p in changed:
+                heapq.heappush(heap, (-pair_counts[p], p))
+        return cls(merges, cache_size=cache_size)
+
+    def _bpe(self, word: str) -> Tuple[str, ...]:
+        symbols = tuple(word)
+        ranks = self._ranks
+        while len(symbols) > 1:
+            pair = min(
+                zip(symbols, symbols[1:]),
+                key=lambda p: ranks.get(p, len(ranks))
+            )
+            if pair not in ranks:
+                break
+            symbols = _merge_word(symbols, pair, pair[0] + pair[1])
+        return symbols
+
+    def encode(self, text: str) -> List[str]:
+        encode_word = self._encode_word
+        return [
+            token for word in pretokenize(text)
+            for token in encode_word(word)
+        ]
+
+    def encode_batch(self, texts: Iterable[str]) -> List[List[str]]:
+        return [self.encode(text) for text in texts]
+
+    def to_config(self) -> Dict[str, List[List[str]]]:
+        return {'merges': [list(pair) for pair in self.merges]}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, List[List[str]]]) -> 'BPE':
+        return cls(config['merges'])
@@ -11,8 +11,8 @@ import gluonnlp
 import numpy as np
 
 from ..base import DeepSupervisedModel
-from ..data import ClassifyDataset, InMemoryDataset
-from ..data.batchify import Pad, Stack
+from ..data import ClassifyDataset, ColumnarDataset
+from ..data.batchify import Pad, MultiHot
 from ..embedding import Token2vec
 from ..encode import TextCNN, TextRCNN, TextRNN
 from ..segmenter import Segmenter
@@ -26,13 +26,13 @@ from .utils import logits2classes, logits2scores, scores2classes
 logger = logging.getLogger(__name__)
 
 
-def batchify(padding, one_batch):
+def batchify(padding, num_classes, one_batch):
     (inputs, length), labels = gluonnlp.data.batchify.Tuple(
-        Pad(axis=0, pad_val=padding, ret_length=True), Stack()
+        Pad(axis=0, pad_val=padding, ret_length=True), MultiHot(num_classes)
     )(one_batch)
     inputs = inputs.transpose((1, 0))
     mask = sequence_mask(np.ones_like(inputs), length.astype('int'))
-    return inputs, mask, labels.astype('float32')
+    return inputs, mask, labels
 
 
 class DeepClassifier(DeepSupervisedModel):
@@ -48,8 +48,10 @@ class DeepClassifier(DeepSupervisedModel):
         self._vocab = vocab
         self._num_classes = num_classes
         self._is_multilabel = is_multilabel
-        self._segmenter = segmenter
-        self._cut = Segmenter(segmenter).cut
+        if not isinstance(segmenter, Segmenter):
+            segmenter = Segmenter(segmenter, vocab=vocab)
+        self._segmenter = segmenter.config
+        self._cut = segmenter.cut
         self._max_length = max_length
         self._embed_size = embed_size
         self._label2idx = label2idx
@@ -59,7 +61,7 @@ class DeepClassifier(DeepSupervisedModel):
             'is_multilabel': is_multilabel,
             'label2idx': label2idx,
             'max_length': max_length,
-            'segmenter': segmenter,
+            'segmenter': self._segmenter,
             'embed_size': embed_size,
         }
 
@@ -84,16 +86,22 @@ class DeepClassifier(DeepSupervisedModel):
         self.encode_layer.hybridize(static_alloc=True)
         self.loss.hybridize(static_alloc=True)
 
-    def _get_or_build_dataset(self, dataset, X, y):
-        assert (X and y) or dataset
-        if dataset:
+    def _get_or_build_dataset(
+        self, dataset, X, y, sample_cache_bytes=None, cache_dir=None,
+        n_jobs=None
+    ):
+        assert (X and y) or dataset is not None
+        if dataset is not None:
             if not hasattr(self, 'idx2labels'):
                 self.idx2labels = dataset.idx2labels
             return dataset
         dataset = ClassifyDataset(
-            InMemoryDataset(X, y),
+            ColumnarDataset(X, y),
             vocab=self._vocab, label2idx=self._label2idx,
-            segmenter=self._cut, max_length=self._max_length
+            segmenter=self._cut, max_length=self._max_length,
+            cache_dir=cache_dir, sample_cache_bytes=sample_cache_bytes,
+            n_jobs=self._n_jobs if n_jobs is None else n_jobs,
+            **self._vocab_options
         )
         if not hasattr(self, 'idx2labels'):
             self.idx2labels = dataset.idx2labels
@@ -152,18 +160,23 @@ class DeepClassifier(DeepSupervisedModel):
 
     def _batchify_fn(self):
         vocab = self._vocab
-        return functools.partial(batchify, vocab[vocab.padding_token])
+        return functools.partial(
+            batchify, vocab[vocab.padding_token], self._num_classes
+        )
 
     def predict(
         self, X=None, dataset=None, threshold=None,
-        batch_size=512, return_score=False
+        batch_size=512, return_score=False, n_jobs=None
     ):
         assert self._trained
-        assert dataset or X
+        assert dataset is not None or X
         _threshold = threshold or dict()
 
         if dataset is None:
-            dataset = self._get_or_build_dataset(dataset, X, ['O'] * len(X))
+            # 每批文本由n_jobs个进程分词
+            dataset = self._get_or_build_dataset(
+                dataset, X, ['O'] * len(X), n_jobs=n_jobs
+            )
         dataloader = self._build_dataloader(dataset, batch_size, False, 'keep')
 
         predictions = []
@@ -191,20 +204,24 @@ class DeepClassifier(DeepSupervisedModel):
         self, X=None, y=None, dataset=None, threshold=None, batch_size=512
     ):
         assert self._trained
-        assert dataset or X
+        assert dataset is not None or X
 
-        dataset = self._get_or_build_dataset(dataset, X, y)
+        dataset = self._get_or_build_dataset(
+            dataset, X, y, sample_cache_bytes=self.EVAL_CACHE_BYTES
+        )
         predictions = self.predict(
             dataset=dataset, threshold=threshold, batch_size=batch_size
         )
-        _y = np.vstack([l for _, l in dataset])
+        multi_hot = MultiHot(self._num_classes, dtype=np.int64)
+        label2idx = dataset._label2idx
+        _y = multi_hot([l for _, l in dataset])
         if self._is_multilabel:
-            _predictions = dataset._binarizer.transform(predictions)
+            _predictions = multi_hot([
+                [label2idx[l] for l in p] for p in predictions
+            ])
         else:
             _y = _y.argmax(axis=1)
-            _predictions = dataset._binarizer.transform([
-                [p] for p in predictions
-            ]).argmax(axis=1)
+            _predictions = np.array([label2idx[p] for p in predictions])
         return classify_f_score(
             _y, _predictions, self._is_multilabel,
             labels=self.idx2labels(range(self._num_classes))
@@ -250,11 +267,21 @@ class DeepClassifier(DeepSupervisedModel):
         return ins
 
     @staticmethod
-    def load(file_path, update=False, ctx=mx.cpu()):
+    def load(file_path, update=False, ctx=mx.cpu(), segmenter=None):
+        """
+        segmenter: 如果不为None, 替换保存的分词器, 例如'maxmatch'
+        以模型的词汇表为词典分词, 不需要加载jieba词典. 再次保存时
+        使用新的分词器.
+        """
         with tempfile.TemporaryDirectory() as temp_dir:
             shutil.unpack_archive(file_path, temp_dir, 'tar')
             with open(os.path.join(temp_dir, 'meta.json')) as f:
                 meta = json.loads(f.read())
+            if segmenter is not None:
+                meta['segmenter'] = (
+                    segmenter.config if isinstance(segmenter, Segmenter)
+                    else segmenter
+                )
 
             if meta['model_type'] == 'builtin-text_cnn_classifier':
                 return TextCNNClassifier._load(
@@ -272,14 +299,14 @@ class DeepClassifier(DeepSupervisedModel):
                 raise ValueError('unknown model type.')
 
 
-def cnn_batchify(padding, min_length, one_batch):
+def cnn_batchify(padding, min_length, num_classes, one_batch):
     (inputs, length), labels = gluonnlp.data.batchify.Tuple(
         Pad(axis=0, pad_val=padding, ret_length=True, min_length=min_length),
-        Stack()
+        MultiHot(num_classes)
     )(one_batch)
     inputs = inputs.transpose((1, 0))
     mask = sequence_mask(np.ones_like(inputs), length.astype('int'))
-    return inputs, mask, labels.astype('float32')
+    return inputs, mask, labels
 
 
 class TextCNNClassifier(DeepClassifier):
@@ -327,7 +354,7 @@ class TextCNNClassifier(DeepClassifier):
         vocab = self._vocab
         return functools.partial(
             cnn_batchify, vocab[vocab.padding_token],
-            max(self.meta['ngram_filter_sizes'])
+            max(self.meta['ngram_filter_sizes']), self._num_classes
         )
 
 
@@ -1,13 +1,18 @@
-from .data import SimpleIndexedRecordIO
+from .data import SimpleIndexedRecordIO, RecordIndex, convert_index
+from .compressed import BlockCompressedRecordIO
+from .storage import (
+    StorageClient, LocalStorageClient, OssStorageClient, BlockCache
+)
 
 from .dataset import (
-    RecordFileDataset, InMemoryDataset,
+    RecordFileDataset, RemoteRecordFileDataset, ShardedRecordFileDataset,
+    InMemoryDataset, ColumnarDataset, StreamDataset,
     NLPDataset, SupervisedNLPDataset,
     ClassifyDataset, SequenceTagDataset
 )
 
-from .batchify import Pad, BPTTBatchify
-from .sampler import BPTTBatchSampler
+from .batchify import Pad, MultiHot, BPTTBatchify
+from .sampler import BPTTBatchSampler, StreamBatchSampler
 
 
-__all__ = ['Pad', 'BPTTBatchify']
+__all__ = ['Pad', 'MultiHot', 'BPTTBatchify']
@@ -9,6 +9,32 @@ import gluonnlp
 logger = logging.getLogger(__name__)
 
 
+def _pad_flat(arrs, pad_val, dtype, min_length=0):
+    """
+    一维序列的补齐: 所有序列拼接后用一次布尔索引填入结果矩阵,
+    不逐个样本转换和赋值. 序列不是一维时返回None.
+    """
+    if isinstance(arrs[0], np.ndarray):
+        if arrs[0].ndim != 1:
+            return None
+        if dtype is None:
+            dtype = arrs[0].dtype
+    elif not isinstance(arrs[0], (list, tuple)) or (
+        arrs[0] and not np.isscalar(arrs[0][0])
+    ):
+        return None
+    lengths = np.fromiter(
+        (len(arr) for arr in arrs), dtype=np.int64, count=len(arrs)
+    )
+    flat = np.concatenate([np.asarray(arr) for arr in arrs])
+    if flat.ndim != 1:
+        return None
+    max_size = max(min_length, int(lengths.max()))
+    ret = np.full((len(arrs), max_size), pad_val, dtype=dtype)
+    ret[np.arange(max_size) < lengths[:, None]] = flat
+    return ret, lengths
+
+
 def _pad_arrs_to_max_length(arrs, pad_axis, pad_val, dtype, min_length=0):
     """Inner Implementation of the Pad batchify
 
@@ -24,6 +50,12 @@ def _pad_arrs_to_max_length(arrs, pad_axis, pad_val, dtype, min_length=0):
     ret : NDArray
     original_length : NDArray
     """
+    if pad_axis == 0 and pad_val is not None and not isinstance(
+        arrs[0], mx.nd.NDArray
+    ):
+        padded = _pad_flat(arrs, pad_val, dtype, min_length)
+        if padded is not None:
+            return padded
     if isinstance(arrs[0], mx.nd.NDArray):
         dtype = arrs[0].dtype if dtype is None else dtype
         arrs = [arr.asnumpy() for arr in arrs]
@@ -31,6 +63,8 @@ def _pad_arrs_to_max_length(arrs, pad_axis, pad_val, dtype, min_length=0):
         arrs = [np.asarray(ele) for ele in arrs]
     else:
         dtype = arrs[0].dtype if dtype is None else dtype
+        # 批中可能同时有列表和数组(如部分样本来自缓存)
+        arrs = [np.asarray(ele) for ele in arrs]
 
     original_length = [ele.shape[pad_axis] for ele in arrs]
     max_size = max(min_length, max(original_length))
@@ -252,6 +286,38 @@ class Stack(gluonnlp.data.batchify.Stack):
         return _stack_arrs(data, self._dtype)
 
 
+class MultiHot:
+    """
+    Convert label id arrays to a multi-hot matrix of shape
+    ``(N, num_classes)`` with one vectorized scatter.
+
+    Parameters
+    ----------
+    num_classes : int
+        Number of classes.
+    dtype : str or numpy.dtype, default 'float32'
+        The value type of the output.
+
+    Examples
+    --------
+    >>> MultiHot(3)([np.array([0, 2]), np.array([1])])
+    array([[1., 0., 1.],
+           [0., 1., 0.]], dtype=float32)
+    """
+
+    def __init__(self, num_classes, dtype='float32'):
+        self._num_classes = num_classes
+        self._dtype = dtype
+
+    def __call__(self, data):
+        lengths = [len(ids) for ids in data]
+        ret = np.zeros((len(data), self._num_classes), dtype=self._dtype)
+        if sum(lengths) > 0:
+            rows = np.repeat(np.arange(len(data)), lengths)
+            ret[rows, np.concatenate(data).astype(np.int64)] = 1
+        return ret
+
+
 class BPTTBatchify:
     """
     Transform the dataset into batches of numericalized samples, in the way
@@ -0,0 +1,344 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import struct
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..vocab import Vocab
+
+
+def segmenter_name(segmenter: Callable[[str], List[str]]) -> str:
+    """
+    分词器的名字, 用于区分不同分词器的预处理结果.
+    """
+    if segmenter is list:
+        return 'char'
+    owner = getattr(segmenter, '__self__', segmenter)
+    config = getattr(owner, 'config', None)
+    if isinstance(config, dict):
+        # 训练得到的分词器(如BPE)由配置区分
+        return json.dumps(config, ensure_ascii=False, sort_keys=True)
+    method = getattr(owner, 'method', None)
+    if method is not None:
+        return str(method)
+    return '.'.join([
+        getattr(segmenter, '__module__', None) or '',
+        getattr(segmenter, '__qualname__', None) or repr(segmenter)
+    ])
+
+
+def _vocab_digest(vocab) -> str:
+    """
+    词汇表的摘要, 见``Vocab.digest``. 也支持``gluonnlp.Vocab``.
+    """
+    if hasattr(vocab, 'digest'):
+        return vocab.digest()
+    return Vocab.digest(vocab)
+
+
+def make_cache_key(
+    vocab, segmenter: Callable[[str], List[str]],
+    max_length: Optional[int], label2idx: Optional[Dict[str, int]] = None,
+    fingerprint: Optional[str] = None,
+    vocab_options: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    根据词汇表, 分词器, 文本截断长度, 标签表和数据集指纹生成缓存的key.
+    词汇表或标签表为None表示由数据集构建, 此时``vocab_options``为构建
+    词汇表的参数.
+    """
+    # 词汇表只使用摘要, 不生成整个词汇表的json
+    content = json.dumps([
+        _vocab_digest(vocab) if vocab is not None else None,
+        segmenter_name(segmenter), max_length,
+        sorted(label2idx.items()) if label2idx is not None else None,
+        fingerprint, vocab_options
+    ], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def file_fingerprint(
+    paths: Iterable[str], chunk_size: int = 16 * 1024 * 1024
+) -> str:
+    """
+    按内容计算一组文件的指纹, 文件内容不变时指纹不变.
+    """
+    sha = hashlib.sha1()
+    for path in paths:
+        sha.update(struct.pack('<Q', os.path.getsize(path)))
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha.update(chunk)
+    return sha.hexdigest()
+
+
+def record_fingerprint(files: Iterable[Tuple[str, str]]) -> str:
+    """
+    一组``RecordIO``文件的指纹, ``files``为(索引文件, 记录文件)序列.
+
+    索引按内容计算, 记录文件只使用大小和修改时间,
+    不需要读取整个记录文件, 命中缓存时的开销只与索引大小有关.
+    """
+    sha = hashlib.sha1()
+    for idx_path, rec_path in files:
+        stat = os.stat(rec_path)
+        sha.update(file_fingerprint([idx_path]).encode('utf-8'))
+        sha.update(struct.pack('<Qq', stat.st_size, stat.st_mtime_ns))
+    return sha.hexdigest()
+
+
+class TokenCache:
+    """
+    数值化后的数据集缓存.
+
+    文本的token id和标签id以CSR格式(一个扁平的int32 id数组和一个offsets数组)
+    分片保存为``.npy``文件, 读取时以内存映射方式加载, 不需要再分词和查词汇表.
+    ``meta.json``在所有分片写完后最后写入, 只有``key``和样本数都一致时缓存才有效.
+
+    Parameters
+    ----------
+    directory: ``str``
+        缓存目录
+    key: ``str``
+        缓存的key, 见``make_cache_key``
+    shard_size: ``int``
+        每个分片的样本数
+    """
+
+    META_FILE = 'meta.json'
+
+    def __init__(
+        self, directory: str, key: str, shard_size: int = 1000000
+    ) -> None:
+        self.directory = directory
+        self.key = key
+        self.shard_size = shard_size
+        self._shards: List[Dict[str, np.ndarray]] = []
+        self._num_samples = 0
+        self._has_labels = False
+
+    def _shard_path(self, shard: int, name: str) -> str:
+        return os.path.join(self.directory, f'shard-{shard:05}-{name}.npy')
+
+    def is_valid(self, num_samples: int) -> bool:
+        meta_path = os.path.join(self.directory, self.META_FILE)
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path) as f:
+            meta = json.loads(f.read())
+        return meta['key'] == self.key and meta['num_samples'] == num_samples
+
+    def compile(
+        self, entries: Iterable[Tuple[List[int], Optional[List[int]]]],
+        extras: Optional[Dict[str, str]] = None
+    ) -> None:
+        """
+        写入缓存.
+
+        Parameters
+        ----------
+        entries: 按样本顺序的(文本id, 标签id)序列, 无标签时标签id为None
+        extras: 与缓存一起保存的文本文件(文件名: 内容), 例如词汇表,
+            用``read_extra``读取
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path = os.path.join(self.directory, self.META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for name, content in (extras or dict()).items():
+            with open(os.path.join(self.directory, name), 'w') as f:
+                f.write(content)
+
+        num_samples, num_shards, has_labels = 0, 0, False
+        buffers = {'text': [], 'label': []}
+
+        def _flush():
+            for name, arrays in buffers.items():
+                if name == 'label' and not has_labels:
+                    continue
+                lengths = [len(arr) for arr in arrays]
+                offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+                np.cumsum(lengths, out=offsets[1:])
+                ids = np.fromiter(
+                    (i for arr in arrays for i in arr),
+                    dtype=np.int32, count=int(offsets[-1])
+                )
+                np.save(self._shard_path(num_shards, f'{name}_ids'), ids)
+                np.save(
+                    self._shard_path(num_shards, f'{name}_offsets'), offsets
+                )
+                arrays.clear()
+
+        for text_ids, label_ids in entries:
+            buffers['text'].append(text_ids)
+            if label_ids is not None:
+                has_labels = True
+                buffers['label'].append(label_ids)
+            num_samples += 1
+            if len(buffers['text']) == self.shard_size:
+                _flush()
+                num_shards += 1
+        if buffers['text'] or num_shards == 0:
+            _flush()
+            num_shards += 1
+
+        with open(meta_path, 'w') as f:
+            f.write(json.dumps({
+                'key': self.key,
+                'num_samples': num_samples,
+                'num_shards': num_shards,
+                'shard_size': self.shard_size,
+                'has_labels': has_labels
+            }))
+
+    def read_extra(self, name: str) -> str:
+        with open(os.path.join(self.directory, name)) as f:
+            return f.read()
+
+    def load(self) -> None:
+        with open(os.path.join(self.directory, self.META_FILE)) as f:
+            meta = json.loads(f.read())
+        self.shard_size = meta['shard_size']
+        self._num_samples = meta['num_samples']
+        self._has_labels = meta['has_labels']
+        names = ['text_ids', 'text_offsets']
+        if self._has_labels:
+            names.extend(['label_ids', 'label_offsets'])
+        self._shards = [
+            {
+                name: np.load(self._shard_path(shard, name), mmap_mode='r')
+                for name in names
+            }
+            for shard in range(meta['num_shards'])
+        ]
+
+    def _get(self, idx: int, name: str) -> np.ndarray:
+        shard = self._shards[idx // self.shard_size]
+        i = idx % self.shard_size
+        offsets = shard[f'{name}_offsets']
+        return shard[f'{name}_ids'][offsets[i]:offsets[i + 1]]
+
+    def __getitem__(
+        self, idx: int
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if idx < 0:
+            idx += self._num_samples
+        if not 0 <= idx < self._num_samples:
+            raise IndexError(f'index {idx} out of range')
+        label_ids = self._get(idx, 'label') if self._has_labels else None
+        return self._get(idx, 'text'), label_ids
+
+    def __len__(self) -> int:
+        return self._num_samples
+
+    @property
+    def text_lengths(self) -> List[int]:
+        return np.concatenate([
+            np.diff(shard['text_offsets']) for shard in self._shards
+        ]).tolist()
+
+
+def _compact(sample: Any) -> Any:
+    """
+    将样本中的id列表转换为int32数组.
+
+    其他数组的视图(例如批量查表结果的切片)会被拷贝,
+    否则缓存的样本会让整个底层数组一直保留在内存中.
+    """
+    if isinstance(sample, tuple):
+        return tuple(_compact(element) for element in sample)
+    if isinstance(sample, np.ndarray):
+        sample = sample.astype(np.int32, copy=False)
+        if sample.base is not None:
+            sample = sample.copy()
+        return sample
+    return np.asarray(sample, dtype=np.int32)
+
+
+# ndarray对象本身(不含数据)占用的字节数
+_ARRAY_OVERHEAD = sys.getsizeof(np.zeros(0, dtype=np.int32))
+# OrderedDict中每个条目(键, 哈希表项和链表节点)大约占用的字节数
+_ENTRY_OVERHEAD = 128
+
+
+def _nbytes(sample: Any) -> int:
+    """
+    样本占用的字节数, 包括数组和元组对象本身的开销,
+    短文本的这部分开销可能超过数据本身.
+    """
+    if isinstance(sample, tuple):
+        return sys.getsizeof(sample) + sum(
+            _nbytes(element) for element in sample
+        )
+    return _ARRAY_OVERHEAD + sample.nbytes
+
+
+def _entry_nbytes(sample: Any) -> int:
+    return _ENTRY_OVERHEAD + _nbytes(sample)
+
+
+class SampleCache:
+    """
+    预处理后样本的内存缓存, 按字节数限制大小, 超出时淘汰最久未使用的样本.
+    字节数包括数组对象和缓存条目本身的开销.
+
+    样本中的id列表以int32数组保存.
+
+    Parameters
+    ----------
+    max_bytes: ``int``
+        缓存样本占用的最大字节数
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._samples: 'OrderedDict[int, Any]' = OrderedDict()
+
+    def get(self, idx: int) -> Optional[Any]:
+        sample = self._samples.get(idx)
+        if sample is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._samples.move_to_end(idx)
+        return sample
+
+    def put(self, idx: int, sample: Any) -> Any:
+        """
+        缓存样本, 返回转换为int32数组后的样本.
+        """
+        sample = _compact(sample)
+        nbytes = _entry_nbytes(sample)
+        if nbytes > self.max_bytes:
+            return sample
+        if idx in self._samples:
+            self.nbytes -= _entry_nbytes(self._samples.pop(idx))
+        self._samples[idx] = sample
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._samples.popitem(last=False)
+            self.nbytes -= _entry_nbytes(evicted)
+        return sample
+
+    def clear(self) -> None:
+        self._samples.clear()
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def cache_info(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._samples),
+            'nbytes': self.nbytes,
+            'max_bytes': self.max_bytes
+        }
@@ -1,6 +1,14 @@
 import ctypes
+import fcntl
+import functools
+import itertools
+import mmap
+import os
+import struct
 from multiprocessing import current_process
-from typing import IO
+from typing import (
+    IO, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+)
 
 import mxnet as mx
 import numpy as np
@@ -8,6 +16,361 @@ import pandas as pd
 from mxnet.base import _LIB, check_call
 
 
+_MAGIC = 0xced7230a
+_MAGIC_BYTES = struct.pack('<I', _MAGIC)
+_HEADER = struct.Struct('<II')
+_LENGTH_MASK = (1 << 29) - 1
+
+
+def _read_record(
+    buf: Union[bytes, memoryview], pos: int
+) -> Tuple[Union[bytes, memoryview], int]:
+    """
+    从``buf``的``pos``位置解析一条``RecordIO``记录.
+
+    记录格式与dmlc的``RecordIOWriter``一致: 4字节magic, 4字节lrecord
+    (高3位为cflag, 低29位为长度), 数据按4字节对齐.
+    当数据中不含magic时(cflag为0), 返回``buf``的切片, 不发生拷贝.
+
+    Returns
+    ----------
+    record: 记录内容
+    end: 记录结束(下一条记录开始)的位置
+    """
+    magic, lrec = _HEADER.unpack_from(buf, pos)
+    if magic != _MAGIC:
+        raise ValueError(f'Invalid RecordIO magic number at {pos}')
+    cflag, length = lrec >> 29, lrec & _LENGTH_MASK
+    start = pos + _HEADER.size
+    end = start + ((length + 3) >> 2 << 2)
+    if cflag == 0:
+        return buf[start:start + length], end
+    parts = [bytes(buf[start:start + length])]
+    while cflag != 3:
+        magic, lrec = _HEADER.unpack_from(buf, end)
+        if magic != _MAGIC:
+            raise ValueError(f'Invalid RecordIO magic number at {end}')
+        cflag, length = lrec >> 29, lrec & _LENGTH_MASK
+        start = end + _HEADER.size
+        end = start + ((length + 3) >> 2 << 2)
+        parts.append(bytes(buf[start:start + length]))
+    return _MAGIC_BYTES.join(parts), end
+
+
+def _encode_record(buf: bytes) -> bytes:
+    """
+    将``buf``编码为一条``RecordIO``记录, 与dmlc的``RecordIOWriter``一致.
+
+    数据中4字节对齐位置上出现的magic被移除, 记录在这些位置被拆分为多段
+    (cflag为1, 2, 3), 读取时在各段之间重新插入magic.
+    """
+    length = len(buf)
+    parts = []
+    start = 0
+    pos = buf.find(_MAGIC_BYTES)
+    while 0 <= pos <= length - 4:
+        if pos % 4 == 0:
+            cflag = 1 if start == 0 else 2
+            parts.append(_HEADER.pack(_MAGIC, cflag << 29 | pos - start))
+            parts.append(buf[start:pos])
+            start = pos + 4
+        pos = buf.find(_MAGIC_BYTES, pos + 1)
+    cflag = 3 if start > 0 else 0
+    parts.append(_HEADER.pack(_MAGIC, cflag << 29 | length - start))
+    parts.append(buf[start:])
+    parts.append(b'\x00' * (-length % 4))
+    return b''.join(parts)
+
+
+def _merge_ranges(
+    offsets: np.ndarray, lengths: np.ndarray, max_gap: int
+) -> Iterator[Tuple[int, int, int, int]]:
+    """
+    合并按偏移排序后相邻(间隔不超过``max_gap``字节)的记录区间.
+
+    Yields
+    ----------
+    (start, end, first, last): 合并后区间的字节范围,
+    以及区间包含的记录在``offsets``中的下标范围``[first, last)``
+    """
+    if len(offsets) == 0:
+        return
+    offsets = offsets.astype(np.int64)
+    ends = np.maximum.accumulate(offsets + lengths.astype(np.int64))
+    breaks = np.flatnonzero(offsets[1:] > ends[:-1] + max_gap) + 1
+    firsts = np.concatenate([[0], breaks])
+    lasts = np.concatenate([breaks, [len(offsets)]])
+    for first, last in zip(firsts, lasts):
+        yield int(offsets[first]), int(ends[last - 1]), first, last
+
+
+def text_length(buf: Union[bytes, memoryview]) -> int:
+    """
+    记录中第一列文本的字符数, 作为索引中记录的默认长度.
+    """
+    return len(str(buf, 'utf-8', 'replace').split('\t', 1)[0])
+
+
+INDEX_MAGIC = b'SKIDX\x00\x02\x00'
+INDEX_HEADER = struct.Struct('<8sQ')
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'), ('length', '<u4'), ('num_tokens', '<u4')
+])
+
+
+class RecordIndex:
+    """
+    ``RecordIO``文件的索引.
+
+    v2二进制索引格式为16字节文件头(8字节magic, 8字节记录数),
+    之后是按记录顺序排列的``INDEX_DTYPE``结构体数组:
+    记录在文件中的字节偏移, 记录在文件中占用的字节数, 记录的token数.
+    二进制索引以内存映射方式加载, 不需要解析.
+
+    旧的CSV格式索引(每行一个偏移)仍然可以读取,
+    但需要解析整个文件, 且没有token数, 可以用``convert_index``一次性转换.
+
+    Parameters
+    ----------
+    entries: ``np.ndarray``
+        ``INDEX_DTYPE``类型的索引数组
+    has_num_tokens: ``bool``
+        索引中是否有每条记录的token数
+    """
+
+    def __init__(self, entries: np.ndarray, has_num_tokens: bool) -> None:
+        self.entries = entries
+        self.has_num_tokens = has_num_tokens
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self.entries['offset']
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self.entries['length']
+
+    @property
+    def num_tokens(self) -> np.ndarray:
+        return self.entries['num_tokens']
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def committed_end(self) -> int:
+        """
+        最后一条已提交记录的结束位置, 之后的字节是未提交或写了一半的记录.
+        """
+        if len(self.entries) == 0:
+            return 0
+        last = self.entries[-1]
+        return int(last['offset']) + int(last['length'])
+
+    @staticmethod
+    def is_binary(idx_path: str) -> bool:
+        with open(idx_path, 'rb') as f:
+            return f.read(len(INDEX_MAGIC)) == INDEX_MAGIC
+
+    @classmethod
+    def count(cls, idx_path: str) -> int:
+        """
+        索引中的记录数, v2二进制索引只需要读取文件头.
+        """
+        if cls.is_binary(idx_path):
+            with open(idx_path, 'rb') as f:
+                _, count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+            return count
+        with open(idx_path, 'rb') as f:
+            return sum(1 for line in f if line.strip())
+
+    @classmethod
+    def load(
+        cls, idx_path: str, uri: str, file_size: Optional[int] = None
+    ) -> 'RecordIndex':
+        """
+        读取``idx_path``索引, 自动识别v2二进制格式和旧的CSV格式.
+        ``file_size``为``RecordIO``文件的字节数, 默认读取``uri``的大小,
+        只在推算旧索引的记录长度时使用.
+        """
+        if cls.is_binary(idx_path):
+            with open(idx_path, 'rb') as f:
+                _, count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+            if count == 0:
+                return cls(np.zeros(0, dtype=INDEX_DTYPE), True)
+            entries = np.memmap(
+                idx_path, dtype=INDEX_DTYPE, mode='r',
+                offset=INDEX_HEADER.size, shape=(count,)
+            )
+            return cls(entries, True)
+
+        if os.path.getsize(idx_path) == 0:
+            return cls(np.zeros(0, dtype=INDEX_DTYPE), False)
+        positions = pd.read_csv(
+            idx_path, header=None, dtype=np.uint64
+        )[0].values
+        entries = np.zeros(len(positions), dtype=INDEX_DTYPE)
+        entries['offset'] = positions
+        # 旧索引没有记录长度, 用相邻记录的偏移推算
+        order = np.argsort(positions, kind='stable')
+        if file_size is None:
+            file_size = os.path.getsize(uri)
+        ends = np.append(positions[order][1:], file_size)
+        entries['length'][order] = ends - positions[order]
+        return cls(entries, False)
+
+
+class IndexWriter:
+    """
+    顺序写入v2二进制索引, 记录数在``commit``或``close``时写入文件头.
+
+    文件头中的记录数是提交点: 读取时只使用文件头记录数以内的索引项,
+    之后写入但未提交的索引项不可见.
+
+    Parameters
+    ----------
+    idx_path: ``str``
+        索引文件路径
+    append: ``bool``
+        是否追加到已有的索引, 追加时丢弃已有索引中未提交的索引项.
+        追加时先获取索引文件的排他锁, 之后才读取或修改文件,
+        锁在``close``时释放.
+    upgrade: ``Callable``, optional
+        追加时, 如果已有索引不是v2二进制格式, 在持有锁之后调用,
+        将其转换为v2格式
+    """
+
+    def __init__(
+        self, idx_path: str, append: bool = False,
+        upgrade: Optional[Callable[[], None]] = None
+    ) -> None:
+        if not append:
+            self._file = open(idx_path, 'w+b')
+            self._file.write(INDEX_HEADER.pack(INDEX_MAGIC, 0))
+            self.count = 0
+            self.committed_end = 0
+            return
+        while True:
+            # 不截断地打开, 持有锁之前不读取或修改文件,
+            # 否则会丢弃其他进程已写入但尚未提交的索引项
+            self._file = os.fdopen(
+                os.open(idx_path, os.O_RDWR | os.O_CREAT), 'r+b'
+            )
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            if self._is_current(idx_path):
+                if os.fstat(self._file.fileno()).st_size == 0:
+                    self._file.write(INDEX_HEADER.pack(INDEX_MAGIC, 0))
+                    break
+                if upgrade is None or RecordIndex.is_binary(idx_path):
+                    break
+                upgrade()
+            # 等待锁期间索引文件被替换(例如转换了格式), 重新打开
+            self._file.close()
+        self.sync()
+
+    def _is_current(self, idx_path: str) -> bool:
+        """
+        打开的文件是否仍是``idx_path``指向的文件.
+        """
+        try:
+            return os.path.samestat(
+                os.fstat(self._file.fileno()), os.stat(idx_path)
+            )
+        except FileNotFoundError:
+            return False
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def sync(self) -> None:
+        """
+        重新读取已提交的记录数, 丢弃未提交的索引项.
+        """
+        self._file.seek(0)
+        magic, self.count = INDEX_HEADER.unpack(
+            self._file.read(INDEX_HEADER.size)
+        )
+        if magic != INDEX_MAGIC:
+            raise ValueError('Only v2 binary index can be appended.')
+        end = INDEX_HEADER.size + self.count * INDEX_DTYPE.itemsize
+        self.committed_end = 0
+        if self.count > 0:
+            self._file.seek(end - INDEX_DTYPE.itemsize)
+            last = np.frombuffer(
+                self._file.read(INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE
+            )[0]
+            self.committed_end = int(last['offset']) + int(last['length'])
+        self._file.truncate(end)
+        self._file.seek(end)
+
+    def write(self, offset: int, length: int, num_tokens: int) -> None:
+        self._file.write(np.array(
+            (offset, length, num_tokens), dtype=INDEX_DTYPE
+        ).tobytes())
+        self.count += 1
+
+    def write_many(self, entries: np.ndarray) -> None:
+        self._file.write(entries.astype(INDEX_DTYPE, copy=False).tobytes())
+        self.count += len(entries)
+
+    def commit(self) -> None:
+        """
+        将记录数写入文件头, 之前写入的索引项对读取可见.
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        end = self._file.tell()
+        self._file.seek(0)
+        self._file.write(INDEX_HEADER.pack(INDEX_MAGIC, self.count))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.seek(end)
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.commit()
+        self._file.close()
+
+
+def convert_index(
+    idx_path: str, uri: str,
+    length_fn: Callable[[Union[bytes, memoryview]], int] = text_length
+) -> None:
+    """
+    将旧的CSV格式索引转换为v2二进制格式(原地替换).
+
+    Parameters
+    ----------
+    idx_path: ``str``
+        索引文件路径
+    uri: ``str``
+        ``RecordIO``文件路径
+    length_fn: ``Callable``
+        计算记录token数的函数
+    """
+    if RecordIndex.is_binary(idx_path):
+        return
+    index = RecordIndex.load(idx_path, uri)
+    tmp_path = idx_path + '.tmp'
+    writer = IndexWriter(tmp_path)
+    with open(uri, 'rb') as f:
+        buf = (
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if os.fstat(f.fileno()).st_size > 0 else b''
+        )
+        view = memoryview(buf)
+        for offset in index.offsets:
+            record, end = _read_record(view, int(offset))
+            writer.write(offset, end - offset, length_fn(record))
+            del record
+        view.release()
+        if isinstance(buf, mmap.mmap):
+            buf.close()
+    writer.close()
+    os.replace(tmp_path, idx_path)
+
+
 class SimpleIndexedRecordIO(mx.recordio.MXIndexedRecordIO):
     """
     Indexed ``RecordIO`` data format, supporting random access.
@@ -30,34 +393,188 @@ class SimpleIndexedRecordIO(mx.recordio.MXIndexedRecordIO):
     uri: ``str``
         Path to ``RecordIO`` file.
     flag: ``str``
-        'w' for write or 'r' for read.
+        'w' for write, 'a' for append or 'r' for read.
+        追加模式下, 写入的记录在``commit``或``close``后才对读取可见,
+        已有文件中未提交的数据(例如上次写入中断留下的)会被丢弃.
+        追加期间持有索引文件的排他锁, 多个进程追加同一文件时依次进行.
+    length_fn: ``Callable``
+        写模式下计算每条记录token数的函数, token数保存在索引中,
+        默认为第一列文本的字符数.
+    use_mmap: ``bool``
+        读模式下是否以内存映射方式读取``RecordIO``文件.
+        内存映射模式下, ``read_idx``直接返回映射内存的切片(``memoryview``),
+        不经过ctypes调用, fork出的子进程可以直接共用映射, 无需重新打开文件.
     """
 
-    def __init__(self, idx_path: str, uri: str, flag: str) -> None:
-        self.positions = np.array([], dtype=np.uint)
+    # 批量读取时, 间隔不超过该字节数的记录合并为一次读取
+    MERGE_GAP = 64 * 1024
+    # 写入时缓冲的字节数, 超过后写入文件
+    BUFFER_SIZE = 4 * 1024 * 1024
+
+    def __init__(
+        self, idx_path: str, uri: str, flag: str,
+        length_fn: Callable[[bytes], int] = text_length,
+        use_mmap: bool = False
+    ) -> None:
+        self.index = RecordIndex(np.zeros(0, dtype=INDEX_DTYPE), False)
+        self.length_fn = length_fn
+        self.use_mmap = use_mmap and flag == 'r'
+        self._mmap = None
+        self._fd = None
+        self._fd_pid = None
         super().__init__(idx_path, uri, flag)
 
     def open(self) -> None:
         """
         打开``RecordIO``文件
         """
-        if self.flag == "w":
-            check_call(_LIB.MXRecordIOWriterCreate(
-                self.uri, ctypes.byref(self.handle)))
-            self.writable = True
+        if self.use_mmap:
+            self._open_mmap()
+        elif self.flag in ("w", "a"):
+            self._open_writer()
         elif self.flag == "r":
             check_call(_LIB.MXRecordIOReaderCreate(
                 self.uri, ctypes.byref(self.handle)))
             self.writable = False
+            self.pid = current_process().pid
+            self.is_open = True
+            self.fidx: IO = open(self.idx_path, 'rb')  # 兼容父类close方法
+            self.index = RecordIndex.load(self.idx_path, self.uri.value)
         else:
             raise ValueError("Invalid flag %s" % self.flag)
+
+    def _open_writer(self) -> None:
+        """
+        以Python文件写入``RecordIO``文件, 追加时从最后提交的位置继续写入.
+        """
+        uri = self.uri.value
+        append = self.flag == 'a'
+        self.fidx = IndexWriter(
+            self.idx_path, append=append,
+            upgrade=functools.partial(
+                convert_index, self.idx_path, uri, self.length_fn
+            )
+        )
+        self._file = open(
+            uri, 'r+b' if append and os.path.exists(uri) else 'w+b'
+        )
+        self._file.truncate(self.fidx.committed_end)
+        self._file.seek(self.fidx.committed_end)
+        self._buffer = bytearray()
+        self._entries: List[Tuple[int, int, int]] = []
+        self.writable = True
         self.pid = current_process().pid
         self.is_open = True
-        self.fidx: IO = open(self.idx_path, self.flag)  # 兼容父类close方法
-        if not self.writable:
-            self.positions = pd.read_csv(
-                self.idx_path, header=None, dtype=np.uint
-            )[0].values
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self.index.offsets
+
+    def _open_mmap(self) -> None:
+        with open(self.uri.value, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._mmap = b''
+        self.writable = False
+        self.pid = current_process().pid
+        self.is_open = True
+        self.fidx = open(self.idx_path, 'rb')
+        self.index = RecordIndex.load(self.idx_path, self.uri.value)
+
+    def close(self) -> None:
+        """
+        关闭``RecordIO``文件
+        """
+        if getattr(self, 'writable', False):
+            if self.is_open:
+                self.commit()
+                self._file.close()
+                self.fidx.close()
+                self.is_open = False
+                self.pid = None
+            return
+        if self._fd is not None:
+            if self._fd_pid == current_process().pid:
+                os.close(self._fd)
+            self._fd = None
+        if not self.use_mmap:
+            super().close()
+            return
+        if not self.is_open:
+            return
+        if isinstance(self._mmap, mmap.mmap):
+            try:
+                self._mmap.close()
+            except BufferError:
+                # 仍有记录切片在使用, 映射随最后一个切片一起释放
+                pass
+        self._mmap = None
+        self.fidx.close()
+        self.is_open = False
+        self.pid = None
+
+    def __getstate__(self):
+        if not self.use_mmap:
+            return super().__getstate__()
+        d = dict(self.__dict__)
+        d['_mmap'] = None
+        d['_fd'] = None
+        d['fidx'] = None
+        d['uri'] = self.uri.value.decode('utf-8')
+        del d['handle']
+        return d
+
+    def read_idx(self, idx: int) -> Union[bytes, memoryview]:
+        """
+        返回第``idx``条记录.
+
+        内存映射模式下返回映射内存的``memoryview``切片.
+        """
+        if not self.use_mmap:
+            return super().read_idx(idx)
+        record, _ = _read_record(
+            memoryview(self._mmap), int(self.positions[idx])
+        )
+        return record
+
+    def _read_range(self, start: int, end: int) -> memoryview:
+        """
+        读取``RecordIO``文件中``[start, end)``范围的字节.
+        """
+        if self.use_mmap:
+            return memoryview(self._mmap)[start:end]
+        pid = current_process().pid
+        if self._fd is None or self._fd_pid != pid:
+            self._fd = os.open(self.uri.value, os.O_RDONLY)
+            self._fd_pid = pid
+        return memoryview(os.pread(self._fd, end - start, start))
+
+    def read_batch(
+        self, indices: Sequence[int]
+    ) -> List[Union[bytes, memoryview]]:
+        """
+        批量读取``indices``对应的记录, 按请求的顺序返回.
+
+        记录按文件偏移排序, 相邻的记录合并为一次大块读取,
+        随机读取的次数从``len(indices)``次降低为合并后的区间数.
+        """
+        assert not self.writable
+        indices = np.asarray(indices, dtype=np.int64)
+        offsets = self.index.offsets[indices]
+        order = np.argsort(offsets, kind='stable')
+        offsets = offsets[order]
+        lengths = self.index.lengths[indices][order]
+        records = [None] * len(indices)
+        for start, end, first, last in _merge_ranges(
+            offsets, lengths, self.MERGE_GAP
+        ):
+            buf = self._read_range(start, end)
+            for i in range(first, last):
+                records[order[i]], _ = _read_record(
+                    buf, int(offsets[i]) - start
+                )
+        return records
 
     def seek(self, idx: int) -> None:
         """
@@ -69,10 +586,17 @@ class SimpleIndexedRecordIO(mx.recordio.MXIndexedRecordIO):
         """
         assert not self.writable
         self._check_pid(allow_reset=True)
-        pos = ctypes.c_size_t(self.positions[idx])
+        pos = ctypes.c_size_t(int(self.positions[idx]))
         check_call(_LIB.MXRecordIOReaderSeek(self.handle, pos))
 
-    def write(self, buf: bytes) -> None:
+    def tell(self) -> int:
+        """
+        下一条记录在``RecordIO``文件中的偏移.
+        """
+        assert self.writable
+        return self._file.tell() + len(self._buffer)
+
+    def write(self, buf: bytes, num_tokens: int = None) -> None:
         """
         Write ``buf`` sequentially.
 
@@ -86,7 +610,72 @@ class SimpleIndexedRecordIO(mx.recordio.MXIndexedRecordIO):
         ----------
         buf: ``byte``
             Record to write.
+        num_tokens: ``int``, optional
+            Token count of the record stored in the index.
+            If None, ``length_fn(buf)`` is used.
+        """
+        self.write_many([buf], None if num_tokens is None else [num_tokens])
+
+    def write_many(
+        self, bufs: Iterable[bytes],
+        num_tokens: Optional[Iterable[int]] = None
+    ) -> int:
+        """
+        Write records of ``bufs`` sequentially.
+
+        Records and index entries are encoded into a buffer and written
+        once it exceeds ``BUFFER_SIZE`` bytes.
+
+        Examples
+        ---------
+        >>> record.write_many(
+        ...     f'record_{i}'.encode('utf-8') for i in range(5)
+        ... )
+        5
+        >>> record.close()
+
+        Parameters
+        ----------
+        bufs: ``Iterable[bytes]``
+            Records to write.
+        num_tokens: ``Iterable[int]``, optional
+            Token counts of the records stored in the index.
+            If None, ``length_fn`` is used.
+
+        Returns
+        ----------
+        Number of records written.
+        """
+        assert self.writable
+        self._check_pid(allow_reset=False)
+        if num_tokens is None:
+            num_tokens = itertools.repeat(None)
+        count = 0
+        for buf, n in zip(bufs, num_tokens):
+            offset = self.tell()
+            data = _encode_record(buf)
+            self._buffer += data
+            self._entries.append((
+                offset, len(data), self.length_fn(buf) if n is None else n
+            ))
+            count += 1
+            if len(self._buffer) >= self.BUFFER_SIZE:
+                self._flush()
+        return count
+
+    def _flush(self) -> None:
+        self._file.write(self._buffer)
+        self.fidx.write_many(np.array(self._entries, dtype=INDEX_DTYPE))
+        self._buffer = bytearray()
+        self._entries = []
+
+    def commit(self) -> None:
+        """
+        提交已写入的记录. 记录数据先落盘, 之后更新索引文件头的记录数,
+        所以读取方只会看到完整写入的记录.
         """
-        pos = self.tell()
-        super().write(buf)
-        self.fidx.write(f'{pos}\n')
+        assert self.writable
+        self._flush()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.fidx.commit()
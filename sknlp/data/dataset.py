@@ -1,13 +1,33 @@
+from array import array
 from collections import Counter
+import copy
+import glob
+import hashlib
+import itertools
+import json
+import mmap
+import multiprocessing
 import os
-from typing import Dict, List, Tuple, Sequence, Optional, Callable
+import struct
+from typing import (
+    Any, Dict, List, Tuple, Sequence, Optional, Callable, Iterable,
+    Iterator, Union
+)
 
+import numpy as np
 from mxnet.gluon.data.dataset import Dataset
 
-from sklearn.preprocessing import MultiLabelBinarizer
-
-from .data import SimpleIndexedRecordIO
-from ..vocab import Vocab
+from .data import SimpleIndexedRecordIO, RecordIndex, _read_record
+from .compressed import BlockCompressedRecordIO, BlockIndex
+from .storage import (
+    StorageClient, RemoteRecordIO, RemoteBlockCompressedRecordIO,
+    _cache_index
+)
+from .cache import (
+    TokenCache, SampleCache, make_cache_key, file_fingerprint,
+    record_fingerprint, segmenter_name
+)
+from ..vocab import Vocab, TokenSketch, CharTable
 
 
 class RecordFileDataset(Dataset):
@@ -15,23 +35,389 @@ class RecordFileDataset(Dataset):
     A dataset wrapper for a ``SimpleIndexedRecordIO`` file.
 
     Each sample is a string representing the raw content of an record.
+    Files with the ``.crec`` extension are read with
+    ``BlockCompressedRecordIO``.
 
     Parameters
     ----------
     filename : ``str``
         Path to ``RecordIO`` file.
+    use_mmap : ``bool``
+        Whether to memory-map the ``RecordIO`` file. The mapping is shared by
+        forked worker processes, so they read from the same page cache
+        without reopening the file.
     """
 
-    def __init__(self, filename: str) -> None:
+    def __init__(self, filename: str, use_mmap: bool = False) -> None:
         self.idx_file = os.path.splitext(filename)[0] + '.idx'
         self.filename = filename
-        self._record = SimpleIndexedRecordIO(self.idx_file, self.filename, 'r')
+        if self.is_compressed(filename):
+            self._record = BlockCompressedRecordIO(
+                self.idx_file, self.filename, 'r', use_mmap=use_mmap
+            )
+        else:
+            self._record = SimpleIndexedRecordIO(
+                self.idx_file, self.filename, 'r', use_mmap=use_mmap
+            )
+
+    @staticmethod
+    def is_compressed(filename: str) -> bool:
+        return os.path.splitext(filename)[1] == '.crec'
+
+    @classmethod
+    def count(cls, filename: str) -> int:
+        """
+        Number of records in ``filename``, read from its index header.
+        """
+        idx_file = os.path.splitext(filename)[0] + '.idx'
+        if cls.is_compressed(filename):
+            return BlockIndex.count(idx_file)
+        return RecordIndex.count(idx_file)
 
     def __getitem__(self, idx: int) -> str:
-        return self._record.read_idx(idx).decode('utf-8')
+        return str(self._record.read_idx(idx), 'utf-8')
+
+    def read_batch(self, indices: Sequence[int]) -> List[str]:
+        """
+        Read the records of ``indices`` with offset-sorted, merged reads.
+        """
+        return [
+            str(record, 'utf-8')
+            for record in self._record.read_batch(indices)
+        ]
 
     def __len__(self) -> int:
-        return len(self._record.positions)
+        return len(self._record.index)
+
+    def fingerprint(self) -> str:
+        """
+        记录文件和索引的指纹, 见``record_fingerprint``.
+        """
+        return record_fingerprint([(self.idx_file, self.filename)])
+
+    @property
+    def text_lengths(self) -> Optional[np.ndarray]:
+        """
+        Token counts stored in the record index, or None for legacy indexes.
+        """
+        if not self._record.index.has_num_tokens:
+            return None
+        return self._record.index.num_tokens
+
+
+class RemoteRecordFileDataset(RecordFileDataset):
+    """
+    A ``RecordFileDataset`` over a ``RecordIO`` file in object storage.
+
+    Byte ranges are fetched on demand through ``client`` and kept in a
+    local on-disk block cache, so training starts without downloading the
+    whole file first. ``.crec`` files are read block by block as well.
+
+    Parameters
+    ----------
+    filename : ``str``
+        Remote path to the ``RecordIO`` file, its index is the ``.idx``
+        file next to it.
+    client : ``StorageClient``
+        Storage client used to fetch byte ranges, e.g.
+        ``OssStorageClient``.
+    cache_dir : ``str``
+        Local directory of the downloaded index and cached blocks.
+    block_size : ``int``
+        Bytes per cached block.
+    cache_bytes : ``int``
+        Maximum bytes of cached blocks on disk.
+    read_ahead : ``int``
+        Number of blocks prefetched in the background on sequential reads.
+    """
+
+    def __init__(
+        self, filename: str, client: StorageClient, cache_dir: str,
+        block_size: int = 4 * 1024 * 1024, cache_bytes: int = 2 ** 30,
+        read_ahead: int = 2
+    ) -> None:
+        self.idx_file = os.path.splitext(filename)[0] + '.idx'
+        self.filename = filename
+        record_cls = RemoteRecordIO
+        if self.is_compressed(filename):
+            record_cls = RemoteBlockCompressedRecordIO
+        self._record = record_cls(
+            self.idx_file, self.filename, client, cache_dir,
+            block_size=block_size, max_bytes=cache_bytes,
+            read_ahead=read_ahead
+        )
+
+    @classmethod
+    def count(
+        cls, filename: str, client: StorageClient, cache_dir: str
+    ) -> int:
+        """
+        Number of records in the remote ``filename``, read from its index
+        header. The index is downloaded into ``cache_dir`` once and reused
+        by the dataset.
+        """
+        idx_file = _cache_index(
+            client, os.path.splitext(filename)[0] + '.idx', cache_dir
+        )
+        if cls.is_compressed(filename):
+            return BlockIndex.count(idx_file)
+        return RecordIndex.count(idx_file)
+
+    def fingerprint(self) -> str:
+        """
+        远程文件的指纹, 由文件地址和索引内容计算, 不需要下载记录文件.
+        """
+        sha = hashlib.sha1()
+        sha.update(self._record.url.encode('utf-8'))
+        sha.update(file_fingerprint([self._record.local_idx_path]).encode())
+        return sha.hexdigest()
+
+
+class ShardedRecordFileDataset(Dataset):
+    """
+    A dataset over several ``SimpleIndexedRecordIO`` (or block-compressed)
+    shards.
+
+    Shards are opened lazily on first access and the global index is built
+    from the record counts in the shard indexes, so creating the dataset
+    does not open or map any ``RecordIO`` file.
+
+    Parameters
+    ----------
+    shards : ``str`` or ``Sequence[str]``
+        A glob pattern, a list of paths to ``RecordIO`` files, or the path
+        of a ``.manifest.json`` global index written by ``raw2rec.py``.
+        Files matched by a glob pattern are sorted by name.
+    use_mmap : ``bool``
+        Whether to memory-map the shards, see ``RecordFileDataset``.
+    """
+
+    is_sharded = True
+
+    def __init__(
+        self, shards: Sequence[str], use_mmap: bool = False
+    ) -> None:
+        self._counts: Optional[np.ndarray] = None
+        if isinstance(shards, str) and shards.endswith('.json'):
+            filenames = self._load_manifest(shards)
+        elif isinstance(shards, str):
+            filenames = sorted(glob.glob(shards))
+        else:
+            filenames = list(shards)
+        assert len(filenames) > 0, f'No shard found in {shards}'
+        self.filenames = filenames
+        self._use_mmap = use_mmap
+        self._shards: Dict[int, RecordFileDataset] = dict()
+        self._cumulative_lengths: Optional[np.ndarray] = None
+
+    def _load_manifest(self, manifest_path: str) -> List[str]:
+        """
+        Read shard paths and record counts from a manifest, so the shard
+        indexes do not need to be opened to build the global index.
+        """
+        with open(manifest_path) as f:
+            manifest = json.loads(f.read())
+        directory = os.path.dirname(os.path.abspath(manifest_path))
+        self._counts = np.array(
+            [shard['count'] for shard in manifest['shards']], dtype=np.int64
+        )
+        return [
+            os.path.join(directory, shard['file'])
+            for shard in manifest['shards']
+        ]
+
+    @property
+    def counts(self) -> np.ndarray:
+        """
+        Number of records in each shard, read from the shard indexes.
+        """
+        if self._counts is None:
+            self._counts = np.array([
+                RecordFileDataset.count(filename)
+                for filename in self.filenames
+            ], dtype=np.int64)
+        return self._counts
+
+    @property
+    def cumulative_lengths(self) -> np.ndarray:
+        if self._cumulative_lengths is None:
+            self._cumulative_lengths = np.zeros(
+                len(self.filenames) + 1, dtype=np.int64
+            )
+            np.cumsum(self.counts, out=self._cumulative_lengths[1:])
+        return self._cumulative_lengths
+
+    def _shard(self, shard: int) -> RecordFileDataset:
+        if shard not in self._shards:
+            self._shards[shard] = RecordFileDataset(
+                self.filenames[shard], use_mmap=self._use_mmap
+            )
+        return self._shards[shard]
+
+    def _locate(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        n = len(self)
+        indices = np.where(indices < 0, indices + n, indices)
+        if len(indices) > 0 and (indices.min() < 0 or indices.max() >= n):
+            raise IndexError(f'index out of range for {n} records')
+        shards = np.searchsorted(
+            self.cumulative_lengths, indices, side='right'
+        ) - 1
+        return shards, indices - self.cumulative_lengths[shards]
+
+    def __getitem__(self, idx: int) -> str:
+        shards, local_indices = self._locate(np.array([idx]))
+        return self._shard(int(shards[0]))[int(local_indices[0])]
+
+    def read_batch(self, indices: Sequence[int]) -> List[str]:
+        """
+        Read the records of ``indices``, one merged batch read per shard.
+        """
+        shards, local_indices = self._locate(
+            np.asarray(indices, dtype=np.int64)
+        )
+        records: List[Optional[str]] = [None] * len(shards)
+        for shard in np.unique(shards):
+            positions = np.flatnonzero(shards == shard)
+            shard_records = self._shard(int(shard)).read_batch(
+                local_indices[positions].tolist()
+            )
+            for position, record in zip(positions, shard_records):
+                records[position] = record
+        return records
+
+    def __len__(self) -> int:
+        return int(self.cumulative_lengths[-1])
+
+    def fingerprint(self) -> str:
+        """
+        所有分片的记录文件和索引的指纹, 见``record_fingerprint``.
+        """
+        return record_fingerprint(
+            (os.path.splitext(filename)[0] + '.idx', filename)
+            for filename in self.filenames
+        )
+
+    @property
+    def text_lengths(self) -> Optional[np.ndarray]:
+        """
+        Token counts stored in the shard indexes, or None if any shard has
+        a legacy index.
+        """
+        lengths = []
+        for shard in range(len(self.filenames)):
+            shard_lengths = self._shard(shard).text_lengths
+            if shard_lengths is None:
+                return None
+            lengths.append(shard_lengths)
+        return np.concatenate(lengths)
+
+    def shard(
+        self, num_parts: int, part_index: int
+    ) -> 'ShardedRecordFileDataset':
+        """
+        Assign whole shards to ``num_parts`` parts and return the dataset of
+        part ``part_index``, so each process only opens its own files.
+
+        Shards are assigned from the largest to the part with the fewest
+        records so far, which keeps the parts balanced. The assignment only
+        depends on the shard list, so every process computes the same one.
+        """
+        assert len(self.filenames) >= num_parts, (
+            f'{len(self.filenames)} shards can not be split into '
+            f'{num_parts} parts'
+        )
+        totals = np.zeros(num_parts, dtype=np.int64)
+        parts = np.zeros(len(self.filenames), dtype=np.int64)
+        for shard in np.argsort(-self.counts, kind='stable'):
+            part = int(np.argmin(totals))
+            parts[shard] = part
+            totals[part] += self.counts[shard]
+        dataset = ShardedRecordFileDataset(
+            [
+                filename for filename, part in zip(self.filenames, parts)
+                if part == part_index
+            ],
+            use_mmap=self._use_mmap
+        )
+        dataset._counts = self.counts[parts == part_index]
+        return dataset
+
+
+class StreamDataset:
+    """
+    A streaming dataset over one or more ``RecordIO`` or text files.
+
+    Records are read sequentially and never held in memory all at once, so
+    memory stays flat regardless of the corpus size. ``RecordIO`` files
+    (``.rec``) are memory-mapped and parsed sequentially; when a sibling
+    ``.idx`` exists, reading stops at its last committed record, otherwise
+    at the last complete record. Any other file is read as text with one
+    record per line. The dataset has no ``len()`` and no random access.
+
+    Parameters
+    ----------
+    filenames : ``str`` or ``Sequence[str]``
+        Paths to the files, read in the given order.
+    shuffle_buffer_size : ``int``
+        Number of samples buffered by ``StreamBatchSampler`` for shuffling
+        and approximate bucketing.
+    """
+
+    is_streaming = True
+
+    def __init__(
+        self, filenames: Sequence[str], shuffle_buffer_size: int = 100000
+    ) -> None:
+        if isinstance(filenames, str):
+            filenames = [filenames]
+        self.filenames = list(filenames)
+        self.shuffle_buffer_size = shuffle_buffer_size
+
+    @staticmethod
+    def _iter_record_file(filename: str) -> Iterator[str]:
+        with open(filename, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(buf)
+        end = len(view)
+        idx_file = os.path.splitext(filename)[0] + '.idx'
+        if os.path.exists(idx_file):
+            # 追加中断时, 索引之后的记录未提交
+            end = min(end, RecordIndex.load(
+                idx_file, filename, file_size=end
+            ).committed_end)
+        pos = 0
+        try:
+            while pos < end:
+                try:
+                    record, next_pos = _read_record(view, pos)
+                except struct.error:
+                    # 文件末尾的记录头不完整
+                    break
+                if next_pos > end:
+                    # 文件末尾的记录数据不完整
+                    del record
+                    break
+                pos = next_pos
+                yield str(record, 'utf-8')
+                del record
+        finally:
+            view.release()
+            buf.close()
+
+    @staticmethod
+    def _iter_text_file(filename: str) -> Iterator[str]:
+        with open(filename, encoding='utf-8') as f:
+            for line in f:
+                yield line.rstrip('\n')
+
+    def __iter__(self) -> Iterator[str]:
+        for filename in self.filenames:
+            if os.path.splitext(filename)[1] == '.rec':
+                yield from self._iter_record_file(filename)
+            else:
+                yield from self._iter_text_file(filename)
 
 
 class InMemoryDataset(Dataset):
@@ -56,6 +442,76 @@ class InMemoryDataset(Dataset):
         return len(self._record)
 
 
+class ColumnarDataset(Dataset):
+    """
+    A columnar in-memory dataset.
+
+    Each column is stored as one contiguous UTF-8 buffer plus an offsets
+    array, instead of one Python string per row, and each sample is a
+    tuple of the column values. Columns are never joined into a
+    tab-separated row, so texts may contain tabs.
+
+    Parameters
+    ----------
+    columns : ``Sequence[str]``
+        Columns of the dataset, e.g. texts and labels.
+    """
+
+    def __init__(self, *columns: Sequence[str]) -> None:
+        assert len(columns) > 0, 'At least one column is required.'
+        assert len(set(len(column) for column in columns)) == 1, (
+            'All columns must have the same length.'
+        )
+        self._buffers: List[bytes] = []
+        self._offsets: List[np.ndarray] = []
+        for column in columns:
+            encoded = [value.encode('utf-8') for value in column]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            self._buffers.append(b''.join(encoded))
+            self._offsets.append(offsets)
+            del encoded
+
+    def _value(self, column: int, idx: int) -> str:
+        offsets = self._offsets[column]
+        return self._buffers[column][offsets[idx]:offsets[idx + 1]].decode(
+            'utf-8'
+        )
+
+    def __getitem__(self, idx: int) -> Tuple[str, ...]:
+        if idx < 0:
+            idx += len(self)
+        return tuple(
+            self._value(column, idx) for column in range(len(self._buffers))
+        )
+
+    def __len__(self) -> int:
+        return len(self._offsets[0]) - 1
+
+    def fingerprint(self) -> str:
+        """
+        所有列内容的指纹.
+        """
+        sha = hashlib.sha1()
+        for buffer, offsets in zip(self._buffers, self._offsets):
+            sha.update(offsets.tobytes())
+            sha.update(buffer)
+        return sha.hexdigest()
+
+
+# 并行扫描时子进程通过fork继承的数据集
+_SCAN_DATASET = None
+
+# 扫描时一个分片的标签: 分片内的标签表, 以分片内标签表编码的扁平id数组
+# 和offsets数组(CSR格式)
+LabelShard = Tuple[List[str], np.ndarray, np.ndarray]
+ScanResult = Tuple[Counter, Counter, List[int], Optional[LabelShard]]
+
+
+def _scan_range(args: Tuple[int, int, bool, bool, bool, bool]) -> ScanResult:
+    return _SCAN_DATASET._scan_range(*args)
+
+
 class NLPDataset:
     """
     实现了基本的NLP预处理, 来预处理``Dataset``.
@@ -72,61 +528,497 @@ class NLPDataset:
         一组分词器
     max_length: int, optional
         文本截断长度
+    cache_dir: str, optional
+        预处理结果的缓存目录, 如果不为None, 第一次使用时将构建的词汇表,
+        文本长度和分词查表的结果写入缓存, 之后直接从缓存读取,
+        不再扫描数据集和分词. 缓存保存在以数据集内容指纹, 分词器,
+        文本截断长度和给定的词汇表共同决定的key命名的子目录中,
+        任意一项变化时使用新的缓存.
+    n_jobs: int, optional
+        统计词频和文本长度时使用的进程数.
+        词汇表, 标签表和文本长度在一次分片扫描中得到, 各进程的计数最后合并.
+        分词器为``Segmenter``时, 生成缓存和批量读取样本也通过
+        ``Segmenter.cut_batch``用同样数量的进程分词.
+    sample_cache_bytes: int, optional
+        预处理后样本的内存缓存大小(字节数), 为None时不缓存.
+        样本以int32数组缓存, 超出大小时淘汰最久未使用的样本,
+        多次遍历同一数据集(如验证集)时只在第一次预处理.
+        缓存在当前进程中, ``prefetch``使用的子进程中的缓存不会保留.
+    vocab_sketch_size: int, optional
+        如果不为None, 构建词汇表时用``TokenSketch``近似统计词频,
+        计数表的大小不超过该值的两倍, 词汇表保留估计频率最高的
+        ``vocab_sketch_size``个token. 高频token的计数是精确的或误差有界,
+        适合长尾token很多的大语料. 各进程的sketch在并行扫描后合并.
+    max_vocab_size: int, optional
+        构建的词汇表最多保留的token数(不含保留token), 为None时不限制
+    min_freq: int
+        构建的词汇表中token的最小频率
+    num_oov_buckets: int
+        词汇表外token的哈希桶数, 见``Vocab``. 为0时词汇表外的token
+        都映射为``<unk>``
+
+    ``dataset``也可以是``StreamDataset``这样只能顺序迭代的数据集,
+    此时数据集没有长度, 只能通过迭代读取样本, 构建词汇表时顺序扫描一遍,
+    不保存文本长度.
     """
 
+    # 读取原始数据或生成缓存时每次批量读取的样本数
+    READ_CHUNK_SIZE = 1024
+    # 并行扫描时每个进程分到的分片数
+    SHARDS_PER_JOB = 4
+    # 与数值化结果一起缓存的词汇表文件名
+    VOCAB_FILE = 'vocab.json'
+
     def __init__(
         self,
         dataset: Dataset,
         vocab: Optional[Vocab] = None,
         segmenter: Optional[Callable[[str], List[str]]] = None,
-        max_length: Optional[int] = 100
+        max_length: Optional[int] = 100,
+        cache_dir: Optional[str] = None,
+        n_jobs: int = 1,
+        sample_cache_bytes: Optional[int] = None,
+        vocab_sketch_size: Optional[int] = None,
+        max_vocab_size: Optional[int] = None,
+        min_freq: int = 1,
+        num_oov_buckets: int = 0
+    ) -> None:
+        self._init_preprocess(
+            dataset, segmenter, max_length, n_jobs, sample_cache_bytes,
+            vocab_sketch_size, max_vocab_size, min_freq, num_oov_buckets
+        )
+        self._cache = None
+        cache = None
+        if cache_dir is not None:
+            cache = self._open_cache(cache_dir, vocab)
+        if cache is not None and cache.is_valid(len(self)):
+            self._restore_from_cache(cache)
+        elif vocab is None:
+            token_counter, _, self._text_lengths, _ = self._scan(
+                count_tokens=True, compute_lengths=not self.is_streaming
+            )
+            self._vocab = self._make_vocab(token_counter)
+        else:
+            self._vocab = vocab
+        if cache is not None:
+            self._build_cache(cache)
+
+    @property
+    def is_streaming(self) -> bool:
+        return getattr(self._dataset, 'is_streaming', False)
+
+    @property
+    def shuffle_buffer_size(self) -> Optional[int]:
+        return getattr(self._dataset, 'shuffle_buffer_size', None)
+
+    @property
+    def is_sharded(self) -> bool:
+        return getattr(self._dataset, 'is_sharded', False)
+
+    def shard(self, num_parts: int, part_index: int) -> 'NLPDataset':
+        """
+        按底层数据集的分片切分, 返回第``part_index``部分的数据集.
+
+        返回的数据集共用词汇表和标签表, 文本长度在使用时重新读取.
+        缓存按全局下标保存, 所以切分后的数据集不使用缓存.
+        """
+        assert self.is_sharded, 'The dataset is not sharded.'
+        part = copy.copy(self)
+        part._dataset = self._dataset.shard(num_parts, part_index)
+        part._text_lengths = []
+        part._cache = None
+        if self._sample_cache is not None:
+            part._sample_cache = SampleCache(self._sample_cache_bytes)
+        return part
+
+    def _init_preprocess(
+        self,
+        dataset: Dataset,
+        segmenter: Optional[Callable[[str], List[str]]],
+        max_length: Optional[int],
+        n_jobs: int,
+        sample_cache_bytes: Optional[int] = None,
+        vocab_sketch_size: Optional[int] = None,
+        max_vocab_size: Optional[int] = None,
+        min_freq: int = 1,
+        num_oov_buckets: int = 0
     ) -> None:
         self._dataset = dataset
+        self._vocab_sketch_size = vocab_sketch_size
+        self._max_vocab_size = max_vocab_size
+        self._min_freq = min_freq
+        self._num_oov_buckets = num_oov_buckets
         if segmenter is None:
             self._segmenter = list
         else:
             self._segmenter = segmenter
+        # 按字切分时用``CharTable``查表, 不逐字生成字符串
+        self._char_level = segmenter_name(self._segmenter) == 'char'
+        self._char_table: Optional[CharTable] = None
         self._max_length = max_length
-
-        n_samples = len(dataset)
-        token_counter = Counter()
+        self._n_jobs = n_jobs
+        self._sample_cache_bytes = sample_cache_bytes
+        self._sample_cache = None
+        if sample_cache_bytes is not None:
+            self._sample_cache = SampleCache(sample_cache_bytes)
         self._text_lengths: List[int] = []
-        for i in range(n_samples):
-            row = dataset[i]
-            text = self._split_row(row)[0]
-            if vocab is None:
+
+    def _token_counter(self) -> Union[Counter, TokenSketch]:
+        if self._vocab_sketch_size is None:
+            return Counter()
+        return TokenSketch(self._vocab_sketch_size)
+
+    def _make_vocab(self, token_counter: Union[Counter, TokenSketch]) -> Vocab:
+        if isinstance(token_counter, TokenSketch):
+            token_counter = token_counter.counter()
+        return Vocab(
+            token_counter, max_size=self._max_vocab_size,
+            min_freq=self._min_freq, num_buckets=self._num_oov_buckets
+        )
+
+    def _vocab_options(self) -> Dict[str, Any]:
+        """
+        构建词汇表的参数, 词汇表由数据集构建时作为缓存key的一部分.
+        """
+        return {
+            'sketch_size': self._vocab_sketch_size,
+            'max_size': self._max_vocab_size,
+            'min_freq': self._min_freq,
+            'num_buckets': self._num_oov_buckets
+        }
+
+    def _text_length(self, text: str, words: List[str]) -> int:
+        """
+        截断后的文本分词长度, 与``preprocess_text``的结果长度一致.
+        """
+        if self._max_length is None or len(text) <= self._max_length:
+            return len(words)
+        return len(self._segmenter(text[:self._max_length]))
+
+    def _iter_rows(self, start: int, end: int) -> Iterator[str]:
+        for chunk_start in range(start, end, self.READ_CHUNK_SIZE):
+            chunk_end = min(chunk_start + self.READ_CHUNK_SIZE, end)
+            yield from self._read_rows(range(chunk_start, chunk_end))
+
+    def _scan_range(
+        self, start: int, end: int, count_tokens: bool = False,
+        count_labels: bool = False, compute_lengths: bool = False,
+        encode_labels: bool = False
+    ) -> ScanResult:
+        return self._scan_rows(
+            self._iter_rows(start, end),
+            count_tokens, count_labels, compute_lengths, encode_labels
+        )
+
+    def _scan_rows(
+        self, rows: Iterable[str], count_tokens: bool = False,
+        count_labels: bool = False, compute_lengths: bool = False,
+        encode_labels: bool = False
+    ) -> ScanResult:
+        token_counter, label_counter = self._token_counter(), Counter()
+        lengths: List[int] = []
+        # 标签先以分片内的标签表编码, 扫描结束后再映射为全局的标签id
+        label_table: Dict[str, int] = dict()
+        label_ids = array('i')
+        label_offsets = array('q', [0])
+        for row in rows:
+            fields = self._split_row(row)
+            text = fields[0]
+            if count_tokens:
                 words = self._segmenter(text)
-                self._text_lengths.append(len(words))
                 token_counter.update(words)
-        if vocab is None:
-            self._vocab = Vocab(token_counter)
+                if compute_lengths:
+                    lengths.append(self._text_length(text, words))
+            elif compute_lengths:
+                lengths.append(
+                    len(self._segmenter(text[:self._max_length]))
+                )
+            if count_labels:
+                label_counter.update(fields[1].split('|'))
+            if encode_labels:
+                label_ids.extend(
+                    label_table.setdefault(label, len(label_table))
+                    for label in self._label_tokens(fields[1])
+                )
+                label_offsets.append(len(label_ids))
+        labels = None
+        if encode_labels:
+            labels = (
+                list(label_table),
+                np.frombuffer(label_ids, dtype=np.int32)
+                if label_ids else np.zeros(0, dtype=np.int32),
+                np.frombuffer(label_offsets, dtype=np.int64)
+            )
+        return token_counter, label_counter, lengths, labels
+
+    def _scan(
+        self, count_tokens: bool = False, count_labels: bool = False,
+        compute_lengths: bool = False, encode_labels: bool = False
+    ) -> Tuple[Counter, Counter, List[int], List[LabelShard]]:
+        """
+        单次扫描数据集, 得到词频, 标签频率, 文本长度和各分片编码后的标签.
+
+        ``n_jobs > 1``时数据集被切分为连续的分片, 由fork出的进程池并行扫描,
+        各分片的计数合并, 长度按分片顺序拼接. 流式数据集只能顺序扫描.
+        """
+        global _SCAN_DATASET
+        if self.is_streaming:
+            token_counter, label_counter, lengths, _ = self._scan_rows(
+                self._dataset, count_tokens, count_labels, compute_lengths
+            )
+            return token_counter, label_counter, lengths, []
+        n_samples = len(self)
+        n_shards = max(1, min(n_samples, self._n_jobs * self.SHARDS_PER_JOB))
+        bounds = np.linspace(0, n_samples, n_shards + 1, dtype=np.int64)
+        tasks = [
+            (
+                int(start), int(end), count_tokens, count_labels,
+                compute_lengths, encode_labels
+            )
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+        if self._n_jobs <= 1 or n_samples < 2:
+            results = [self._scan_range(*task) for task in tasks]
         else:
-            self._vocab = vocab
+            _SCAN_DATASET = self
+            try:
+                context = multiprocessing.get_context('fork')
+                with context.Pool(self._n_jobs) as pool:
+                    results = pool.map(_scan_range, tasks)
+            finally:
+                _SCAN_DATASET = None
+
+        token_counter, label_counter = self._token_counter(), Counter()
+        lengths: List[int] = []
+        label_shards: List[LabelShard] = []
+        for shard_tokens, shard_labels, shard_lengths, labels in results:
+            token_counter.update(shard_tokens)
+            label_counter.update(shard_labels)
+            lengths.extend(shard_lengths)
+            if labels is not None:
+                label_shards.append(labels)
+        return token_counter, label_counter, lengths, label_shards
+
+    def _fingerprint(self) -> str:
+        """
+        数据集内容的指纹. 底层数据集实现了``fingerprint``时直接使用
+        (例如按文件内容计算), 否则逐行读取计算.
+        """
+        sha = hashlib.sha1(type(self).__name__.encode('utf-8'))
+        fingerprint = getattr(self._dataset, 'fingerprint', None)
+        if fingerprint is not None:
+            sha.update(fingerprint().encode('utf-8'))
+            return sha.hexdigest()
+        for row in self._iter_rows(0, len(self)):
+            sha.update('\x00'.join(self._split_row(row)).encode('utf-8'))
+            sha.update(b'\n')
+        return sha.hexdigest()
+
+    def _open_cache(
+        self, cache_dir: str, vocab: Optional[Vocab],
+        label2idx: Optional[Dict[str, int]] = None
+    ) -> TokenCache:
+        """
+        ``cache_dir``下的缓存, 子目录名为数据集指纹, 分词器, 文本截断长度
+        和给定的词汇表, 标签表(为None时表示由数据集构建)共同决定的key.
+        """
+        assert not self.is_streaming, 'Cannot cache a streaming dataset.'
+        key = make_cache_key(
+            vocab, self._segmenter, self._max_length, label2idx,
+            fingerprint=self._fingerprint(),
+            vocab_options=self._vocab_options() if vocab is None else None
+        )
+        return TokenCache(os.path.join(cache_dir, key), key)
+
+    def _restore_from_cache(self, cache: TokenCache) -> None:
+        """
+        从缓存读取构建好的词汇表, 不再扫描数据集.
+        """
+        self._vocab = Vocab.from_json(cache.read_extra(self.VOCAB_FILE))
+
+    def _cache_extras(self) -> Dict[str, str]:
+        return {self.VOCAB_FILE: self._vocab.to_json()}
+
+    def _build_cache(self, cache: TokenCache) -> None:
+        if not cache.is_valid(len(self)):
+            cache.compile((
+                entry
+                for start in range(0, len(self), self.READ_CHUNK_SIZE)
+                for entry in self._cache_entries(self._read_rows(range(
+                    start, min(start + self.READ_CHUNK_SIZE, len(self))
+                )))
+            ), self._cache_extras())
+        cache.load()
+        self._cache = cache
+        self._text_lengths = cache.text_lengths
+
+    def _cache_entries(
+        self, rows: Sequence[str]
+    ) -> List[Tuple[Sequence[int], Optional[np.ndarray]]]:
+        fields = [self._split_row(row) for row in rows]
+        texts = self.preprocess_texts([f[0] for f in fields])
+        return [
+            self._cache_entry(text, *f[1:]) for text, f in zip(texts, fields)
+        ]
+
+    def _cache_entry(
+        self, text_ids: Sequence[int], *args
+    ) -> Tuple[Sequence[int], Optional[np.ndarray]]:
+        return text_ids, None
 
     @property
     def text_lengths(self) -> List[int]:
         if len(self._text_lengths) != len(self):
-            self._text_lengths = [len(words) for words in self]
+            self._text_lengths = self._dataset_text_lengths()
+        if len(self._text_lengths) != len(self):
+            _, _, self._text_lengths, _ = self._scan(compute_lengths=True)
         return self._text_lengths
 
-    def _split_row(self, row: str) -> List[str]:
+    def _dataset_text_lengths(self) -> List[int]:
+        """
+        底层数据集(如带v2索引的``RecordFileDataset``)预先计算好的文本长度,
+        不需要读取和预处理记录.
+
+        索引中的长度是第一列文本的字符数, 只有按字切分时才等于分词长度,
+        其他分词器返回空列表, 由扫描数据集得到.
+        """
+        if not self._char_level:
+            return []
+        lengths = getattr(self._dataset, 'text_lengths', None)
+        if lengths is None:
+            return []
+        if self._max_length is not None:
+            lengths = np.minimum(lengths, self._max_length)
+        return np.asarray(lengths).tolist()
+
+    def _split_row(self, row: Union[str, Tuple[str, ...]]) -> Sequence[str]:
+        """
+        将一行切分为列, ``ColumnarDataset``的样本已经按列保存, 直接返回.
+        """
+        if isinstance(row, tuple):
+            return row
         return row.split('\t')
 
-    def preprocess_text(self, text: str) -> List[int]:
+    def _char_lookup(self) -> Optional[CharTable]:
+        if not self._char_level:
+            return None
+        if self._char_table is None or self._char_table._vocab is not (
+            self._vocab
+        ):
+            self._char_table = CharTable(self._vocab)
+        return self._char_table
+
+    def preprocess_text(self, text: str) -> Sequence[int]:
+        """
+        分词并查表, 按字切分时返回int32数组.
+        """
+        char_table = self._char_lookup()
+        if char_table is not None:
+            return char_table.encode(text[:self._max_length])
         return self._vocab[self._segmenter(text[:self._max_length])]
 
+    def preprocess_texts(
+        self, texts: Sequence[str], n_jobs: Optional[int] = None
+    ) -> List[Sequence[int]]:
+        """
+        批量分词并查表, 按字切分时所有文本一次查表,
+        否则通过``Segmenter.cut_batch``用``n_jobs``(默认为数据集的
+        ``n_jobs``)个进程分词.
+        """
+        char_table = self._char_lookup()
+        if char_table is not None:
+            return char_table.split_batch(texts, max_length=self._max_length)
+        if self._max_length is not None:
+            texts = [text[:self._max_length] for text in texts]
+        token_lists = self._cut_batch(
+            texts, self._n_jobs if n_jobs is None else n_jobs
+        )
+        lookup_batch = getattr(self._vocab, 'lookup_batch', None)
+        if lookup_batch is None:
+            return [self._vocab[tokens] for tokens in token_lists]
+        # 一次查表, 每个样本是同一个int32数组的切片
+        ids, offsets = lookup_batch(token_lists)
+        return np.split(ids, offsets[1:-1])
+
+    def _cut_batch(
+        self, texts: Sequence[str], n_jobs: int = 1
+    ) -> List[List[str]]:
+        owner = getattr(self._segmenter, '__self__', self._segmenter)
+        cut_batch = getattr(owner, 'cut_batch', None)
+        if cut_batch is None:
+            return [self._segmenter(text) for text in texts]
+        return cut_batch(texts, n_jobs=n_jobs)
+
     def preprocess_func(self, text: str, *args) -> List[int]:
         processed_text = self.preprocess_text(text)
         return processed_text
 
     def __iter__(self):
+        if self.is_streaming:
+            for row in self._dataset:
+                yield self.preprocess_func(*self._split_row(row))
+            return
         for i in range(len(self)):
             yield self[i]
 
     def __getitem__(self, idx: int) -> List[int]:
+        if self._sample_cache is None:
+            return self._get_sample(idx)
+        if idx < 0:
+            idx += len(self)
+        sample = self._sample_cache.get(idx)
+        if sample is None:
+            sample = self._sample_cache.put(idx, self._get_sample(idx))
+        return sample
+
+    def _get_sample(self, idx: int) -> List[int]:
+        if self._cache is not None:
+            return self._cache[idx][0]
         return self.preprocess_func(*self._split_row(self._dataset[idx]))
 
+    def _read_rows(self, indices: Sequence[int]) -> List[str]:
+        if hasattr(self._dataset, 'read_batch'):
+            return self._dataset.read_batch(indices)
+        return [self._dataset[idx] for idx in indices]
+
+    def read_batch(self, indices: Sequence[int]) -> List:
+        """
+        批量读取并预处理``indices``对应的样本.
+
+        底层数据集支持``read_batch``时, 使用合并后的批量读取.
+        使用样本缓存时只读取缓存中没有的样本.
+        """
+        if self._sample_cache is None:
+            return self._read_samples(indices)
+        indices = [int(idx) for idx in indices]
+        samples = [self._sample_cache.get(idx) for idx in indices]
+        missing = [i for i, sample in enumerate(samples) if sample is None]
+        if missing:
+            for i, sample in zip(missing, self._read_samples(
+                [indices[i] for i in missing]
+            )):
+                samples[i] = self._sample_cache.put(indices[i], sample)
+        return samples
+
+    def _read_samples(self, indices: Sequence[int]) -> List:
+        if self._cache is not None:
+            return [self._get_sample(idx) for idx in indices]
+        return self.preprocess_texts([
+            self._split_row(row)[0] for row in self._read_rows(indices)
+        ])
+
+    def cache_info(self) -> Optional[Dict[str, int]]:
+        """
+        样本缓存的命中次数, 未命中次数, 样本数和占用字节数,
+        没有使用样本缓存时返回None.
+        """
+        if self._sample_cache is None:
+            return None
+        return self._sample_cache.cache_info()
+
     def __len__(self) -> int:
+        if self.is_streaming:
+            raise TypeError('A streaming dataset has no len().')
         return len(self._dataset)
 
 
@@ -146,40 +1038,81 @@ class SupervisedNLPDataset(NLPDataset):
         一组分词器
     max_length: int, optional
         文本截断长度
+    cache_dir: str, optional
+        预处理结果的缓存目录, 缓存中同时保存构建的标签表和标签id,
+        缓存的key同时由给定的标签表决定
+    n_jobs: int, optional
+        统计词频, 标签和文本长度时使用的进程数.
+        扫描数据集时同时将标签转换为id, 以CSR格式保存.
+        词汇表和标签表都给定时不扫描数据集, 文本长度在使用时并行计算,
+        标签在读取样本时按批次转换.
+        批量读取样本时也用同样数量的进程分词, 见``NLPDataset``.
+    sample_cache_bytes: int, optional
+        预处理后样本的内存缓存大小(字节数), 为None时不缓存
+    vocab_sketch_size: int, optional
+        近似统计词频的sketch大小, 见``NLPDataset``
+    max_vocab_size, min_freq, num_oov_buckets:
+        构建词汇表的大小限制和哈希桶数, 见``NLPDataset``
     """
 
+    # 与数值化结果一起缓存的标签表文件名
+    LABEL_FILE = 'label2idx.json'
+    # 是否忽略标签表中没有的标签, 为False时遇到这样的标签抛出KeyError
+    IGNORE_UNKNOWN_LABELS = False
+
     def __init__(
         self,
         dataset: Dataset,
         vocab: Optional[Vocab] = None,
         label2idx: Optional[Dict[str, int]] = None,
         segmenter: Optional[Callable[[str], List[str]]] = None,
-        max_length: Optional[int] = 100
+        max_length: Optional[int] = 100,
+        cache_dir: Optional[str] = None,
+        n_jobs: int = 1,
+        sample_cache_bytes: Optional[int] = None,
+        vocab_sketch_size: Optional[int] = None,
+        max_vocab_size: Optional[int] = None,
+        min_freq: int = 1,
+        num_oov_buckets: int = 0
     ) -> None:
-        self._dataset = dataset
-        if segmenter is None:
-            self._segmenter = list
+        self._init_preprocess(
+            dataset, segmenter, max_length, n_jobs, sample_cache_bytes,
+            vocab_sketch_size, max_vocab_size, min_freq, num_oov_buckets
+        )
+        self._cache = None
+        self._label_ids: Optional[np.ndarray] = None
+        self._label_offsets: Optional[np.ndarray] = None
+        cache = None
+        if cache_dir is not None:
+            cache = self._open_cache(cache_dir, vocab, label2idx)
+        if cache is not None and cache.is_valid(len(self)):
+            self._restore_from_cache(cache)
         else:
-            self._segmenter = segmenter
-        self._max_length = max_length
+            self._build_vocab_and_labels(vocab, label2idx)
+        self._idx2label = {v: k for k, v in self._label2idx.items()}
+        if cache is not None:
+            self._build_cache(cache)
 
-        n_samples = len(dataset)
-        token_counter = Counter()
-        label_counter = Counter()
-        self._text_lengths: List[int] = []
-        for i in range(n_samples):
-            row = dataset[i]
-            text, label = self._split_row(row)[:2]
-            if vocab is None:
-                words = self._segmenter(text)
-                self._text_lengths.append(len(words))
-                token_counter.update(words)
-            if label2idx is None:
-                labels = label.split('|')
-                label_counter.update(labels)
-        del label_counter['']
+    def _build_vocab_and_labels(
+        self, vocab: Optional[Vocab], label2idx: Optional[Dict[str, int]]
+    ) -> None:
+        """
+        扫描数据集, 构建没有给定的词汇表和标签表,
+        同一次扫描中将所有样本的标签转换为id.
+        """
+        label_shards: List[LabelShard] = []
+        if vocab is None or label2idx is None:
+            (
+                token_counter, label_counter, self._text_lengths,
+                label_shards
+            ) = self._scan(
+                count_tokens=vocab is None, count_labels=label2idx is None,
+                compute_lengths=vocab is None and not self.is_streaming,
+                encode_labels=not self.is_streaming
+            )
+            del label_counter['']
         if vocab is None:
-            self._vocab = Vocab(token_counter)
+            self._vocab = self._make_vocab(token_counter)
         else:
             self._vocab = vocab
         if label2idx is None:
@@ -188,51 +1121,141 @@ class SupervisedNLPDataset(NLPDataset):
             self._label2idx = dict(zip(label_list, range(len(label_list))))
         else:
             self._label2idx = label2idx
-        self._idx2label = {v: k for k, v in self._label2idx.items()}
+        if label_shards:
+            self._merge_labels(label_shards)
+
+    def _merge_labels(self, label_shards: Sequence[LabelShard]) -> None:
+        """
+        将扫描得到的各分片标签映射为全局的标签id,
+        以CSR格式(扁平的int32 id数组和offsets数组)保存, 读取样本时不再解析标签.
+        """
+        ids_list, counts_list = [], []
+        for labels, local_ids, offsets in label_shards:
+            table = np.array(
+                [self._label2idx.get(label, -1) for label in labels],
+                dtype=np.int32
+            )
+            ids = table[local_ids]
+            counts = np.diff(offsets)
+            known = ids >= 0
+            if not known.all():
+                if not self.IGNORE_UNKNOWN_LABELS:
+                    raise KeyError(labels[local_ids[~known][0]])
+                rows = np.repeat(np.arange(len(counts)), counts)
+                counts = np.bincount(rows[known], minlength=len(counts))
+                ids = ids[known]
+            ids_list.append(ids)
+            counts_list.append(counts)
+        counts = np.concatenate(counts_list)
+        self._label_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self._label_offsets[1:])
+        self._label_ids = np.concatenate(ids_list)
+
+    def _encode_label_batch(self, labels: Sequence[str]) -> List[np.ndarray]:
+        """
+        将一批样本的标签转换为id, 写入预先分配的int32数组,
+        每个样本的标签id是该数组的切片.
+        """
+        label_lists = [self._known_label_tokens(label) for label in labels]
+        offsets = np.zeros(len(label_lists) + 1, dtype=np.int64)
+        np.cumsum([len(l) for l in label_lists], out=offsets[1:])
+        ids = np.fromiter(
+            (self._label2idx[l] for l in itertools.chain(*label_lists)),
+            dtype=np.int32, count=int(offsets[-1])
+        )
+        return np.split(ids, offsets[1:-1])
 
-    @property
-    def text_lengths(self) -> List[int]:
-        if len(self._text_lengths) != len(self):
-            self._text_lengths = [len(words) for words, label in self]
-        return self._text_lengths
+    def _label(self, idx: int) -> np.ndarray:
+        if idx < 0:
+            idx += len(self)
+        return self._label_ids[
+            self._label_offsets[idx]:self._label_offsets[idx + 1]
+        ]
+
+    def shard(self, num_parts: int, part_index: int) -> 'NLPDataset':
+        part = super().shard(num_parts, part_index)
+        # 预先转换的标签按全局下标保存, 切分后的数据集按批次转换
+        part._label_ids = None
+        part._label_offsets = None
+        return part
+
+    def _restore_from_cache(self, cache: TokenCache) -> None:
+        super()._restore_from_cache(cache)
+        self._label2idx = json.loads(cache.read_extra(self.LABEL_FILE))
+
+    def _cache_extras(self) -> Dict[str, str]:
+        extras = super()._cache_extras()
+        extras[self.LABEL_FILE] = json.dumps(
+            self._label2idx, ensure_ascii=False
+        )
+        return extras
+
+    def _cache_entry(
+        self, text_ids: Sequence[int], label: str, *args
+    ) -> Tuple[Sequence[int], np.ndarray]:
+        return text_ids, self.label_ids(label)
 
     def idx2tokens(self, idx_list: List[int]) -> List[str]:
         return self._vocab.to_tokens(idx_list)
 
-    def preprocess_label(self, label: str) -> List[int]:
-        return [self._label2idx[l] for l in label.split('|')]
+    def _label_tokens(self, label: str) -> List[str]:
+        """
+        样本的标签列切分后的标签, 与标签表无关.
+        """
+        return label.split('|')
+
+    def _known_label_tokens(self, label: str) -> List[str]:
+        labels = self._label_tokens(label)
+        if self.IGNORE_UNKNOWN_LABELS:
+            return [l for l in labels if l in self._label2idx]
+        return labels
+
+    def label_ids(self, label: str) -> np.ndarray:
+        return np.array(
+            [self._label2idx[l] for l in self._known_label_tokens(label)],
+            dtype=np.int32
+        )
+
+    def preprocess_label(self, label: str) -> np.ndarray:
+        return self.label_ids(label)
 
     def preprocess_func(
         self, text: str, label: str, *args
-    ) -> Tuple[List[int], List[int]]:
+    ) -> Tuple[List[int], np.ndarray]:
         processed_text = self.preprocess_text(text)
         processed_label = self.preprocess_label(label)
         return processed_text, processed_label
 
-    def __getitem__(self, idx: int) -> Tuple[List[int], List[int]]:
-        return self.preprocess_func(*self._split_row(self._dataset[idx]))
+    def _get_sample(self, idx: int) -> Tuple[List[int], np.ndarray]:
+        if self._cache is not None:
+            return self._cache[idx]
+        fields = self._split_row(self._dataset[idx])
+        if self._label_ids is None:
+            return self.preprocess_func(*fields)
+        return self.preprocess_text(fields[0]), self._label(idx)
+
+    def _read_samples(
+        self, indices: Sequence[int]
+    ) -> List[Tuple[List[int], np.ndarray]]:
+        if self._cache is not None:
+            return [self._get_sample(idx) for idx in indices]
+        rows = [self._split_row(row) for row in self._read_rows(indices)]
+        texts = self.preprocess_texts([fields[0] for fields in rows])
+        if self._label_ids is None:
+            labels = self._encode_label_batch([fields[1] for fields in rows])
+        else:
+            labels = [self._label(idx) for idx in indices]
+        return list(zip(texts, labels))
 
 
 class ClassifyDataset(SupervisedNLPDataset):
+    """
+    分类数据集, 样本的标签为标签id数组,
+    在组成批次时由``MultiHot``转换为multi-hot矩阵.
+    标签表中没有的标签被忽略.
+    """
 
-    def __init__(
-        self,
-        dataset: Dataset,
-        vocab: Optional[Vocab] = None,
-        label2idx: Optional[Dict[str, int]] = None,
-        segmenter: Optional[Callable[[str], List[str]]] = None,
-        max_length: Optional[int] = 100
-    ) -> None:
-        super().__init__(
-            dataset, vocab=vocab, label2idx=label2idx,
-            segmenter=segmenter, max_length=max_length
-        )
-        self._binarizer = MultiLabelBinarizer([
-            self._idx2label[i] for i in range(len(self._label2idx))
-        ])
-
-    def preprocess_label(self, label: str) -> List[int]:
-        return self._binarizer.fit_transform([label.split('|')])[0].tolist()
+    IGNORE_UNKNOWN_LABELS = True
 
     def idx2labels(self, idx_list: List[int]) -> List[str]:
         return [self._idx2label[i] for i in idx_list if i in self._idx2label]
@@ -240,10 +1263,8 @@ class ClassifyDataset(SupervisedNLPDataset):
 
 class SequenceTagDataset(SupervisedNLPDataset):
 
-    def preprocess_label(self, label: str) -> List[int]:
-        return [
-            self._label2idx[l] for l in label.split('|')[:self._max_length]
-        ]
+    def _label_tokens(self, label: str) -> List[str]:
+        return label.split('|')[:self._max_length]
 
     def idx2labels(self, idx_list: List[int]) -> List[str]:
         return [self._idx2label.get(i, 'O') for i in idx_list]
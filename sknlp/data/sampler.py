@@ -5,6 +5,28 @@ from gluonnlp.data.sampler import SplitSampler as RandomSampler
 from gluonnlp.data.sampler import FixedBucketSampler
 
 
+def _chunks(sampler, size):
+    it = iter(sampler)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _read_batches(dataset, batches):
+    """
+    按批读取样本, 数据集支持``read_batch``时一次读取整批.
+    """
+    if hasattr(dataset, 'read_batch'):
+        return itertools.chain.from_iterable(
+            dataset.read_batch(batch_idx) for batch_idx in batches
+        )
+    return itertools.chain.from_iterable(
+        (dataset[idx] for idx in batch_idx) for batch_idx in batches
+    )
+
+
 class SequentialSampler(RandomSampler):
 
     def __iter__(self):
@@ -98,12 +120,10 @@ class BatchSampler:
 
     def __iter__(self):
         if isinstance(self._sampler, BucketSampler):
-            corpus = itertools.chain.from_iterable(
-                (self._dataset[idx] for idx in batch_idx)
-                for batch_idx in self._sampler
-            )
+            batches = iter(self._sampler)
         else:
-            corpus = (self._dataset[idx] for idx in self._sampler)
+            batches = _chunks(self._sampler, self._batch_size)
+        corpus = _read_batches(self._dataset, batches)
         batch, self._prev = self._prev, []
         for i in corpus:
             batch.append(i)
@@ -138,6 +158,92 @@ class BatchSampler:
         return self._batch_axis
 
 
+class StreamBatchSampler(BatchSampler):
+    """
+    Batch sampler for streaming datasets without ``len()`` or random access.
+
+    Samples are read into a bounded buffer of ``buffer_size`` samples.
+    When ``shuffle`` is True the buffer is shuffled and sorted by text length
+    so that each batch holds samples of similar lengths (approximate
+    bucketing), and the batches of one buffer are yielded in random order.
+    When ``shuffle`` is False samples are batched in reading order.
+    """
+
+    def __init__(
+        self, dataset, batch_size, buffer_size=100000, shuffle=True,
+        batch_axis=1, last_batch='keep', batchify_fn=None,
+        num_parts=1, part_index=0
+    ):
+        self._dataset = dataset
+        self._batch_size = batch_size
+        self._batch_axis = batch_axis
+        self._buffer_size = max(buffer_size or batch_size, batch_size)
+        self._shuffle = shuffle
+        self._num_parts = num_parts
+        self._part_index = part_index
+        self._last_batch = last_batch
+        self._batchify_fn = batchify_fn
+        self._prev = []
+
+    def _samples(self):
+        samples = iter(self._dataset)
+        if self._num_parts > 1:
+            samples = itertools.islice(
+                samples, self._part_index, None, self._num_parts
+            )
+        return samples
+
+    def _drain(self, buffer, final=False):
+        """
+        将缓冲区切分为若干批, 不满一批的样本留在缓冲区中.
+        """
+        if self._shuffle:
+            np.random.shuffle(buffer)
+            lengths = [
+                len(sample[0] if isinstance(sample, tuple) else sample)
+                for sample in buffer
+            ]
+            order = np.argsort(lengths, kind='stable')
+            buffer = [buffer[i] for i in order]
+        num_full = len(buffer) // self._batch_size * self._batch_size
+        batches = [
+            buffer[i:i + self._batch_size]
+            for i in range(0, num_full, self._batch_size)
+        ]
+        if self._shuffle:
+            np.random.shuffle(batches)
+        return batches, buffer[num_full:]
+
+    def _yield(self, batch):
+        if callable(self._batchify_fn):
+            return self._batchify_fn(batch)
+        return batch
+
+    def __iter__(self):
+        buffer, self._prev = self._prev, []
+        for sample in self._samples():
+            buffer.append(sample)
+            if len(buffer) >= self._buffer_size:
+                batches, buffer = self._drain(buffer)
+                for batch in batches:
+                    yield self._yield(batch)
+        batches, buffer = self._drain(buffer)
+        for batch in batches:
+            yield self._yield(batch)
+        if buffer:
+            if self._last_batch == 'keep':
+                yield self._yield(buffer)
+            elif self._last_batch == 'discard':
+                return
+            elif self._last_batch == 'rollover':
+                self._prev = buffer
+            else:
+                raise ValueError(
+                    "last_batch must be one of 'keep', "
+                    "'discard', or 'rollover', but got %s" % self._last_batch
+                )
+
+
 class BPTTBatchSampler(BatchSampler):
 
     def __init__(
@@ -156,7 +262,9 @@ class BPTTBatchSampler(BatchSampler):
         self._padding_token = padding_token
 
     def __iter__(self):
-        corpus = (self._dataset[idx] for idx in self._sampler)
+        corpus = _read_batches(
+            self._dataset, _chunks(self._sampler, self._batch_size)
+        )
 
         def _init():
             return (
@@ -181,7 +289,8 @@ class BPTTBatchSampler(BatchSampler):
             """Read a sentence from the corpus into i-th buffer."""
             if len(buffers[i]) <= 2:
                 buffers[i].extend(
-                    [self._bos_token] + next(corpus) + [self._eos_token]
+                    [self._bos_token] + list(next(corpus)) +
+                    [self._eos_token]
                 )
 
         def _write(
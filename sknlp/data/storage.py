@@ -0,0 +1,452 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import hashlib
+import os
+import threading
+from multiprocessing import current_process
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    import oss2
+except ImportError:
+    oss2 = None
+
+from .data import RecordIndex, _merge_ranges, _read_record
+from .compressed import BlockCompressedRecordIO
+
+
+class StorageClient:
+    """
+    按字节范围读取远程文件的存储客户端接口.
+
+    实现``size``和``read_range``即可作为``RemoteRecordFileDataset``的后端.
+    """
+
+    def url(self, path: str) -> str:
+        """
+        文件的全局唯一地址, 用于区分本地缓存.
+        """
+        raise NotImplementedError
+
+    def size(self, path: str) -> int:
+        raise NotImplementedError
+
+    def version(self, path: str) -> str:
+        """
+        文件内容的版本标识(如etag或修改时间), 文件被覆盖后改变,
+        用于使本地缓存失效. 默认返回空字符串, 即只按地址和大小区分.
+        """
+        return ''
+
+    def read_range(self, path: str, start: int, end: int) -> bytes:
+        """
+        读取``path``中``[start, end)``范围的字节.
+        """
+        raise NotImplementedError
+
+    def read(self, path: str) -> bytes:
+        return self.read_range(path, 0, self.size(path))
+
+
+class LocalStorageClient(StorageClient):
+    """
+    读取本地文件的存储客户端, 用于测试或挂载的网络文件系统.
+
+    Parameters
+    ----------
+    root: ``str``, optional
+        文件路径的根目录
+    """
+
+    def __init__(self, root: Optional[str] = None) -> None:
+        self.root = root
+
+    def _path(self, path: str) -> str:
+        if self.root is None:
+            return path
+        return os.path.join(self.root, path)
+
+    def url(self, path: str) -> str:
+        return 'file://' + os.path.abspath(self._path(path))
+
+    def size(self, path: str) -> int:
+        return os.path.getsize(self._path(path))
+
+    def version(self, path: str) -> str:
+        return str(os.stat(self._path(path)).st_mtime_ns)
+
+    def read_range(self, path: str, start: int, end: int) -> bytes:
+        with open(self._path(path), 'rb') as f:
+            return os.pread(f.fileno(), end - start, start)
+
+
+class OssStorageClient(StorageClient):
+    """
+    读取阿里云OSS对象的存储客户端, 依赖``oss2``.
+
+    Parameters
+    ----------
+    bucket_name: ``str``
+        bucket名
+    endpoint: ``str``
+        OSS的endpoint, 例如'http://oss-cn-hangzhou.aliyuncs.com'
+    access_key_id: ``str``
+    access_key_secret: ``str``
+    """
+
+    def __init__(
+        self, bucket_name: str, endpoint: str,
+        access_key_id: str, access_key_secret: str
+    ) -> None:
+        if oss2 is None:
+            raise ImportError('OssStorageClient requires oss2')
+        self.bucket_name = bucket_name
+        self.bucket = oss2.Bucket(
+            oss2.Auth(access_key_id, access_key_secret),
+            endpoint, bucket_name
+        )
+
+    def url(self, path: str) -> str:
+        return f'oss://{self.bucket_name}/{path}'
+
+    def size(self, path: str) -> int:
+        return self.bucket.head_object(path).content_length
+
+    def version(self, path: str) -> str:
+        return self.bucket.head_object(path).etag
+
+    def read_range(self, path: str, start: int, end: int) -> bytes:
+        if end <= start:
+            return b''
+        # oss2的byte_range两端都是闭区间
+        return self.bucket.get_object(
+            path, byte_range=(start, end - 1)
+        ).read()
+
+
+def _cache_key(client: StorageClient, path: str, size: int) -> str:
+    """
+    远程文件在本地缓存中的键, 文件被覆盖(大小或版本改变)后不再命中旧的缓存.
+    """
+    return hashlib.sha1(
+        f'{client.url(path)}:{size}:{client.version(path)}'.encode('utf-8')
+    ).hexdigest()
+
+
+class BlockCache:
+    """
+    远程文件的本地磁盘块缓存.
+
+    文件按``block_size``字节切分为块, 块在第一次读取时通过``client``下载,
+    保存为``directory``下每个远程文件各自的子目录中.
+    ``directory``中所有块文件的总字节数超过``max_bytes``时
+    按最近访问时间淘汰最旧的块. 同一目录可以被多个进程和多个远程文件共用.
+    读取连续的块时, 在后台线程中预取之后的``read_ahead``个块,
+    顺序读取时下载和训练可以同时进行.
+
+    Parameters
+    ----------
+    client: ``StorageClient``
+        存储客户端
+    path: ``str``
+        远程文件路径
+    directory: ``str``
+        缓存目录
+    block_size: ``int``
+        每块的字节数
+    max_bytes: ``int``
+        缓存目录中块文件的最大总字节数
+    read_ahead: ``int``
+        顺序读取时预取的块数, 为0时不预取
+    memory_blocks: ``int``
+        内存中保留的最近读取的块数
+    """
+
+    BLOCK_EXT = '.blk'
+
+    def __init__(
+        self, client: StorageClient, path: str, directory: str,
+        block_size: int = 4 * 1024 * 1024, max_bytes: int = 2 ** 30,
+        read_ahead: int = 2, memory_blocks: int = 4
+    ) -> None:
+        self.client = client
+        self.path = path
+        self.size = client.size(path)
+        key = _cache_key(client, path, self.size)
+        self.root = directory
+        self.directory = os.path.join(directory, key)
+        os.makedirs(self.directory, exist_ok=True)
+        self.block_size = block_size
+        self.max_bytes = max_bytes
+        self.read_ahead = read_ahead
+        self.memory_blocks = memory_blocks
+        self.num_blocks = -(-self.size // block_size)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._memory: 'OrderedDict[int, bytes]' = OrderedDict()
+        self._pending: Dict[int, Future] = dict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid = current_process().pid
+        self._last_block = -1
+        # 缓存目录可能已有其他进程或之前下载的块
+        self._nbytes = sum(size for _, size, _ in self._scan())
+
+    def __getstate__(self):
+        d = dict(self.__dict__)
+        for k in ('_memory', '_pending', '_lock', '_executor'):
+            d.pop(k)
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        self._reset()
+
+    def _block_path(self, block: int) -> str:
+        return os.path.join(self.directory, f'{block}{self.BLOCK_EXT}')
+
+    def _download(self, block: int) -> bytes:
+        """
+        下载第``block``块并写入缓存目录, 先写临时文件再重命名,
+        其他进程不会读到写了一半的块.
+        """
+        start = block * self.block_size
+        end = min(start + self.block_size, self.size)
+        data = self.client.read_range(self.path, start, end)
+        block_path = self._block_path(block)
+        tmp_path = f'{block_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, block_path)
+        with self._lock:
+            self._nbytes += len(data)
+            need_evict = self._nbytes > self.max_bytes
+        if need_evict:
+            self._evict()
+        return data
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """
+        返回缓存目录中所有块文件的(访问时间, 字节数, 路径).
+        """
+        entries = []
+        try:
+            subdirs = [e for e in os.scandir(self.root) if e.is_dir()]
+        except FileNotFoundError:
+            return entries
+        for subdir in subdirs:
+            try:
+                files = list(os.scandir(subdir.path))
+            except FileNotFoundError:
+                continue
+            for entry in files:
+                if not entry.name.endswith(self.BLOCK_EXT):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        """
+        按最近访问时间淘汰缓存目录中所有远程文件的块,
+        直到总字节数不超过``max_bytes``.
+        """
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        with self._lock:
+            self._nbytes = total
+
+    def _load(self, block: int) -> bytes:
+        """
+        从缓存目录读取第``block``块, 不存在时下载.
+        """
+        block_path = self._block_path(block)
+        try:
+            with open(block_path, 'rb') as f:
+                data = f.read()
+            # 更新访问时间, 淘汰时按访问时间排序
+            os.utime(block_path)
+            return data
+        except FileNotFoundError:
+            return self._download(block)
+
+    def _prefetch_block(self, block: int) -> None:
+        """
+        在后台下载第``block``块到缓存目录, 不在内存中保留块的数据.
+        """
+        self._download(block)
+
+    def _prefetch(self, block: int) -> None:
+        """
+        预取之后的``read_ahead``个块. 预取只写入磁盘缓存,
+        完成的任务从``_pending``中移除, 顺序读取中断(例如打乱的分块,
+        epoch结束)时不会留下占用内存的块.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.read_ahead)
+        for b in range(block + 1, min(block + 1 + self.read_ahead,
+                                      self.num_blocks)):
+            if b in self._memory or b in self._pending:
+                continue
+            if os.path.exists(self._block_path(b)):
+                continue
+            future = self._executor.submit(self._prefetch_block, b)
+            self._pending[b] = future
+            future.add_done_callback(
+                lambda _, b=b: self._pending.pop(b, None)
+            )
+
+    def read_block(self, block: int) -> bytes:
+        if self._pid != current_process().pid:
+            # fork出的子进程不能使用父进程的线程池和锁
+            self._reset()
+        if block in self._memory:
+            self._memory.move_to_end(block)
+            return self._memory[block]
+        future = self._pending.get(block)
+        if future is not None:
+            # 等待正在进行的预取, 预取失败时由``_load``重新下载
+            wait([future])
+        data = self._load(block)
+        if self.read_ahead > 0 and block == self._last_block + 1:
+            self._prefetch(block)
+        self._last_block = block
+        self._memory[block] = data
+        if len(self._memory) > self.memory_blocks:
+            self._memory.popitem(last=False)
+        return data
+
+    def read_range(self, start: int, end: int) -> bytes:
+        """
+        读取远程文件中``[start, end)``范围的字节.
+        """
+        if end <= start:
+            return b''
+        first, last = start // self.block_size, (end - 1) // self.block_size
+        parts = [self.read_block(b) for b in range(first, last + 1)]
+        offset = first * self.block_size
+        if len(parts) == 1:
+            return parts[0][start - offset:end - offset]
+        return b''.join(parts)[start - offset:end - offset]
+
+
+def _cache_index(
+    client: StorageClient, idx_path: str, directory: str
+) -> str:
+    """
+    将远程索引文件完整下载到缓存目录, 返回本地路径.
+    """
+    key = _cache_key(client, idx_path, client.size(idx_path))
+    local_path = os.path.join(directory, f'{key}.idx')
+    if not os.path.exists(local_path):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{local_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(client.read(idx_path))
+        os.replace(tmp_path, local_path)
+    return local_path
+
+
+class RemoteRecordIO:
+    """
+    Read-only indexed ``RecordIO`` file in object storage.
+
+    The index is downloaded once into the cache directory; records are
+    read through a ``BlockCache``, so only the byte ranges that are
+    actually sampled are fetched. The reading interface is the same as
+    ``SimpleIndexedRecordIO``.
+
+    Parameters
+    ----------
+    idx_path: ``str``
+        Remote path to the index file.
+    uri: ``str``
+        Remote path to the ``RecordIO`` file.
+    client: ``StorageClient``
+        Storage client used to fetch byte ranges.
+    cache_dir: ``str``
+        Local directory of the index and block cache.
+    kwargs:
+        Passed to ``BlockCache``.
+    """
+
+    # 批量读取时, 间隔不超过该字节数的记录合并为一次读取
+    MERGE_GAP = 64 * 1024
+
+    def __init__(
+        self, idx_path: str, uri: str, client: StorageClient,
+        cache_dir: str, **kwargs
+    ) -> None:
+        self.idx_path = idx_path
+        self.uri = uri
+        self.url = client.url(uri)
+        self.writable = False
+        self._blocks = BlockCache(client, uri, cache_dir, **kwargs)
+        self.local_idx_path = _cache_index(client, idx_path, cache_dir)
+        self.index = RecordIndex.load(
+            self.local_idx_path, uri, file_size=self._blocks.size
+        )
+
+    def close(self) -> None:
+        pass
+
+    def read_idx(self, idx: int) -> bytes:
+        """
+        返回第``idx``条记录.
+        """
+        return self.read_batch([idx])[0]
+
+    def read_batch(self, indices: Sequence[int]) -> List[bytes]:
+        """
+        批量读取``indices``对应的记录, 按请求的顺序返回,
+        相邻的记录合并为一次读取, 见``SimpleIndexedRecordIO.read_batch``.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        offsets = self.index.offsets[indices]
+        order = np.argsort(offsets, kind='stable')
+        offsets = offsets[order]
+        lengths = self.index.lengths[indices][order]
+        records: List[Union[bytes, None]] = [None] * len(indices)
+        for start, end, first, last in _merge_ranges(
+            offsets, lengths, self.MERGE_GAP
+        ):
+            buf = self._blocks.read_range(start, end)
+            for i in range(first, last):
+                record, _ = _read_record(buf, int(offsets[i]) - start)
+                records[order[i]] = bytes(record)
+        return records
+
+
+class RemoteBlockCompressedRecordIO(BlockCompressedRecordIO):
+    """
+    Read-only ``BlockCompressedRecordIO`` file in object storage, see
+    ``RemoteRecordIO``.
+    """
+
+    def __init__(
+        self, idx_path: str, uri: str, client: StorageClient,
+        cache_dir: str, cache_blocks: int = 16, **kwargs
+    ) -> None:
+        self.url = client.url(uri)
+        self._blocks = BlockCache(client, uri, cache_dir, **kwargs)
+        self.local_idx_path = _cache_index(client, idx_path, cache_dir)
+        super().__init__(
+            self.local_idx_path, uri, 'r', cache_blocks=cache_blocks
+        )
+
+    def _read_range(self, start: int, end: int) -> bytes:
+        return self._blocks.read_range(start, end)
@@ -8,11 +8,12 @@ from typing import List, Tuple, Union, Optional
 
 import mxnet as mx
 from mxnet.gluon import nn
+import numpy as np
 
 from .data.sampler import BPTTBatchSampler
 from .data.dataloader import PrefetchDataLoader
 from .base import BaseModel
-from .vocab import Vocab
+from .vocab import Vocab, MMapVocab, load_word2vec
 from .module import BiLSTM, ConvEncoder
 from .loss import AdaptiveSoftmax, ElmoLoss
 from .utils.file import make_tarball
@@ -55,6 +56,17 @@ class TokenEmbedding(Embedding):
             input, weight, len(self._vocab), self._embed_size, sparse_grad=True
         )
 
+    def set_weight(self, weight: np.ndarray, chunk_size: int = 65536) -> None:
+        """
+        按块复制``weight``(例如``load_word2vec``返回的内存映射)到参数中,
+        不生成完整的numpy副本.
+        """
+        assert weight.shape == self.weight.shape, 'weight shape mismatch'
+        for data in self.weight.list_data():
+            for start in range(0, weight.shape[0], chunk_size):
+                end = min(start + chunk_size, weight.shape[0])
+                data[start:end] = np.ascontiguousarray(weight[start:end])
+
 
 class Elmo(Embedding):
 
@@ -124,11 +136,13 @@ class Token2vec(BaseModel):
     def __init__(
         self, vocab, embed_size, loss: str = 'adaptive',
         cutoffs: Tuple[int] = (100, ), div_factor: int = 4,
-        model=None, ctx=None, **kwargs
+        model=None, ctx=None, pretrained: Optional[np.ndarray] = None,
+        **kwargs
     ):
         super().__init__(ctx, **kwargs)
         self._vocab = vocab
         self._embed_size = embed_size
+        self._pretrained = pretrained
         self.meta = {
             'loss': loss,
             'embed_size': embed_size
@@ -157,12 +171,30 @@ class Token2vec(BaseModel):
         self._trainable = {'model': self.model}
         if initialize:
             self.model.initialize(init=mx.init.Xavier(), ctx=ctx)
+            if self._pretrained is not None:
+                self.model.set_weight(self._pretrained)
+                self._pretrained = None
         if self.loss is not None:
             if initialize:
                 self.loss.initialize(init=mx.init.Xavier(), ctx=ctx)
             self._trainable.update({'loss': self.loss})
         self._hybridize()
 
+    @classmethod
+    def from_word2vec(
+        cls, file_path: str, output_path: str, vocab=None,
+        top_n: Optional[int] = None, binary: bool = True, **kwargs
+    ) -> 'Token2vec':
+        """
+        用word2vec格式文件中的向量初始化, 参数见``load_word2vec``,
+        embedding矩阵保存在``output_path``, 构建模型时按块复制到参数中.
+        """
+        vocab, weight = load_word2vec(
+            file_path, output_path, vocab=vocab, top_n=top_n, binary=binary
+        )
+        kwargs.setdefault('loss', None)
+        return cls(vocab, weight.shape[1], pretrained=weight, **kwargs)
+
     def _hybridize(self):
         self.model.hybridize(static_alloc=True)
         if self.loss is not None:
@@ -238,8 +270,7 @@ class Token2vec(BaseModel):
 
     def save(self, file_path):
         with tempfile.TemporaryDirectory() as temp_dir:
-            with open(os.path.join(temp_dir, 'vocab.json'), 'w') as f:
-                f.write(self._vocab.to_json())
+            MMapVocab.save(self._vocab, os.path.join(temp_dir, 'vocab.bin'))
             with open(os.path.join(temp_dir, 'meta.json'), 'w') as f:
                 f.write(json.dumps(self.meta, ensure_ascii=False))
             self.model.export(os.path.join(temp_dir, 'embedding'))
@@ -255,8 +286,13 @@ class Token2vec(BaseModel):
                 os.path.join(temp_dir, 'embedding-symbol.json'), ['data'],
                 os.path.join(temp_dir, 'embedding-0000.params'), ctx=ctx
             )
-            with open(os.path.join(temp_dir, 'vocab.json')) as f:
-                vocab = Vocab.from_json(f.read())
+            vocab_path = os.path.join(temp_dir, 'vocab.bin')
+            if os.path.exists(vocab_path):
+                # 解压目录删除后映射仍然有效
+                vocab = MMapVocab(vocab_path)
+            else:
+                with open(os.path.join(temp_dir, 'vocab.json')) as f:
+                    vocab = Vocab.from_json(f.read())
         return meta, model, vocab
 
     @classmethod
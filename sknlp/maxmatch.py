@@ -0,0 +1,111 @@
+from typing import Dict, Iterable, List
+
+
+class MaxMatch:
+    """
+    基于词汇表的最大匹配分词.
+
+    词汇表中所有token的前缀(逆向匹配时为后缀)保存在一个dict中,
+    值表示该前缀本身是否为token, 相当于一个以哈希表存储的trie:
+    匹配时逐字延长, 前缀不存在时立即停止, 取最长的token.
+    不在词汇表中的字单独成词.
+
+    Parameters
+    ----------
+    tokens: ``Iterable[str]``
+        词典
+    direction: ``str``
+        'forward'(正向最大匹配), 'backward'(逆向最大匹配)
+        或'bidirectional'(双向最大匹配, 取词数较少, 其次单字较少的结果,
+        相同时取逆向的结果)
+    max_token_length: ``int``
+        超过该长度的token不参与匹配
+    """
+
+    DIRECTIONS = ('forward', 'backward', 'bidirectional')
+
+    def __init__(
+        self, tokens: Iterable[str], direction: str = 'forward',
+        max_token_length: int = 16
+    ) -> None:
+        if direction not in self.DIRECTIONS:
+            raise ValueError(f'unknown direction {direction}')
+        self.direction = direction
+        self.max_token_length = max_token_length
+        self._prefixes: Dict[str, bool] = dict()
+        self._suffixes: Dict[str, bool] = dict()
+        for token in tokens:
+            if not 1 < len(token) <= max_token_length:
+                # 单字不需要匹配
+                continue
+            if direction != 'backward':
+                self._add(self._prefixes, token, forward=True)
+            if direction != 'forward':
+                self._add(self._suffixes, token, forward=False)
+
+    @staticmethod
+    def _add(table: Dict[str, bool], token: str, forward: bool) -> None:
+        for i in range(1, len(token)):
+            key = token[:i] if forward else token[-i:]
+            table.setdefault(key, False)
+        table[token] = True
+
+    @classmethod
+    def from_vocab(cls, vocab, **kwargs) -> 'MaxMatch':
+        """
+        以词汇表中除保留token外的所有token为词典.
+        """
+        reserved = set(vocab.reserved_tokens or [])
+        reserved.add(vocab.unknown_token)
+        return cls(
+            (token for token in vocab.idx_to_token if token not in reserved),
+            **kwargs
+        )
+
+    def _forward(self, text: str) -> List[str]:
+        prefixes = self._prefixes
+        tokens = []
+        i, n = 0, len(text)
+        while i < n:
+            end = i + 1
+            limit = min(n, i + self.max_token_length)
+            for j in range(i + 2, limit + 1):
+                is_token = prefixes.get(text[i:j])
+                if is_token is None:
+                    break
+                if is_token:
+                    end = j
+            tokens.append(text[i:end])
+            i = end
+        return tokens
+
+    def _backward(self, text: str) -> List[str]:
+        suffixes = self._suffixes
+        tokens = []
+        i = len(text)
+        while i > 0:
+            start = i - 1
+            limit = max(0, i - self.max_token_length)
+            for j in range(i - 2, limit - 1, -1):
+                is_token = suffixes.get(text[j:i])
+                if is_token is None:
+                    break
+                if is_token:
+                    start = j
+            tokens.append(text[start:i])
+            i = start
+        tokens.reverse()
+        return tokens
+
+    def cut(self, text: str) -> List[str]:
+        if self.direction == 'forward':
+            return self._forward(text)
+        if self.direction == 'backward':
+            return self._backward(text)
+        forward, backward = self._forward(text), self._backward(text)
+        if len(forward) != len(backward):
+            return forward if len(forward) < len(backward) else backward
+        num_singles = sum(len(token) == 1 for token in forward)
+        if num_singles < sum(len(token) == 1 for token in backward):
+            return forward
+        return backward
@@ -1,6 +1,40 @@
+from collections import OrderedDict
 import functools
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from typing import (
+    Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+)
+
 import jieba_fast as jieba
 
+from .bpe import BPE
+from .maxmatch import MaxMatch
+
+
+logger = logging.getLogger(__name__)
+
+
+# 进程池中每个进程的分词器, 由``_init_worker``创建
+_WORKER_SEGMENTER = None
+
+
+def _init_worker(segmenter: 'Segmenter') -> None:
+    global _WORKER_SEGMENTER
+    # 进程池由fork创建, 分词器直接继承自父进程
+    _WORKER_SEGMENTER = segmenter
+    if segmenter.method == 'jieba':
+        # 每个进程只加载一次词典
+        jieba.initialize()
+
+
+def _cut_chunk(texts: Sequence[str]) -> List[List[str]]:
+    return [_WORKER_SEGMENTER._method(text) for text in texts]
+
 
 class Segmenter:
     """
@@ -8,17 +42,302 @@ class Segmenter:
 
     Parameters
     ----------
-    method: `str`
-        分词器名, 可选项: 'jieba', `None`, 如果是None
+    method: `str` or `dict`
+        分词器名, 可选项: 'jieba', 'space', 'bpe', 'maxmatch', `None`,
+        如果是None按字切分. 也可以是``Segmenter.config``返回的配置,
+        'maxmatch'的配置可以指定匹配方向, 例如
+        ``{'method': 'maxmatch', 'direction': 'bidirectional'}``
+    bpe: `BPE`, optional
+        method为'bpe'时使用的子词切分模型, 通常由``Segmenter.train_bpe``生成
+    vocab: `Vocab`, optional
+        method为'maxmatch'时以词汇表中的token为词典做最大匹配分词,
+        见``MaxMatch``. 词汇表外的词本来也会映射为``<unk>``,
+        所以不需要加载jieba的完整词典
+    cache_size: `int`
+        分词结果的LRU缓存条数, 以文本为key, 为0时不缓存.
+        重复文本很多时(如线上请求)只需分词一次, 缓存可以被多个线程共用
+    cache_file: `str`, optional
+        缓存文件路径, 文件存在时初始化时读取, ``save_cache``写入,
+        可以在多次训练和多个服务进程之间共用.
+        文件中记录了生成缓存的分词器, 与当前分词器不一致的文件被忽略
     """
 
-    def __init__(self, method: str = None) -> None:
+    # 文本数少于该值时, 进程间通信的开销大于并行的收益, 在当前进程分词
+    MIN_PARALLEL_TEXTS = 256
+
+    def __init__(
+        self, method: Union[str, Dict[str, Any], None] = None,
+        bpe: Optional[BPE] = None, cache_size: int = 0,
+        cache_file: Optional[str] = None, vocab=None
+    ) -> None:
+        direction = 'forward'
+        if isinstance(method, dict):
+            if method['method'] == 'bpe':
+                bpe = BPE.from_config(method)
+            direction = method.get('direction', direction)
+            method = method['method']
+        self.method = method or 'char'
+        self.bpe = bpe
+        self.matcher: Optional[MaxMatch] = None
         if method == 'jieba':
             self._method = functools.partial(jieba.lcut, HMM=False)
         elif method == 'space':
-            self._method = lambda x: x.split()
+            self._method = str.split
+        elif method == 'bpe':
+            if bpe is None:
+                raise ValueError('bpe segmenter requires a trained BPE model')
+            self._method = bpe.encode
+        elif method == 'maxmatch':
+            if vocab is None:
+                raise ValueError('maxmatch segmenter requires a vocab')
+            self.matcher = MaxMatch.from_vocab(vocab, direction=direction)
+            self._method = self.matcher.cut
         else:
             self._method = list
+        self.cache_size = cache_size
+        self.cache_file = cache_file
+        self.hits = 0
+        self.misses = 0
+        self._cache: 'OrderedDict[str, Tuple[str, ...]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_jobs = 0
+        self._pool_pid = None
+        if cache_size > 0 and cache_file is not None and os.path.exists(
+            cache_file
+        ):
+            self.load_cache(cache_file)
+
+    @classmethod
+    def train_bpe(
+        cls, dataset: Iterable, vocab_size: int, min_freq: int = 2,
+        column: Optional[int] = 0
+    ) -> 'Segmenter':
+        """
+        从语料训练BPE子词分词器.
+
+        Parameters
+        ----------
+        dataset: ``Iterable``
+            训练语料, 可以是``RecordFileDataset``, ``ColumnarDataset``等数据集
+        vocab_size: ``int``
+            目标子词表大小, 见``BPE.train``
+        min_freq: ``int``
+            合并的子词对的最小频率
+        column: ``int``, optional
+            文本所在的列, 数据集的每行以'\\t'分隔或者是元组,
+            为None时每行就是文本
+        """
+        if column is None:
+            texts = iter(dataset)
+        else:
+            texts = (
+                (row if isinstance(row, tuple) else row.split('\t'))[column]
+                for row in dataset
+            )
+        return cls('bpe', bpe=BPE.train(texts, vocab_size, min_freq=min_freq))
+
+    @property
+    def config(self) -> Union[str, Dict[str, Any]]:
+        """
+        可以保存为json的配置, ``Segmenter(config)``恢复同样的分词器,
+        'maxmatch'还需要传入同样的词汇表.
+        """
+        if self.bpe is not None:
+            return {'method': 'bpe', **self.bpe.to_config()}
+        if self.matcher is not None:
+            # 词典即模型的词汇表, 不需要另外保存
+            return {'method': 'maxmatch', 'direction': self.matcher.direction}
+        return self.method
+
+    def _cache_tag(self) -> str:
+        """
+        区分分词结果的标识, 保存在缓存文件中.
+        除配置外, 还包括'maxmatch'的词典和jieba加载的词典(如用户词典).
+        """
+        tag: Dict[str, Any] = {'config': self.config}
+        if self.matcher is not None:
+            table = self.matcher._prefixes or self.matcher._suffixes
+            tag['tokens'] = hashlib.sha1('\n'.join(sorted(
+                token for token, is_token in table.items() if is_token
+            )).encode('utf-8')).hexdigest()
+            tag['max_token_length'] = self.matcher.max_token_length
+        elif self.method == 'jieba':
+            jieba.dt.check_initialized()
+            tag['dictionary'] = [
+                jieba.dt.dictionary, jieba.dt.total, len(jieba.dt.FREQ)
+            ]
+        return json.dumps(tag, ensure_ascii=False, sort_keys=True)
+
+    def _put(self, text: str, tokens: Tuple[str, ...]) -> None:
+        # 调用时需要持有``_lock``
+        self._cache[text] = tokens
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def cut(self, text: str) -> List[str]:
+        if self.cache_size <= 0:
+            return self._method(text)
+        with self._lock:
+            tokens = self._cache.get(text)
+            if tokens is not None:
+                self.hits += 1
+                self._cache.move_to_end(text)
+                return list(tokens)
+            self.misses += 1
+        # 分词时不持有锁, 其他线程可以同时分词
+        tokens = tuple(self._method(text))
+        with self._lock:
+            self._put(text, tokens)
+        return list(tokens)
+
+    __call__ = cut
+
+    def cut_batch(
+        self, texts: Sequence[str], n_jobs: int = 1,
+        chunk_size: int = 1000
+    ) -> List[List[str]]:
+        """
+        批量分词.
+
+        ``n_jobs > 1``且文本数不少于``MIN_PARALLEL_TEXTS``时,
+        文本按``chunk_size``切块, 由常驻的进程池并行分词,
+        进程池在第一次使用时创建, 之后的调用复用, 每个进程只加载一次词典.
+        使用缓存时只有未命中且不重复的文本交给进程池.
+
+        Parameters
+        ----------
+        texts: ``Sequence[str]``
+            文本
+        n_jobs: ``int``
+            分词使用的进程数
+        chunk_size: ``int``
+            每个任务的最大文本数
+        """
+        if (n_jobs <= 1 or len(texts) < self.MIN_PARALLEL_TEXTS
+                or multiprocessing.current_process().daemon):
+            # 守护进程(如数据预取进程)中不能再创建子进程
+            return [self.cut(text) for text in texts]
+        if self.cache_size <= 0:
+            return self._cut_parallel(texts, n_jobs, chunk_size)
+        with self._lock:
+            missing = [text for text in dict.fromkeys(texts)
+                       if text not in self._cache]
+        cut = dict(zip(
+            missing, self._cut_parallel(missing, n_jobs, chunk_size)
+        ))
+        results = []
+        for text in texts:
+            tokens = cut.pop(text, None)
+            if tokens is None:
+                results.append(self.cut(text))
+                continue
+            with self._lock:
+                self.misses += 1
+                self._put(text, tuple(tokens))
+            results.append(list(tokens))
+        return results
+
+    def _cut_parallel(
+        self, texts: Sequence[str], n_jobs: int, chunk_size: int
+    ) -> List[List[str]]:
+        if not texts:
+            return []
+        pool = self._get_pool(n_jobs)
+        # 文本较少时也平均分给所有进程
+        size = max(1, min(chunk_size, -(-len(texts) // n_jobs)))
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+        return [
+            tokens for chunk in pool.map(_cut_chunk, chunks)
+            for tokens in chunk
+        ]
+
+    def _get_pool(self, n_jobs: int):
+        if (self._pool is None or self._pool_jobs != n_jobs
+                or self._pool_pid != os.getpid()):
+            if self._pool_pid == os.getpid():
+                self.close()
+            context = multiprocessing.get_context('fork')
+            self._pool = context.Pool(
+                n_jobs, initializer=_init_worker, initargs=(self,)
+            )
+            self._pool_jobs = n_jobs
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def close(self) -> None:
+        """
+        关闭``cut_batch``使用的进程池.
+        """
+        pool = getattr(self, '_pool', None)
+        if pool is not None and self._pool_pid == os.getpid():
+            pool.terminate()
+            pool.join()
+        self._pool = None
+
+    def __del__(self):
+        self.close()
+
+    def __getstate__(self):
+        d = dict(self.__dict__)
+        d['_pool'] = None
+        d['_lock'] = None
+        return d
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        self._lock = threading.Lock()
+
+    def cache_info(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._cache),
+            'max_size': self.cache_size
+        }
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def load_cache(self, file_path: str) -> None:
+        """
+        读取``save_cache``保存的缓存, 与当前缓存合并,
+        超出``cache_size``时淘汰最久未使用的条目.
+        由其他分词器(包括词典不同的分词器)生成的缓存被忽略.
+        """
+        with open(file_path, encoding='utf-8') as f:
+            content = json.load(f)
+        if not isinstance(content, dict) or (
+            content.get('segmenter') != self._cache_tag()
+        ):
+            logger.warning(
+                f'{file_path} was saved by a different segmenter, ignored'
+            )
+            return
+        with self._lock:
+            for text, tokens in content['entries'][-self.cache_size:]:
+                self._cache[text] = tuple(tokens)
+                self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
 
-    def cut(self, text):
-        return self._method(text)
+    def save_cache(self, file_path: Optional[str] = None) -> None:
+        """
+        按最近使用顺序将缓存和分词器的标识保存为json,
+        先写临时文件再重命名, 其他进程不会读到写了一半的文件.
+        """
+        file_path = file_path or self.cache_file
+        if file_path is None:
+            raise ValueError('file_path is required without cache_file')
+        with self._lock:
+            entries = [
+                [text, list(tokens)] for text, tokens in self._cache.items()
+            ]
+        tmp_path = f'{file_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(
+                {'segmenter': self._cache_tag(), 'entries': entries},
+                f, ensure_ascii=False
+            )
+        os.replace(tmp_path, file_path)
@@ -13,7 +13,7 @@ from mxnet.gluon import nn
 import gluonnlp
 
 from .base import DeepSupervisedModel
-from .data import Pad, InMemoryDataset, SequenceTagDataset
+from .data import Pad, ColumnarDataset, SequenceTagDataset
 from .utils.array import sequence_mask
 from .utils.file import make_tarball
 
@@ -21,6 +21,7 @@ from .embedding import Token2vec
 from .crf import Crf, viterbi_decode
 from .encode import TextRNN
 from .metric import ner_f_score
+from .segmenter import Segmenter
 
 
 logger = logging.getLogger(__name__)
@@ -49,6 +50,13 @@ class DeepTagger(DeepSupervisedModel):
         self._trained = False
         self._num_classes = num_tags
         self._label2idx = label2idx
+        # 默认按字切分, 由数据集查表
+        self._cut = None
+        if segmenter is not None:
+            if not isinstance(segmenter, Segmenter):
+                segmenter = Segmenter(segmenter, vocab=vocab)
+            self._cut = segmenter
+            segmenter = segmenter.config
         self._segmenter = segmenter
         self._max_length = max_length
         self._embed_size = embed_size
@@ -81,14 +89,20 @@ class DeepTagger(DeepSupervisedModel):
         self.encode_layer.hybridize(static_alloc=True)
         self.loss.hybridize(static_alloc=True)
 
-    def _get_or_build_dataset(self, dataset, X, y):
-        assert (X and y) or dataset
-        if dataset:
+    def _get_or_build_dataset(
+        self, dataset, X, y, sample_cache_bytes=None, cache_dir=None,
+        n_jobs=None
+    ):
+        assert (X and y) or dataset is not None
+        if dataset is not None:
             return dataset
-        d = InMemoryDataset(X, y)
+        d = ColumnarDataset(X, y)
         return SequenceTagDataset(
             d, vocab=self._vocab, label2idx=self._label2idx,
-            segmenter=self._segmenter, max_length=self._max_length
+            segmenter=self._cut, max_length=self._max_length,
+            cache_dir=cache_dir, sample_cache_bytes=sample_cache_bytes,
+            n_jobs=self._n_jobs if n_jobs is None else n_jobs,
+            **self._vocab_options
         )
 
     def _valid_log(self, valid_dataset):
@@ -124,12 +138,15 @@ class DeepTagger(DeepSupervisedModel):
         return functools.partial(batchify, input_padding, label_padding)
 
     def predict(
-        self, X=None, dataset=None, batch_size=512, return_origin_label=True
+        self, X=None, dataset=None, batch_size=512, return_origin_label=True,
+        n_jobs=None
     ):
         assert self._trained
-        assert dataset or X
+        assert dataset is not None or X
         if dataset is None:
-            dataset = self._get_or_build_dataset(dataset, X, ['O'] * len(X))
+            dataset = self._get_or_build_dataset(
+                dataset, X, ['O'] * len(X), n_jobs=n_jobs
+            )
         if not hasattr(self, 'idx2labels'):
             self.idx2labels = dataset.idx2labels
         dataloader = self._build_dataloader(dataset, batch_size, False, 'keep')
@@ -145,7 +162,9 @@ class DeepTagger(DeepSupervisedModel):
 
     def score(self, X=None, y=None, dataset=None, batch_size=512):
         assert self._trained
-        dataset = self._get_or_build_dataset(dataset, X, y)
+        dataset = self._get_or_build_dataset(
+            dataset, X, y, sample_cache_bytes=self.EVAL_CACHE_BYTES
+        )
         predictions = self.predict(dataset=dataset)
         texts, labels = zip(*[
             (text, self.idx2labels(label)) for text, label in dataset
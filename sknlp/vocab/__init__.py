@@ -1,3 +1,7 @@
 from .vocab import Vocab
+from .sketch import TokenSketch
+from .binary import MMapVocab
+from .word2vec import load_word2vec
+from .char import CharTable
 
-__all__ = [Vocab, ]
+__all__ = [Vocab, TokenSketch, MMapVocab, load_word2vec, CharTable]
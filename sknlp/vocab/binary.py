@@ -0,0 +1,332 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .vocab import oov_bucket, pad_ragged, ragged_offsets, vocab_meta
+
+
+BINARY_VOCAB_MAGIC = b'SKVOCAB\x01'
+# magic, token数, 哈希表大小, 字符串表字节数, 元信息字节数
+BINARY_VOCAB_HEADER = struct.Struct('<8sQQQQ')
+
+
+def _token_hash(token: bytes) -> int:
+    return zlib.crc32(token)
+
+
+def _pad8(n: int) -> int:
+    return -n % 8
+
+
+class _IdxToToken(Sequence):
+    """
+    ``MMapVocab.idx_to_token``, 按需从字符串表解码, 不生成所有token的列表.
+    """
+
+    def __init__(self, vocab: 'MMapVocab') -> None:
+        self._vocab = vocab
+
+    def __len__(self) -> int:
+        return self._vocab._count
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._vocab._token(i) for i in range(len(self))[idx]]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f'index {idx} out of range')
+        return self._vocab._token(idx)
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+
+class _TokenToIdx:
+    """
+    ``MMapVocab.token_to_idx``, 通过哈希表查找, 不生成dict.
+    """
+
+    def __init__(self, vocab: 'MMapVocab') -> None:
+        self._vocab = vocab
+
+    def __len__(self) -> int:
+        return self._vocab._count
+
+    def __contains__(self, token: str) -> bool:
+        return self._vocab._find(token) >= 0
+
+    def __getitem__(self, token: str) -> int:
+        idx = self._vocab._find(token)
+        if idx < 0:
+            raise KeyError(token)
+        return idx
+
+    def get(self, token: str, default: Optional[int] = None) -> int:
+        idx = self._vocab._find(token)
+        return default if idx < 0 else idx
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._vocab.idx_to_token)
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        return ((token, i) for i, token in enumerate(self))
+
+
+class MMapVocab:
+    """
+    以内存映射方式加载的二进制词汇表.
+
+    文件格式为文件头(``BINARY_VOCAB_HEADER``), json格式的元信息
+    (unknown token, 保留token等), ``token数 + 1``个8字节的字符串偏移,
+    开放寻址(线性探测)的4字节哈希表(以token的crc32为哈希, 保存token id,
+    空位为-1), 最后是所有token的UTF-8字符串. 各部分按8字节对齐.
+
+    加载时只映射文件, 不解析, token和id的双向查找都直接在映射内存上进行,
+    不生成Python的dict和list, 适合几百万token的大词汇表.
+    查找接口与``Vocab``一致, 同样支持词汇表外token的哈希桶.
+
+    Parameters
+    ----------
+    file_path: ``str``
+        二进制词汇表文件路径, 由``MMapVocab.save``生成
+    """
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._init_buffer(buf)
+
+    @classmethod
+    def from_buffer(cls, buf: bytes) -> 'MMapVocab':
+        vocab = cls.__new__(cls)
+        vocab.file_path = None
+        vocab._init_buffer(buf)
+        return vocab
+
+    def _init_buffer(self, buf: Union[bytes, mmap.mmap]) -> None:
+        self._buffer = buf
+        magic, count, table_size, strings_nbytes, meta_nbytes = (
+            BINARY_VOCAB_HEADER.unpack_from(buf, 0)
+        )
+        if magic != BINARY_VOCAB_MAGIC:
+            raise ValueError('Not a binary vocab file.')
+        pos = BINARY_VOCAB_HEADER.size
+        meta = json.loads(bytes(buf[pos:pos + meta_nbytes]).decode('utf-8'))
+        pos += meta_nbytes + _pad8(meta_nbytes)
+        self._offsets = np.frombuffer(
+            buf, dtype='<u8', count=count + 1, offset=pos
+        )
+        pos += 8 * (count + 1)
+        self._table = np.frombuffer(
+            buf, dtype='<i4', count=table_size, offset=pos
+        )
+        pos += 4 * table_size + _pad8(4 * table_size)
+        self._strings = memoryview(buf)[pos:pos + strings_nbytes]
+        self._mask = table_size - 1
+        self._count = count
+
+        self._unknown_token = meta['unknown_token']
+        self._reserved_tokens = meta['reserved_tokens']
+        self._identifiers_to_tokens = meta['identifiers_to_tokens']
+        self.num_buckets = meta.get('num_buckets', 0)
+        for identifier, token in self._identifiers_to_tokens.items():
+            setattr(self, identifier, token)
+        self._unknown_idx = -1
+        if self._unknown_token is not None:
+            self._unknown_idx = self._find(self._unknown_token)
+
+    def __getstate__(self):
+        return {'buffer': bytes(self._buffer)}
+
+    def __setstate__(self, d):
+        self.file_path = None
+        self._init_buffer(d['buffer'])
+
+    @staticmethod
+    def save(vocab, file_path: str) -> None:
+        """
+        将词汇表(``Vocab``或``MMapVocab``)保存为二进制格式.
+        """
+        encoded = [token.encode('utf-8') for token in vocab.idx_to_token]
+        offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+        np.cumsum([len(token) for token in encoded], out=offsets[1:])
+        table_size = 1
+        while table_size < 2 * max(len(encoded), 1):
+            table_size <<= 1
+        table = np.full(table_size, -1, dtype='<i4')
+        mask = table_size - 1
+        for idx, token in enumerate(encoded):
+            slot = _token_hash(token) & mask
+            while table[slot] >= 0:
+                slot = (slot + 1) & mask
+            table[slot] = idx
+        meta = json.dumps({
+            'unknown_token': vocab.unknown_token,
+            'reserved_tokens': vocab.reserved_tokens,
+            'identifiers_to_tokens': vocab._identifiers_to_tokens,
+            'num_buckets': getattr(vocab, 'num_buckets', 0)
+        }, ensure_ascii=False).encode('utf-8')
+        strings = b''.join(encoded)
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(BINARY_VOCAB_HEADER.pack(
+                BINARY_VOCAB_MAGIC, len(encoded), table_size,
+                len(strings), len(meta)
+            ))
+            f.write(meta + b'\x00' * _pad8(len(meta)))
+            f.write(offsets.tobytes())
+            f.write(table.tobytes() + b'\x00' * _pad8(table.nbytes))
+            f.write(strings)
+        os.replace(tmp_path, file_path)
+
+    def _token_bytes(self, idx: int) -> memoryview:
+        return self._strings[self._offsets[idx]:self._offsets[idx + 1]]
+
+    def _token(self, idx: int) -> str:
+        return str(self._token_bytes(idx), 'utf-8')
+
+    def _find_bytes(self, token: bytes) -> int:
+        slot = _token_hash(token) & self._mask
+        while True:
+            idx = int(self._table[slot])
+            if idx < 0:
+                return -1
+            if self._token_bytes(idx) == token:
+                return idx
+            slot = (slot + 1) & self._mask
+
+    def _find(self, token: str) -> int:
+        return self._find_bytes(token.encode('utf-8'))
+
+    def _lookup(self, token: str) -> int:
+        idx = self._find(token)
+        if idx >= 0:
+            return idx
+        if self.num_buckets:
+            return self._count + oov_bucket(token, self.num_buckets)
+        if self._unknown_idx < 0:
+            raise KeyError(token)
+        return self._unknown_idx
+
+    def __len__(self) -> int:
+        return self._count + self.num_buckets
+
+    def __contains__(self, token: str) -> bool:
+        return self._find(token) >= 0
+
+    def __getitem__(self, tokens: Union[str, Sequence[str]]):
+        if not isinstance(tokens, (list, tuple)):
+            return self._lookup(tokens)
+        return [self._lookup(token) for token in tokens]
+
+    def __call__(self, tokens: Union[str, Sequence[str]]):
+        return self[tokens]
+
+    def to_indices(self, tokens: Union[str, Sequence[str]]):
+        return self[tokens]
+
+    def lookup_batch(
+        self, token_lists: Sequence[Sequence[str]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量查找一组token序列的id.
+
+        Returns
+        ----------
+        ids: 所有序列的id拼接成的int32数组
+        offsets: 第``i``个序列的id为``ids[offsets[i]:offsets[i + 1]]``
+        """
+        offsets = ragged_offsets([len(tokens) for tokens in token_lists])
+        lookup = self._lookup
+        ids = np.fromiter(
+            (lookup(token) for tokens in token_lists for token in tokens),
+            dtype=np.int32, count=int(offsets[-1])
+        )
+        return ids, offsets
+
+    def pad_batch(
+        self, token_lists: Sequence[Sequence[str]],
+        pad_val: Optional[int] = None, time_major: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量查找并直接填入补齐的矩阵, 见``Vocab.pad_batch``.
+        """
+        if pad_val is None:
+            pad_val = self[self.padding_token]
+        ids, offsets = self.lookup_batch(token_lists)
+        return pad_ragged(ids, offsets, pad_val, time_major=time_major)
+
+    def to_tokens(self, indices: Union[int, Sequence[int]]):
+        to_reduce = False
+        if isinstance(indices, np.ndarray):
+            indices = indices.tolist()
+        if not isinstance(indices, (list, tuple)):
+            indices = [indices]
+            to_reduce = True
+        tokens = []
+        for idx in indices:
+            if not isinstance(idx, int) or not 0 <= idx < len(self):
+                raise ValueError(
+                    f'Token index {idx} in the provided `indices` is invalid.'
+                )
+            if idx >= self._count:
+                # 哈希桶
+                tokens.append(self._unknown_token)
+            else:
+                tokens.append(self._token(idx))
+        return tokens[0] if to_reduce else tokens
+
+    @property
+    def idx_to_token(self) -> _IdxToToken:
+        return _IdxToToken(self)
+
+    @property
+    def token_to_idx(self) -> _TokenToIdx:
+        return _TokenToIdx(self)
+
+    @property
+    def unknown_token(self) -> Optional[str]:
+        return self._unknown_token
+
+    @property
+    def reserved_tokens(self) -> List[str]:
+        return self._reserved_tokens
+
+    def digest(self) -> str:
+        """
+        词汇表内容的sha1, 见``Vocab.digest``.
+        直接计算映射内存中的字符串表和偏移, 不解码token.
+        """
+        sha = hashlib.sha1(vocab_meta(self))
+        sha.update(self._strings)
+        sha.update(self._offsets.tobytes())
+        return sha.hexdigest()
+
+    def to_json(self) -> str:
+        """
+        与``Vocab.to_json``相同格式的json, 需要解码所有token.
+        """
+        idx_to_token = list(self.idx_to_token)
+        vocab_dict = {
+            'idx_to_token': idx_to_token,
+            'token_to_idx': {
+                token: i for i, token in enumerate(idx_to_token)
+            },
+            'reserved_tokens': self._reserved_tokens,
+            'unknown_token': self._unknown_token,
+            'identifiers_to_tokens': self._identifiers_to_tokens
+        }
+        if self.num_buckets:
+            vocab_dict['num_buckets'] = self.num_buckets
+        return json.dumps(vocab_dict)
+
+    def __repr__(self) -> str:
+        return f'MMapVocab(size={len(self)}, unk="{self._unknown_token}")'
@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .vocab import oov_bucket, pad_ragged, ragged_offsets
+
+
+# BMP以内的码位使用稠密查找表, 之外的码位查dict
+BMP_SIZE = 0x10000
+
+
+class CharTable:
+    """
+    按字切分时的token id查找表.
+
+    文本编码为UTF-32后得到码位数组, BMP以内的码位直接在长度为
+    ``BMP_SIZE``的数组中查找, 其他码位(较少见的汉字, emoji等)查dict.
+    查找全部在numpy中进行, 不需要为每个字生成Python字符串和查找dict,
+    结果与``vocab[list(text)]``相同, 包括词汇表外的字和哈希桶.
+
+    Parameters
+    ----------
+    vocab: ``Vocab`` or ``MMapVocab``
+        词汇表, 只使用其中的单字token
+    """
+
+    def __init__(self, vocab) -> None:
+        self._vocab = vocab
+        self.num_buckets = getattr(vocab, 'num_buckets', 0)
+        self._num_tokens = len(vocab) - self.num_buckets
+        unknown_token = vocab.unknown_token
+        self._unknown_idx = (
+            -1 if unknown_token is None
+            else vocab.token_to_idx[unknown_token]
+        )
+        self._table = np.full(BMP_SIZE, self._unknown_idx, dtype=np.int32)
+        self._astral: Dict[int, int] = dict()
+        found = np.zeros(BMP_SIZE, dtype=bool)
+        for idx, token in enumerate(vocab.idx_to_token):
+            if len(token) != 1:
+                continue
+            codepoint = ord(token)
+            if codepoint < BMP_SIZE:
+                self._table[codepoint] = idx
+                found[codepoint] = True
+            else:
+                self._astral[codepoint] = idx
+        if self.num_buckets:
+            for codepoint in np.flatnonzero(~found).tolist():
+                if 0xD800 <= codepoint < 0xE000:
+                    # 单独的代理码位不能计算哈希桶, 映射为unknown token
+                    continue
+                self._table[codepoint] = self._oov_idx(chr(codepoint))
+
+    def _oov_idx(self, char: str) -> int:
+        if self.num_buckets:
+            return self._num_tokens + oov_bucket(char, self.num_buckets)
+        return self._unknown_idx
+
+    def encode(self, text: str) -> np.ndarray:
+        """
+        返回``text``中每个字的id, int32数组.
+        """
+        # 抓取的文本中可能有单独的代理码位, 与``vocab[list(text)]``一样查找
+        codepoints = np.frombuffer(
+            text.encode('utf-32-le', 'surrogatepass'), dtype='<u4'
+        )
+        ids = self._table[np.minimum(codepoints, BMP_SIZE - 1)]
+        astral = np.flatnonzero(codepoints >= BMP_SIZE)
+        for i in astral.tolist():
+            codepoint = int(codepoints[i])
+            ids[i] = self._astral.get(codepoint, -1)
+            if ids[i] < 0:
+                ids[i] = self._oov_idx(chr(codepoint))
+        if self._unknown_idx < 0 and (ids < 0).any():
+            raise KeyError(text[int(np.flatnonzero(ids < 0)[0])])
+        return ids
+
+    def lookup_batch(
+        self, texts: Sequence[str], max_length: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量查找, 所有文本拼接后只编码一次, 格式同``MMapVocab.lookup_batch``.
+
+        Returns
+        ----------
+        ids: 所有文本的id拼接成的int32数组
+        offsets: 第``i``个文本的id为``ids[offsets[i]:offsets[i + 1]]``
+        """
+        if max_length is not None:
+            texts = [text[:max_length] for text in texts]
+        offsets = ragged_offsets([len(text) for text in texts])
+        return self.encode(''.join(texts)), offsets
+
+    def split_batch(
+        self, texts: Sequence[str], max_length: Optional[int] = None
+    ) -> List[np.ndarray]:
+        """
+        批量查找, 返回每个文本的id数组(共享同一块内存).
+        """
+        ids, offsets = self.lookup_batch(texts, max_length=max_length)
+        return np.split(ids, offsets[1:-1])
+
+    def pad_batch(
+        self, texts: Sequence[str], pad_val: int,
+        max_length: Optional[int] = None, time_major: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量查找并直接填入补齐的矩阵, 见``pad_ragged``.
+        """
+        ids, offsets = self.lookup_batch(texts, max_length=max_length)
+        return pad_ragged(ids, offsets, pad_val, time_major=time_major)
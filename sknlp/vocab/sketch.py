@@ -0,0 +1,99 @@
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+class TokenSketch:
+    """
+    有界内存的近似词频统计(Misra-Gries heavy hitters).
+
+    计数表超过``2 * capacity``项时, 所有计数减去第``capacity + 1``大的计数,
+    删除不为正的计数, 计数表剩下不超过``capacity``项,
+    所以内存占用与语料大小无关.
+    每个token的估计频率不大于真实频率, 误差不超过``error``
+    (累计减去的计数, 至多为总token数的``1 / (capacity + 1)``),
+    频率高于``error``的token一定被保留, 没有发生过淘汰时结果是精确的.
+
+    多个进程分别统计的sketch可以用``merge``合并, 合并后误差界仍然成立.
+
+    Parameters
+    ----------
+    capacity: ``int``
+        剪枝后保留的token数
+    """
+
+    def __init__(self, capacity: int) -> None:
+        assert capacity > 0, 'capacity must be positive.'
+        self.capacity = capacity
+        self.error = 0
+        self.total = 0
+        self._counts: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def __getitem__(self, token: str) -> int:
+        return self._counts[token]
+
+    def update(
+        self, tokens: Union[Iterable[str], 'TokenSketch', Counter]
+    ) -> None:
+        """
+        统计``tokens``, 与``Counter.update``一样可以是token序列或计数,
+        也可以是另一个``TokenSketch``, 此时等价于``merge``.
+        """
+        if isinstance(tokens, TokenSketch):
+            self.merge(tokens)
+            return
+        if isinstance(tokens, Counter):
+            self.total += sum(tokens.values())
+        else:
+            tokens = list(tokens)
+            self.total += len(tokens)
+        self._counts.update(tokens)
+        if len(self._counts) > 2 * self.capacity:
+            self._prune()
+
+    def merge(self, other: 'TokenSketch') -> None:
+        self._counts.update(other._counts)
+        self.error += other.error
+        self.total += other.total
+        if len(self._counts) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self) -> None:
+        """
+        所有计数减去第``capacity + 1``大的计数, 只保留仍为正的计数.
+        """
+        counts = np.fromiter(
+            self._counts.values(), dtype=np.int64, count=len(self._counts)
+        )
+        threshold = int(np.partition(counts, -self.capacity - 1)[
+            -self.capacity - 1
+        ])
+        self.error += threshold
+        self._counts = Counter({
+            token: count - threshold
+            for token, count in self._counts.items() if count > threshold
+        })
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        估计频率最高的``n``个token, 为None时返回所有保留的token.
+        """
+        return self._counts.most_common(n)
+
+    def counter(
+        self, top_k: Optional[int] = None, min_freq: int = 1
+    ) -> Counter:
+        """
+        返回估计频率最高的``top_k``(默认为``capacity``)个,
+        且估计频率不小于``min_freq``的token计数, 可以直接用于构建``Vocab``.
+        """
+        if top_k is None:
+            top_k = self.capacity
+        return Counter({
+            token: count for token, count in self._counts.most_common(top_k)
+            if count >= min_freq
+        })
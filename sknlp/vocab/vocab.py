@@ -1,12 +1,216 @@
+from array import array
 from collections import Counter
-from typing import Tuple
+import hashlib
+import itertools
+import json
+from typing import Optional, Sequence, Tuple
+import zlib
 
 import numpy as np
 import gluonnlp
 from gensim.models import KeyedVectors
 
 
+def oov_bucket(token: str, num_buckets: int) -> int:
+    """
+    词汇表外的token所在的哈希桶, 以token的crc32为哈希.
+    """
+    return zlib.crc32(token.encode('utf-8')) % num_buckets
+
+
+def ragged_offsets(lengths: Sequence[int]) -> np.ndarray:
+    """
+    由各序列的长度得到拼接后的偏移, 第``i``个序列为``[offsets[i], offsets[i + 1])``.
+    """
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def vocab_meta(vocab) -> bytes:
+    """
+    词汇表中token以外的信息(unknown token, 保留token, 哈希桶数),
+    用于计算``digest``.
+    """
+    return json.dumps({
+        'unknown_token': vocab.unknown_token,
+        'reserved_tokens': vocab.reserved_tokens,
+        'identifiers_to_tokens': vocab._identifiers_to_tokens,
+        'num_buckets': getattr(vocab, 'num_buckets', 0)
+    }, ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+
+def pad_ragged(
+    ids: np.ndarray, offsets: np.ndarray, pad_val: int,
+    time_major: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    将拼接的id数组直接填入补齐的矩阵.
+
+    Parameters
+    ----------
+    ids: ``np.ndarray``
+        所有序列的id拼接成的数组
+    offsets: ``np.ndarray``
+        见``ragged_offsets``
+    pad_val: ``int``
+        补齐的值
+    time_major: ``bool``
+        为True时返回shape(最大长度, batch_size)的矩阵,
+        否则为shape(batch_size, 最大长度)
+
+    Returns
+    ----------
+    ids: 补齐的int32矩阵
+    lengths: 每个序列的长度
+    """
+    lengths = np.diff(offsets)
+    width = int(lengths.max()) if len(lengths) else 0
+    mask = np.arange(width) < lengths[:, None]
+    if time_major:
+        matrix = np.full((width, len(lengths)), pad_val, dtype=np.int32)
+        matrix.T[mask] = ids
+    else:
+        matrix = np.full((len(lengths), width), pad_val, dtype=np.int32)
+        matrix[mask] = ids
+    return matrix, lengths
+
+
 class Vocab(gluonnlp.Vocab):
+    """
+    词汇表, 在``gluonnlp.Vocab``的基础上增加了词汇表外token的哈希桶.
+
+    ``max_size``和``min_freq``限制词汇表的大小, 词汇表外的token
+    (包括被截掉的低频token)不再都映射为``<unk>``, 而是按哈希映射到
+    ``num_buckets``个桶中的一个, 桶的id排在所有token之后.
+    ``len(vocab)``包含桶的数量, 所以embedding的行数为
+    ``token数 + num_buckets``, 低频token仍然保留部分信息.
+
+    Parameters
+    ----------
+    counter: ``Counter``, optional
+        token的频率
+    num_buckets: ``int``
+        词汇表外token的哈希桶数, 为0时词汇表外的token映射为``<unk>``
+    kwargs:
+        ``gluonnlp.Vocab``的其他参数, 例如``max_size``和``min_freq``
+    """
+
+    num_buckets = 0
+
+    def __init__(self, counter=None, *args, num_buckets: int = 0, **kwargs):
+        super().__init__(counter, *args, **kwargs)
+        self.num_buckets = num_buckets
+
+    def __len__(self) -> int:
+        return len(self._idx_to_token) + self.num_buckets
+
+    def _lookup(self, token: str) -> int:
+        idx = self._token_to_idx.get(token)
+        if idx is None:
+            return len(self._idx_to_token) + oov_bucket(
+                token, self.num_buckets
+            )
+        return idx
+
+    def __getitem__(self, tokens):
+        if not self.num_buckets:
+            return super().__getitem__(tokens)
+        if not isinstance(tokens, (list, tuple)):
+            return self._lookup(tokens)
+        return [self._lookup(token) for token in tokens]
+
+    def lookup_batch(
+        self, token_lists: Sequence[Sequence[str]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量查找一组token序列的id, 不为每个序列生成id列表.
+
+        Returns
+        ----------
+        ids: 所有序列的id拼接成的int32数组
+        offsets: 第``i``个序列的id为``ids[offsets[i]:offsets[i + 1]]``
+        """
+        offsets = ragged_offsets([len(tokens) for tokens in token_lists])
+        tokens = itertools.chain.from_iterable(token_lists)
+        if self.num_buckets:
+            ids = map(self._lookup, tokens)
+        else:
+            unknown_idx = (
+                -1 if self.unknown_token is None
+                else self._token_to_idx[self.unknown_token]
+            )
+            ids = map(
+                self._token_to_idx.get, tokens, itertools.repeat(unknown_idx)
+            )
+        ids = np.fromiter(ids, dtype=np.int32, count=int(offsets[-1]))
+        if self.unknown_token is None and not self.num_buckets and (
+            ids < 0
+        ).any():
+            flat = list(itertools.chain.from_iterable(token_lists))
+            raise KeyError(flat[int(np.flatnonzero(ids < 0)[0])])
+        return ids, offsets
+
+    def pad_batch(
+        self, token_lists: Sequence[Sequence[str]],
+        pad_val: Optional[int] = None, time_major: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量查找并直接填入补齐的矩阵, 见``pad_ragged``.
+        ``pad_val``默认为``padding_token``的id.
+        """
+        if pad_val is None:
+            pad_val = self[self.padding_token]
+        ids, offsets = self.lookup_batch(token_lists)
+        return pad_ragged(ids, offsets, pad_val, time_major=time_major)
+
+    def to_tokens(self, indices):
+        """
+        id转换为token, 哈希桶的id转换为``unknown_token``.
+        ``indices``也可以是id数组.
+        """
+        if isinstance(indices, np.ndarray):
+            indices = indices.tolist()
+        if not self.num_buckets:
+            return super().to_tokens(indices)
+        if not isinstance(indices, (list, tuple)):
+            return self.to_tokens([indices])[0]
+        num_tokens = len(self._idx_to_token)
+        return [
+            self.unknown_token
+            if isinstance(idx, int) and num_tokens <= idx < len(self)
+            else super(Vocab, self).to_tokens(idx)
+            for idx in indices
+        ]
+
+    def digest(self) -> str:
+        """
+        词汇表内容的sha1, 与内容相同的``MMapVocab.digest``一致.
+        逐个token计算, 不生成json.
+        """
+        sha = hashlib.sha1(vocab_meta(self))
+        lengths = array('Q')
+        for token in self._idx_to_token:
+            encoded = token.encode('utf-8')
+            sha.update(encoded)
+            lengths.append(len(encoded))
+        sha.update(ragged_offsets(lengths).astype('<u8').tobytes())
+        return sha.hexdigest()
+
+    def to_json(self) -> str:
+        if not self.num_buckets:
+            return super().to_json()
+        vocab_dict = json.loads(super().to_json())
+        vocab_dict['num_buckets'] = self.num_buckets
+        return json.dumps(vocab_dict)
+
+    @classmethod
+    def from_json(cls, json_str: str) -> 'Vocab':
+        vocab_dict = json.loads(json_str)
+        num_buckets = vocab_dict.pop('num_buckets', 0)
+        vocab = super().from_json(json.dumps(vocab_dict))
+        vocab.num_buckets = num_buckets
+        return vocab
 
     @classmethod
     def from_word2vec_file(
@@ -0,0 +1,187 @@
+from collections import Counter
+import logging
+import os
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from .vocab import Vocab
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Word2vecReader:
+    """
+    逐行读取word2vec格式文件, 只有需要的行才解析向量.
+
+    Parameters
+    ----------
+    file_path: ``str``
+        word2vec文件路径
+    binary: ``bool``
+        文件是否以二进制存储
+    """
+
+    CHUNK_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, file_path: str, binary: bool = True) -> None:
+        self.file_path = file_path
+        self.binary = binary
+        with open(file_path, 'rb') as f:
+            fields = f.readline().split()
+        if len(fields) == 2:
+            self.count, self.dim = int(fields[0]), int(fields[1])
+            self.has_header = True
+        else:
+            # 没有文件头的文本格式(如GloVe), 行数需要扫描一次
+            if binary:
+                raise ValueError('binary word2vec file requires a header')
+            self.dim = len(fields) - 1
+            with open(file_path, 'rb') as f:
+                self.count = sum(1 for line in f if line.strip())
+            self.has_header = False
+
+    def __iter__(self) -> Iterator[Tuple[str, bytes]]:
+        """
+        依次返回token和未解析的向量, 向量由``parse``解析.
+        """
+        with open(self.file_path, 'rb') as f:
+            if self.has_header:
+                f.readline()
+            if self.binary:
+                yield from self._iter_binary(f)
+            else:
+                for line in f:
+                    token, _, vector = line.rstrip().partition(b' ')
+                    if token:
+                        yield token.decode('utf-8', errors='replace'), vector
+
+    def _iter_binary(self, f) -> Iterator[Tuple[str, bytes]]:
+        nbytes = 4 * self.dim
+        buf, pos = b'', 0
+        for _ in range(self.count):
+            end = buf.find(b' ', pos)
+            while end < 0 or len(buf) < end + 1 + nbytes:
+                chunk = f.read(self.CHUNK_SIZE)
+                if not chunk:
+                    raise ValueError('unexpected end of word2vec file')
+                buf, pos = buf[pos:] + chunk, 0
+                end = buf.find(b' ', pos)
+            token = buf[pos:end].lstrip(b'\n')
+            pos = end + 1 + nbytes
+            yield (
+                token.decode('utf-8', errors='replace'), buf[end + 1:pos]
+            )
+
+    def parse(self, vector: bytes) -> np.ndarray:
+        if self.binary:
+            return np.frombuffer(vector, dtype='<f4')
+        return np.array(vector.split(), dtype=np.float32)
+
+
+def load_word2vec(
+    file_path: str, output_path: str, vocab=None,
+    top_n: Optional[int] = None, binary: bool = True
+) -> Tuple[Vocab, np.ndarray]:
+    """
+    流式读取word2vec格式文件, 只保留需要的行,
+    写入``output_path``(``.npy``格式)并以内存映射方式返回.
+
+    ``vocab``不为None时只保留词汇表中的token, 第``i``行为id为``i``的token
+    的向量, 文件中不存在的token(包括保留token和哈希桶)为0;
+    否则取文件中的前``top_n``个token(word2vec文件按频率排序)构建词汇表.
+    内存占用与文件大小无关, 只需要一行向量.
+
+    Parameters
+    ----------
+    file_path: ``str``
+        word2vec文件路径
+    output_path: ``str``
+        保存embedding矩阵的``.npy``文件路径
+    vocab: ``Vocab`` or ``MMapVocab``, optional
+        词汇表
+    top_n: ``int``, optional
+        ``vocab``为None时保留的token数, 为None时保留所有token
+    binary: ``bool``
+        word2vec文件是否以二进制存储, default=True
+
+    Returns
+    ----------
+    vocab: 词汇表
+    embed: embedding矩阵的内存映射, shape(len(vocab), embed_size)
+    """
+    reader = _Word2vecReader(file_path, binary=binary)
+    if vocab is None:
+        vocab, rows = _select_top_tokens(reader, top_n)
+    else:
+        rows = None
+    tmp_path = output_path + '.tmp.npy'
+    weight = np.lib.format.open_memmap(
+        tmp_path, mode='w+', dtype=np.float32,
+        shape=(len(vocab), reader.dim)
+    )
+    token_to_idx = vocab.token_to_idx
+    # 保留token(<unk>, <pad>等)一般不在文件中, 出现时仍然读取,
+    # 但不计入需要找到的token
+    reserved = np.zeros(len(vocab), dtype=bool)
+    # 需要读取的行数, 全部找到后提前结束
+    if rows is None:
+        for token in [vocab.unknown_token] + list(vocab.reserved_tokens or []):
+            idx = token_to_idx.get(token) if token is not None else None
+            if idx is not None:
+                reserved[idx] = True
+        remaining = len(vocab.idx_to_token) - int(reserved.sum())
+    else:
+        remaining = sum(1 for idx in rows if idx >= 0)
+    # 已经写入向量的行, 文件中重复的token只使用第一次出现的向量
+    filled = np.zeros(len(vocab), dtype=bool)
+    found = 0
+    for i, (token, vector) in enumerate(reader):
+        if rows is not None:
+            if i >= len(rows):
+                break
+            idx = rows[i]
+        else:
+            idx = token_to_idx.get(token)
+        if idx is None or idx < 0 or filled[idx]:
+            continue
+        weight[idx] = reader.parse(vector)
+        filled[idx] = True
+        found += 1
+        if not reserved[idx]:
+            remaining -= 1
+            if remaining == 0:
+                break
+    weight.flush()
+    del weight
+    os.replace(tmp_path, output_path)
+    logger.info(
+        f'{found} of {len(vocab.idx_to_token)} tokens found in {file_path}'
+    )
+    return vocab, np.load(output_path, mmap_mode='r')
+
+
+def _select_top_tokens(reader: _Word2vecReader, top_n: Optional[int]):
+    """
+    读取文件中的前``top_n``个token构建词汇表,
+    返回词汇表和文件中每行对应的行号(重复的token为-1).
+    """
+    if top_n is None:
+        top_n = reader.count
+    tokens = []
+    for token, _ in reader:
+        if len(tokens) == top_n:
+            break
+        tokens.append(token)
+    # 计数递减, 保持文件中的顺序
+    counter: Counter = Counter()
+    for i, token in enumerate(tokens):
+        counter.setdefault(token, len(tokens) - i)
+    vocab = Vocab(counter)
+    seen = set()
+    rows = []
+    for token in tokens:
+        rows.append(-1 if token in seen else vocab[token])
+        seen.add(token)
+    return vocab, rows
@@ -1,4 +1,5 @@
 import mxnet as mx
+import numpy as np
 from sknlp.classifier import DeepClassifier
 from sknlp.vocab import Vocab
 
@@ -11,8 +12,8 @@ class TestDeepClassifier:
     def test_batchify_fn(self):
         batchify = self.clf._batchify_fn()
         data = [
-            ([8, 9, 10], 0),
-            ([100, 200, 300, 400, 500], 1)
+            ([8, 9, 10], np.array([0], dtype=np.int32)),
+            ([100, 200, 300, 400, 500], np.array([1], dtype=np.int32))
         ]
         batch_inputs, batch_mask, batch_labels = batchify(data)
         assert batch_inputs.transpose().tolist() == [
@@ -22,4 +23,4 @@ class TestDeepClassifier:
         assert batch_mask.transpose().tolist() == [
             [1, 1, 1, 0, 0], [1, 1, 1, 1, 1]
         ]
-        assert batch_labels.transpose().tolist() == [0, 1]
+        assert batch_labels.tolist() == [[1, 0], [0, 1]]
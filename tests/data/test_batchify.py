@@ -1,4 +1,6 @@
-from sknlp.data import BPTTBatchify
+import numpy as np
+
+from sknlp.data import Pad, BPTTBatchify
 
 
 def test_bpttbatchify():
@@ -18,3 +20,17 @@ def test_bpttbatchify():
         [3, 2, 8, 9, 10, 1, 1],
         [3, 2, 100, 200, 300, 400, 500]
     ]
+
+
+def test_pad_mixed():
+    data = [np.array([1, 2], dtype=np.int32), [3, 4, 5]]
+    batch, length = Pad(pad_val=0, ret_length=True)(data)
+    assert batch.tolist() == [[1, 2, 0], [3, 4, 5]]
+    assert length.tolist() == [2, 3]
+
+
+def test_pad_min_length():
+    data = [[1, 2], np.array([3], dtype=np.int32)]
+    batch, length = Pad(pad_val=-1, min_length=4, ret_length=True)(data)
+    assert batch.tolist() == [[1, 2, -1, -1], [3, -1, -1, -1]]
+    assert length.tolist() == [2, 1]
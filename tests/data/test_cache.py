@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+
+from sknlp.vocab import Vocab, MMapVocab
+from sknlp.data.cache import (
+    TokenCache, SampleCache, make_cache_key, segmenter_name,
+    file_fingerprint, record_fingerprint, _entry_nbytes
+)
+
+
+class TestTokenCache:
+
+    def test_compile_and_load(self, tmp_path):
+        cache = TokenCache(str(tmp_path), 'key', shard_size=2)
+        entries = [([1, 2, 3], [0]), ([], [1, 2]), ([4], []), ([5, 6], [3])]
+        assert not cache.is_valid(4)
+        cache.compile(iter(entries))
+        assert cache.is_valid(4)
+        assert not cache.is_valid(5)
+        assert not TokenCache(str(tmp_path), 'other').is_valid(4)
+
+        cache = TokenCache(str(tmp_path), 'key')
+        cache.load()
+        assert len(cache) == 4
+        assert [
+            (text.tolist(), label.tolist()) for text, label in
+            (cache[i] for i in range(4))
+        ] == entries
+        assert cache.text_lengths == [3, 0, 1, 2]
+
+    def test_cache_key(self, tmp_path, monkeypatch):
+        vocab = Vocab({'a': 1})
+        key = make_cache_key(vocab, list, 100)
+        assert key == make_cache_key(Vocab({'a': 1}), list, 100)
+        assert key != make_cache_key(vocab, list, 50)
+        assert key != make_cache_key(vocab, str.split, 100)
+        assert key != make_cache_key(vocab, list, 100, {'1': 0})
+        assert key != make_cache_key(vocab, list, 100, fingerprint='abc')
+        assert key != make_cache_key(None, list, 100)
+        vocab = Vocab({'a': 1, 'c': 2, 'b': 3})
+        assert make_cache_key(vocab, list, 100) == make_cache_key(
+            Vocab.from_json(vocab.to_json()), list, 100
+        )
+        path = os.path.join(tmp_path, 'vocab.bin')
+        MMapVocab.save(vocab, path)
+        mmap_vocab = MMapVocab(path)
+        # 二进制词汇表只计算摘要, 不解码所有token
+        monkeypatch.setattr(MMapVocab, 'to_json', None)
+        assert make_cache_key(mmap_vocab, list, 100) == make_cache_key(
+            vocab, list, 100
+        )
+        assert segmenter_name(list) == 'char'
+
+
+def test_file_fingerprint(tmp_path):
+    path = os.path.join(tmp_path, 'a.txt')
+    with open(path, 'w') as f:
+        f.write('abc')
+    fingerprint = file_fingerprint([path])
+    assert fingerprint == file_fingerprint([path])
+    with open(path, 'w') as f:
+        f.write('abd')
+    assert fingerprint != file_fingerprint([path])
+
+
+def test_record_fingerprint(tmp_path):
+    idx_path = os.path.join(tmp_path, 'a.idx')
+    rec_path = os.path.join(tmp_path, 'a.rec')
+    for path in (idx_path, rec_path):
+        with open(path, 'w') as f:
+            f.write('abc')
+    fingerprint = record_fingerprint([(idx_path, rec_path)])
+    assert fingerprint == record_fingerprint([(idx_path, rec_path)])
+    stat = os.stat(rec_path)
+    os.utime(rec_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert fingerprint != record_fingerprint([(idx_path, rec_path)])
+
+
+class TestSampleCache:
+
+    def test_lru(self):
+        overhead = _entry_nbytes((np.zeros(0), np.zeros(0)))
+        cache = SampleCache(max_bytes=2 * overhead + 32)
+        assert cache.get(0) is None
+        sample = cache.put(0, ([1, 2, 3], np.array([0])))
+        assert sample[0].dtype == np.int32
+        assert cache.nbytes == overhead + 16
+        cache.put(1, ([4, 5], np.array([1])))
+        assert cache.get(0)[0].tolist() == [1, 2, 3]
+        cache.put(2, ([6], np.array([2])))
+        assert cache.get(1) is None
+        assert cache.get(0) is not None
+        assert cache.cache_info() == {
+            'hits': 2, 'misses': 2, 'size': 2, 'nbytes': 2 * overhead + 24,
+            'max_bytes': 2 * overhead + 32
+        }
+        cache.put(3, list(range(1000)))
+        assert len(cache) == 2
+
+    def test_copy_views(self):
+        cache = SampleCache(max_bytes=1024)
+        batch = np.arange(100, dtype=np.int32)
+        sample = cache.put(0, np.split(batch, [3])[0])
+        assert sample.base is None
+        assert sample.tolist() == [0, 1, 2]
+        assert len(cache) == 1
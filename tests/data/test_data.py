@@ -1,5 +1,10 @@
 import os
-from sknlp.data import SimpleIndexedRecordIO
+import threading
+
+import mxnet as mx
+
+from sknlp.data import SimpleIndexedRecordIO, BlockCompressedRecordIO
+from sknlp.data.data import RecordIndex, convert_index
 
 
 class TestSimpleIndexedRecordIO:
@@ -16,3 +21,177 @@ class TestSimpleIndexedRecordIO:
         record.close()
         record = SimpleIndexedRecordIO(idx_file, rec_file, 'r')
         assert record.read_idx(1).decode('utf-8') == 'record_1,0|1'
+
+    def test_mmap_read(self, tmp_path):
+        idx_file = os.path.join(tmp_path, self.IDX_FILE)
+        rec_file = os.path.join(tmp_path, self.REC_FILE)
+        record = SimpleIndexedRecordIO(idx_file, rec_file, 'w')
+        records = [b'record_0', b'', b'abc', b'\x0a\x23\xd7\xce' * 3 + b'x']
+        for r in records:
+            record.write(r)
+        record.close()
+        record = SimpleIndexedRecordIO(idx_file, rec_file, 'r', use_mmap=True)
+        assert [bytes(record.read_idx(i)) for i in (3, 0, 2, 1)] == [
+            records[3], records[0], records[2], records[1]
+        ]
+        record.close()
+
+    def test_binary_index(self, tmp_path):
+        idx_file = os.path.join(tmp_path, self.IDX_FILE)
+        rec_file = os.path.join(tmp_path, self.REC_FILE)
+        record = SimpleIndexedRecordIO(idx_file, rec_file, 'w')
+        record.write('你好\t1'.encode('utf-8'))
+        record.write('abc'.encode('utf-8'), num_tokens=1)
+        record.close()
+        assert RecordIndex.is_binary(idx_file)
+        index = RecordIndex.load(idx_file, rec_file)
+        assert index.offsets.tolist() == [0, 16]
+        assert index.lengths.tolist() == [16, 12]
+        assert index.num_tokens.tolist() == [2, 1]
+
+    def test_convert_index(self, tmp_path):
+        idx_file = os.path.join(tmp_path, self.IDX_FILE)
+        rec_file = os.path.join(tmp_path, self.REC_FILE)
+        record = mx.recordio.MXIndexedRecordIO(
+            os.path.join(tmp_path, 'mx.idx'), rec_file, 'w'
+        )
+        with open(idx_file, 'w') as f:
+            for r in ('你好\t1', 'abc\t2', '12345'):
+                f.write(f'{record.tell()}\n')
+                record.write(r.encode('utf-8'))
+        record.close()
+        assert not RecordIndex.load(idx_file, rec_file).has_num_tokens
+        convert_index(idx_file, rec_file)
+        index = RecordIndex.load(idx_file, rec_file)
+        assert index.has_num_tokens
+        assert index.num_tokens.tolist() == [2, 3, 5]
+        record = SimpleIndexedRecordIO(idx_file, rec_file, 'r')
+        assert record.read_idx(2) == b'12345'
+
+    def test_read_batch(self, tmp_path):
+        idx_file = os.path.join(tmp_path, self.IDX_FILE)
+        rec_file = os.path.join(tmp_path, self.REC_FILE)
+        record = SimpleIndexedRecordIO(idx_file, rec_file, 'w')
+        for i in range(10):
+            record.write(f'record_{i}'.encode('utf-8'))
+        record.close()
+        for use_mmap in (False, True):
+            record = SimpleIndexedRecordIO(
+                idx_file, rec_file, 'r', use_mmap=use_mmap
+            )
+            record.MERGE_GAP = 0
+            indices = [7, 2, 3, 9, 2]
+            assert [bytes(r) for r in record.read_batch(indices)] == [
+                f'record_{i}'.encode('utf-8') for i in indices
+            ]
+            record.close()
+
+    def test_write_many(self, tmp_path):
+        idx_file = os.path.join(tmp_path, self.IDX_FILE)
+        rec_file = os.path.join(tmp_path, self.REC_FILE)
+        records = [b'record_0', b'', b'abc', b'\x0a\x23\xd7\xce' * 3 + b'x']
+        record = SimpleIndexedRecordIO(idx_file, rec_file, 'w')
+        record.BUFFER_SIZE = 16
+        assert record.write_many(records, num_tokens=[1, 2, 3, 4]) == 4
+        record.close()
+        reference = mx.recordio.MXRecordIO(
+            os.path.join(tmp_path, 'mx.rec'), 'w'
+        )
+        for r in records:
+            reference.write(r)
+        reference.close()
+        with open(rec_file, 'rb') as f, \
+                open(os.path.join(tmp_path, 'mx.rec'), 'rb') as g:
+            assert f.read() == g.read()
+        record = SimpleIndexedRecordIO(idx_file, rec_file, 'r')
+        assert record.index.num_tokens.tolist() == [1, 2, 3, 4]
+        assert [record.read_idx(i) for i in range(4)] == records
+
+    def test_append(self, tmp_path):
+        idx_file = os.path.join(tmp_path, self.IDX_FILE)
+        rec_file = os.path.join(tmp_path, self.REC_FILE)
+        record = SimpleIndexedRecordIO(idx_file, rec_file, 'a')
+        record.write_many([b'record_0', b'record_1'])
+        record.close()
+        record = SimpleIndexedRecordIO(idx_file, rec_file, 'a')
+        record.write(b'record_2')
+        record.commit()
+        # 模拟写入中断: 数据已写入文件, 但没有提交
+        record.write(b'uncommitted')
+        record._flush()
+        record._file.close()
+        record.fidx._file.close()
+        record.is_open = False
+        assert os.path.getsize(rec_file) > 48
+        assert RecordIndex.load(idx_file, rec_file).offsets.tolist() == [
+            0, 16, 32
+        ]
+        record = SimpleIndexedRecordIO(idx_file, rec_file, 'a')
+        record.write(b'record_3')
+        record.close()
+        record = SimpleIndexedRecordIO(idx_file, rec_file, 'r')
+        assert [record.read_idx(i) for i in range(4)] == [
+            f'record_{i}'.encode('utf-8') for i in range(4)
+        ]
+        assert os.path.getsize(rec_file) == 64
+
+    def test_concurrent_append(self, tmp_path):
+        idx_file = os.path.join(tmp_path, self.IDX_FILE)
+        rec_file = os.path.join(tmp_path, self.REC_FILE)
+        first = SimpleIndexedRecordIO(idx_file, rec_file, 'a')
+        first.write(b'record_0')
+        # 已写入文件但尚未提交
+        first._flush()
+        opened = threading.Event()
+
+        def append():
+            second = SimpleIndexedRecordIO(idx_file, rec_file, 'a')
+            opened.set()
+            second.write(b'record_2')
+            second.close()
+
+        thread = threading.Thread(target=append)
+        thread.start()
+        assert not opened.wait(0.2)
+        first.write(b'record_1')
+        first.close()
+        thread.join()
+        record = SimpleIndexedRecordIO(idx_file, rec_file, 'r')
+        assert [record.read_idx(i) for i in range(3)] == [
+            f'record_{i}'.encode('utf-8') for i in range(3)
+        ]
+
+
+class TestBlockCompressedRecordIO:
+
+    IDX_FILE = 'tmp.idx'
+    REC_FILE = 'tmp.crec'
+
+    def test_read_write(self, tmp_path):
+        idx_file = os.path.join(tmp_path, self.IDX_FILE)
+        rec_file = os.path.join(tmp_path, self.REC_FILE)
+        for compression in ('zlib', 'lzma'):
+            record = BlockCompressedRecordIO(
+                idx_file, rec_file, 'w', compression=compression,
+                block_size=3
+            )
+            for i in range(10):
+                record.write(f'record_{i}\t{i}'.encode('utf-8'))
+            record.close()
+            for use_mmap in (False, True):
+                record = BlockCompressedRecordIO(
+                    idx_file, rec_file, 'r', cache_blocks=2,
+                    use_mmap=use_mmap
+                )
+                assert record.index.compression == compression
+                assert len(record.index) == 10
+                assert len(record.index.blocks) == 4
+                assert record.index.num_tokens.tolist() == [8] * 10
+                assert bytes(record.read_idx(9)) == b'record_9\t9'
+                indices = [7, 2, 3, 9, 2, -1]
+                assert [bytes(r) for r in record.read_batch(indices)] == [
+                    f'record_{i % 10}\t{i % 10}'.encode('utf-8')
+                    for i in indices
+                ]
+                assert len(record._cache) == 2
+                record.close()
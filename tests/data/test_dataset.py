@@ -1,10 +1,16 @@
+import json
 import os
 
+import numpy as np
+import pytest
+
 from sknlp.vocab import Vocab
-from sknlp.data import SimpleIndexedRecordIO
+from sknlp.data import SimpleIndexedRecordIO, BlockCompressedRecordIO
 from sknlp.data import (
-    SequenceTagDataset, ClassifyDataset, InMemoryDataset, NLPDataset,
-    SupervisedNLPDataset, RecordFileDataset
+    SequenceTagDataset, ClassifyDataset, InMemoryDataset, ColumnarDataset,
+    NLPDataset,
+    SupervisedNLPDataset, RecordFileDataset, ShardedRecordFileDataset,
+    StreamDataset
 )
 
 
@@ -31,6 +37,99 @@ class TestRecordFileDataset(TestDataset):
         dataset = RecordFileDataset(os.path.join(tmp_path, self.REC_FILE))
         assert len(dataset) == 5
         assert dataset[2] == 'record_2\t0|1'
+        assert dataset.text_lengths.tolist() == [8] * 5
+        nlp_dataset = NLPDataset(dataset, vocab=Vocab(), max_length=5)
+        assert nlp_dataset.text_lengths == [5] * 5
+        # 索引中的字符数不是其他分词器的分词长度
+        nlp_dataset = NLPDataset(
+            dataset, vocab=Vocab(), segmenter=lambda text: text.split('_'),
+            max_length=5
+        )
+        assert nlp_dataset.text_lengths == [1] * 5
+
+    def test_compressed_dataset(self, tmp_path):
+        record = BlockCompressedRecordIO(
+            os.path.join(tmp_path, self.IDX_FILE),
+            os.path.join(tmp_path, 'tmp.crec'), 'w', block_size=2
+        )
+        for i in range(5):
+            record.write(f'record_{i}\t{i}'.encode('utf-8'))
+        record.close()
+        dataset = RecordFileDataset(os.path.join(tmp_path, 'tmp.crec'))
+        assert len(dataset) == 5
+        assert RecordFileDataset.count(dataset.filename) == 5
+        assert dataset[2] == 'record_2\t2'
+        assert dataset.read_batch([4, 1]) == ['record_4\t4', 'record_1\t1']
+        assert dataset.text_lengths.tolist() == [8] * 5
+
+    def test_mmap_dataset(self, tmp_path):
+        self.set_up(tmp_path)
+        dataset = RecordFileDataset(
+            os.path.join(tmp_path, self.REC_FILE), use_mmap=True
+        )
+        assert len(dataset) == 5
+        assert dataset[2] == 'record_2\t0|1'
+
+
+class TestStreamDataset(TestDataset):
+
+    def test_dataset(self, tmp_path):
+        self.set_up(tmp_path)
+        text_file = os.path.join(tmp_path, 'tmp.txt')
+        with open(text_file, 'w') as f:
+            f.write('record_5\t0\nrecord_6\t1\n')
+        dataset = StreamDataset(
+            [os.path.join(tmp_path, self.REC_FILE), text_file]
+        )
+        rows = list(dataset)
+        assert rows[2] == 'record_2\t0|1'
+        assert rows[5:] == ['record_5\t0', 'record_6\t1']
+
+        nlp_dataset = SupervisedNLPDataset(dataset)
+        assert nlp_dataset.is_streaming
+        assert sorted(nlp_dataset._label2idx) == ['0', '1', '2', '3']
+        nlp_dataset = NLPDataset(dataset)
+        samples = list(nlp_dataset)
+        assert len(samples) == 7
+        assert nlp_dataset._vocab.to_tokens(samples[6]) == list('record_6')
+
+
+    def write_records(self, tmp_path, num_records):
+        rec_file = os.path.join(tmp_path, self.REC_FILE)
+        record = SimpleIndexedRecordIO(
+            os.path.join(tmp_path, self.IDX_FILE), rec_file, 'w'
+        )
+        for i in range(num_records):
+            record.write(f'record_{i}'.encode('utf-8'))
+        record.close()
+        return rec_file
+
+    def test_uncommitted(self, tmp_path):
+        rec_file = self.write_records(tmp_path, 3)
+        record = SimpleIndexedRecordIO(
+            os.path.join(tmp_path, self.IDX_FILE), rec_file, 'a'
+        )
+        # 模拟追加中断: 完整的记录已写入文件, 但没有提交
+        record.write(b'uncommitted')
+        record._flush()
+        record._file.close()
+        record.fidx._file.close()
+        record.is_open = False
+        assert list(StreamDataset(rec_file)) == [
+            f'record_{i}' for i in range(3)
+        ]
+
+    def test_torn_record(self, tmp_path):
+        rec_file = self.write_records(tmp_path, 3)
+        os.remove(os.path.join(tmp_path, self.IDX_FILE))
+        expected = [f'record_{i}' for i in range(3)]
+        with open(rec_file, 'rb') as f:
+            data = f.read()
+        # 末尾的记录头不完整, 或记录数据不完整
+        for partial in (data[:4], data[:12]):
+            with open(rec_file, 'wb') as f:
+                f.write(data + partial)
+            assert list(StreamDataset(rec_file)) == expected
 
 
 class TestInMemoryDataset(TestDataset):
@@ -46,6 +145,36 @@ class TestInMemoryDataset(TestDataset):
         assert dataset[2] == 'record_2\t2|3\to3\ti3'
 
 
+class TestColumnarDataset(TestDataset):
+
+    def test_dataset(self, tmp_path):
+        dataset = ColumnarDataset(
+            ['record_0', '大家\t好', ''],
+            ['0|1', '1|2', '2|3']
+        )
+        assert len(dataset) == 3
+        assert dataset[1] == ('大家\t好', '1|2')
+        assert dataset[-1] == ('', '2|3')
+
+    def test_fingerprint(self):
+        dataset = ColumnarDataset(['ab', 'c'], ['1', '2'])
+        assert dataset.fingerprint() == ColumnarDataset(
+            ['ab', 'c'], ['1', '2']
+        ).fingerprint()
+        assert dataset.fingerprint() != ColumnarDataset(
+            ['a', 'bc'], ['1', '2']
+        ).fingerprint()
+
+    def test_nlp_dataset(self):
+        dataset = ClassifyDataset(
+            ColumnarDataset(['大叫好', '大\t家好'], ['1|2', '3'])
+        )
+        text, label = dataset[1]
+        assert len(text) == 4
+        assert label.tolist() == [2]
+        assert dataset.text_lengths == [3, 4]
+
+
 class TestNLPDataset(TestDataset):
 
     dataset = InMemoryDataset(
@@ -60,7 +189,7 @@ class TestNLPDataset(TestDataset):
     def test_dataset(self, tmp_path):
         nlp_dataset = self.dataset_cls(self.dataset)
         assert len(nlp_dataset) == 3
-        assert nlp_dataset[0] == [5, 7, 4]
+        assert nlp_dataset[0].tolist() == [5, 7, 4]
 
     def test_custom_settings(self):
         nlp_dataset = self.dataset_cls(
@@ -70,16 +199,43 @@ class TestNLPDataset(TestDataset):
                 '家': 1, '厉': 1, '害': 1
             })
         )
-        assert nlp_dataset[0] == [4, 5, 6]
+        assert nlp_dataset[0].tolist() == [4, 5, 6]
 
     def test_max_length(self):
         nlp_dataset = self.dataset_cls(self.dataset, max_length=2)
-        assert nlp_dataset[0] == [5, 7]
+        assert nlp_dataset[0].tolist() == [5, 7]
 
     def test_text_length(self):
         nlp_dataset = self.dataset_cls(self.dataset)
         assert nlp_dataset.text_lengths == [3, 3, 3]
 
+    def test_vocab_budget(self):
+        nlp_dataset = self.dataset_cls(
+            self.dataset, max_vocab_size=1, num_oov_buckets=2
+        )
+        assert nlp_dataset._vocab.idx_to_token[4:] == ['好']
+        assert len(nlp_dataset._vocab) == 7
+        assert 5 <= nlp_dataset._vocab['大'] < 7
+
+    def test_vocab_sketch(self):
+        exact = self.dataset_cls(self.dataset)
+        for n_jobs in (1, 2):
+            nlp_dataset = self.dataset_cls(
+                self.dataset, vocab_sketch_size=2, n_jobs=n_jobs
+            )
+            assert nlp_dataset._vocab.idx_to_token[4:] == ['好', '大']
+            assert nlp_dataset.text_lengths == exact.text_lengths
+
+    def test_parallel_scan(self):
+        serial = self.dataset_cls(self.dataset)
+        parallel = self.dataset_cls(self.dataset, n_jobs=2)
+        assert parallel._vocab.idx_to_token == serial._vocab.idx_to_token
+        assert parallel.text_lengths == serial.text_lengths
+        lazy = self.dataset_cls(
+            self.dataset, vocab=serial._vocab, max_length=2, n_jobs=2
+        )
+        assert lazy.text_lengths == [2, 2, 2]
+
 
 class TestSupervisedNLPDataset(TestNLPDataset):
 
@@ -95,7 +251,11 @@ class TestSupervisedNLPDataset(TestNLPDataset):
     def test_dataset(self, tmp_path):
         dataset = self.dataset_cls(self.dataset)
         assert len(dataset) == 3
-        assert dataset[0] == ([5, 7, 4], [0, 1])
+        text, label = dataset[0]
+        assert (text.tolist(), label.tolist()) == ([5, 7, 4], [0, 1])
+        assert [
+            label.tolist() for _, label in dataset.read_batch([2, 0])
+        ] == [[2, 0], [0, 1]]
 
     def test_custom_settings(self):
         dataset = self.dataset_cls(
@@ -106,11 +266,37 @@ class TestSupervisedNLPDataset(TestNLPDataset):
             }),
             label2idx={'1': 2, '2': 0, '3': 1}
         )
-        assert dataset[0] == ([4, 5, 6], [2, 0])
+        text, label = dataset[0]
+        assert (text.tolist(), label.tolist()) == ([4, 5, 6], [2, 0])
 
     def test_max_length(self):
         dataset = self.dataset_cls(self.dataset, max_length=2)
-        assert dataset[0] == ([5, 7], [0, 1])
+        text, label = dataset[0]
+        assert (text.tolist(), label.tolist()) == ([5, 7], [0, 1])
+
+    def test_parallel_labels(self):
+        serial = self.dataset_cls(self.dataset)
+        parallel = self.dataset_cls(self.dataset, n_jobs=2)
+        assert parallel._label_ids.tolist() == serial._label_ids.tolist()
+        assert parallel._label_offsets.tolist() == (
+            serial._label_offsets.tolist()
+        )
+
+    def test_labels_without_scan(self, monkeypatch):
+        built = self.dataset_cls(self.dataset)
+
+        def _scan(*args, **kwargs):
+            raise AssertionError('scanned')
+
+        monkeypatch.setattr(self.dataset_cls, '_scan', _scan)
+        dataset = self.dataset_cls(
+            self.dataset, vocab=built._vocab, label2idx=built._label2idx
+        )
+        assert dataset._label_ids is None
+        assert [
+            label.tolist() for _, label in dataset.read_batch([2, 0, 1])
+        ] == [built[i][1].tolist() for i in (2, 0, 1)]
+        assert dataset[1][1].tolist() == built[1][1].tolist()
 
 
 class TestClassifyDataset(TestSupervisedNLPDataset):
@@ -119,9 +305,23 @@ class TestClassifyDataset(TestSupervisedNLPDataset):
 
     def test_dataset(self, tmp_path):
         dataset = self.dataset_cls(self.dataset)
-        assert dataset[0] == ([5, 7, 4], [1, 1, 0])
+        text, label = dataset[0]
+        assert (text.tolist(), label.tolist()) == ([5, 7, 4], [0, 1])
         assert dataset.idx2labels([0, 8]) == ['1']
 
+    def test_unknown_labels(self):
+        dataset = self.dataset_cls(self.dataset, label2idx={'1': 0})
+        assert dataset._label_ids is not None
+        assert [label.tolist() for _, label in dataset.read_batch(
+            [0, 1, 2]
+        )] == [[0], [0], [0]]
+        dataset = self.dataset_cls(
+            self.dataset, vocab=dataset._vocab, label2idx={'3': 0}
+        )
+        assert [label.tolist() for _, label in dataset.read_batch(
+            [0, 1, 2]
+        )] == [[], [0], [0]]
+
     def test_custom_settings(self):
         dataset = self.dataset_cls(
             self.dataset,
@@ -131,11 +331,13 @@ class TestClassifyDataset(TestSupervisedNLPDataset):
             }),
             label2idx={'1': 2, '2': 0, '3': 1}
         )
-        assert dataset[0] == ([4, 5, 6], [1, 0, 1])
+        text, label = dataset[0]
+        assert (text.tolist(), label.tolist()) == ([4, 5, 6], [2, 0])
 
     def test_max_length(self):
         dataset = self.dataset_cls(self.dataset, max_length=2)
-        assert dataset[0] == ([5, 7], [1, 1, 0])
+        text, label = dataset[0]
+        assert (text.tolist(), label.tolist()) == ([5, 7], [0, 1])
 
 
 class TestSequenceTagDataset(TestSupervisedNLPDataset):
@@ -151,7 +353,8 @@ class TestSequenceTagDataset(TestSupervisedNLPDataset):
 
     def test_dataset(self, tmp_path):
         dataset = self.dataset_cls(self.dataset)
-        assert dataset[0] == ([5, 7, 4], [0, 1, 2])
+        text, label = dataset[0]
+        assert (text.tolist(), label.tolist()) == ([5, 7, 4], [0, 1, 2])
         assert dataset.idx2labels([0, 10]) == ['1', 'O']
 
     def test_custom_settings(self):
@@ -163,8 +366,111 @@ class TestSequenceTagDataset(TestSupervisedNLPDataset):
             }),
             label2idx={'1': 2, '2': 0, '3': 1, '4': 3, 'x': 4}
         )
-        assert dataset[0] == ([4, 5, 6], [2, 0, 1])
+        text, label = dataset[0]
+        assert (text.tolist(), label.tolist()) == ([4, 5, 6], [2, 0, 1])
 
     def test_max_length(self):
         dataset = self.dataset_cls(self.dataset, max_length=2)
-        assert dataset[0] == ([5, 7], [0, 1])
+        text, label = dataset[0]
+        assert (text.tolist(), label.tolist()) == ([5, 7], [0, 1])
+
+    def test_sample_cache(self):
+        dataset = self.dataset_cls(self.dataset, sample_cache_bytes=4096)
+        text, label = dataset[0]
+        assert text.dtype == np.int32
+        assert (text.tolist(), label.tolist()) == ([5, 7, 4], [0, 1, 2])
+        uncached = self.dataset_cls(self.dataset)
+        assert [
+            text.tolist() for text, _ in dataset.read_batch([2, 0, 1])
+        ] == [uncached[i][0].tolist() for i in (2, 0, 1)]
+        list(dataset)
+        assert dataset.cache_info()['hits'] == 4
+        assert dataset.cache_info()['misses'] == 3
+
+    def test_cache(self, tmp_path):
+        dataset = self.dataset_cls(self.dataset, cache_dir=str(tmp_path))
+        dataset = self.dataset_cls(
+            self.dataset, vocab=dataset._vocab, label2idx=dataset._label2idx,
+            cache_dir=str(tmp_path)
+        )
+        assert dataset._cache is not None
+        text, label = dataset[0]
+        assert (text.tolist(), label.tolist()) == ([5, 7, 4], [0, 1, 2])
+        assert dataset.text_lengths == [3, 3, 3]
+
+    def test_cache_hit(self, tmp_path, monkeypatch):
+        built = self.dataset_cls(self.dataset, cache_dir=str(tmp_path))
+
+        def _scan(*args, **kwargs):
+            raise AssertionError('cache miss')
+
+        monkeypatch.setattr(self.dataset_cls, '_scan', _scan)
+        cached = self.dataset_cls(self.dataset, cache_dir=str(tmp_path))
+        assert cached._vocab.idx_to_token == built._vocab.idx_to_token
+        assert cached._label2idx == built._label2idx
+        assert cached.text_lengths == [3, 3, 3]
+        text, label = cached[1]
+        assert text.tolist() == built[1][0].tolist()
+        assert label.tolist() == [0, 3, 2]
+        # 数据集或文本截断长度变化时使用新的缓存
+        changed = InMemoryDataset(['大叫'], ['1|2'])
+        with pytest.raises(AssertionError):
+            self.dataset_cls(changed, cache_dir=str(tmp_path))
+        with pytest.raises(AssertionError):
+            self.dataset_cls(
+                self.dataset, cache_dir=str(tmp_path), max_length=2
+            )
+
+
+class TestShardedRecordFileDataset:
+
+    def set_up(self, tmp_path):
+        for shard, num_records in enumerate([3, 1, 2]):
+            record = SimpleIndexedRecordIO(
+                os.path.join(tmp_path, f'part-{shard}.idx'),
+                os.path.join(tmp_path, f'part-{shard}.rec'), 'w'
+            )
+            for i in range(num_records):
+                record.write(f'shard{shard}_{i}\t{shard}'.encode('utf-8'))
+            record.close()
+
+    def test_dataset(self, tmp_path):
+        self.set_up(tmp_path)
+        dataset = ShardedRecordFileDataset(
+            os.path.join(tmp_path, 'part-*.rec')
+        )
+        assert len(dataset) == 6
+        assert dataset[3] == 'shard1_0\t1'
+        assert dataset[-1] == 'shard2_1\t2'
+        assert dataset.read_batch([5, 0, 3]) == [
+            'shard2_1\t2', 'shard0_0\t0', 'shard1_0\t1'
+        ]
+        assert dataset.text_lengths.tolist() == [8] * 6
+
+    def test_shard(self, tmp_path):
+        self.set_up(tmp_path)
+        dataset = ShardedRecordFileDataset(
+            os.path.join(tmp_path, 'part-*.rec')
+        )
+        parts = [dataset.shard(2, i) for i in range(2)]
+        assert [len(part) for part in parts] == [3, 3]
+        assert parts[1].read_batch([0, 2]) == ['shard1_0\t1', 'shard2_1\t2']
+
+        nlp_dataset = SupervisedNLPDataset(dataset)
+        assert nlp_dataset.is_sharded
+        part = nlp_dataset.shard(2, 0)
+        assert len(part) == 3
+        assert part._vocab is nlp_dataset._vocab
+        assert part.text_lengths == [8] * 3
+
+    def test_manifest(self, tmp_path):
+        self.set_up(tmp_path)
+        manifest_file = os.path.join(tmp_path, 'part.manifest.json')
+        with open(manifest_file, 'w') as f:
+            f.write(json.dumps({'count': 6, 'shards': [
+                {'file': f'part-{i}.rec', 'count': count, 'start': start}
+                for i, (count, start) in enumerate([(3, 0), (1, 3), (2, 4)])
+            ]}))
+        dataset = ShardedRecordFileDataset(manifest_file)
+        assert len(dataset) == 6
+        assert dataset[4] == 'shard2_0\t2'
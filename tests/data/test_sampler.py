@@ -1,4 +1,6 @@
-from sknlp.data.sampler import SequentialSampler, BucketSampler, BatchSampler
+from sknlp.data.sampler import (
+    SequentialSampler, BucketSampler, BatchSampler, StreamBatchSampler
+)
 
 
 class TestSequentialSampler:
@@ -75,3 +77,33 @@ class TestBatchSampler:
         assert(
             [batch for batch in sampler] == [[9, 0, 1], [2, 3, 4], [5, 6, 7]]
         )
+
+
+class TestStreamBatchSampler:
+
+    data = list(range(10))
+
+    def test_sequential(self):
+        sampler = StreamBatchSampler(self.data, 3, shuffle=False)
+        assert sampler.batch_size == 3
+        assert (
+            [batch for batch in sampler] ==
+            [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+        )
+
+    def test_bucket_in_buffer(self):
+        data = [[0] * n for n in (5, 1, 4, 2, 5, 1, 4, 2)]
+        sampler = StreamBatchSampler(
+            data, 2, buffer_size=4, last_batch='discard'
+        )
+        batches = [batch for batch in sampler]
+        assert len(batches) == 4
+        assert sorted(
+            sorted(len(sample) for sample in batch) for batch in batches
+        ) == [[1, 2], [1, 2], [4, 5], [4, 5]]
+
+    def test_multi_parts(self):
+        sampler = StreamBatchSampler(
+            self.data, 2, shuffle=False, num_parts=2, part_index=1
+        )
+        assert [batch for batch in sampler] == [[1, 3], [5, 7], [9]]
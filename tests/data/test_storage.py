@@ -0,0 +1,186 @@
+import os
+
+from sknlp.data import (
+    SimpleIndexedRecordIO, BlockCompressedRecordIO, LocalStorageClient,
+    BlockCache, RemoteRecordFileDataset
+)
+
+
+class CountingClient(LocalStorageClient):
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.ranges = []
+
+    def read_range(self, path, start, end):
+        self.ranges.append((path, start, end))
+        return super().read_range(path, start, end)
+
+
+class TestBlockCache:
+
+    def test_read_range(self, tmp_path):
+        data = bytes(range(256)) * 4
+        with open(os.path.join(tmp_path, 'blob'), 'wb') as f:
+            f.write(data)
+        client = CountingClient(str(tmp_path))
+        cache = BlockCache(
+            client, 'blob', os.path.join(tmp_path, 'cache'),
+            block_size=100, read_ahead=0
+        )
+        assert cache.read_range(95, 205) == data[95:205]
+        assert cache.read_range(1000, 1024) == data[1000:1024]
+        assert len(client.ranges) == 4
+        # 已下载的块从磁盘读取
+        cache = BlockCache(
+            client, 'blob', os.path.join(tmp_path, 'cache'),
+            block_size=100, read_ahead=0
+        )
+        assert cache.read_range(150, 160) == data[150:160]
+        assert len(client.ranges) == 4
+
+    def test_evict(self, tmp_path):
+        with open(os.path.join(tmp_path, 'blob'), 'wb') as f:
+            f.write(b'x' * 1000)
+        cache = BlockCache(
+            LocalStorageClient(str(tmp_path)), 'blob',
+            os.path.join(tmp_path, 'cache'), block_size=100,
+            max_bytes=300, read_ahead=0
+        )
+        for start in range(0, 1000, 100):
+            cache.read_range(start, start + 100)
+        assert len(os.listdir(cache.directory)) == 3
+
+    def test_evict_shared(self, tmp_path):
+        for name in ('a', 'b'):
+            with open(os.path.join(tmp_path, name), 'wb') as f:
+                f.write(b'x' * 500)
+        client = LocalStorageClient(str(tmp_path))
+        cache_dir = os.path.join(tmp_path, 'cache')
+        first = BlockCache(
+            client, 'a', cache_dir, block_size=100, max_bytes=300,
+            read_ahead=0
+        )
+        first.read_range(0, 300)
+        for block in range(3):
+            os.utime(first._block_path(block), (block, block))
+        # 已有的块计入占用, 预算限制整个缓存目录而不是单个文件
+        second = BlockCache(
+            client, 'b', cache_dir, block_size=100, max_bytes=300,
+            read_ahead=0
+        )
+        assert second._nbytes == 300
+        second.read_range(0, 200)
+        assert sum(size for _, size, _ in second._scan()) == 300
+        assert len(os.listdir(first.directory)) == 1
+        assert len(os.listdir(second.directory)) == 2
+
+    def test_rewritten(self, tmp_path):
+        path = os.path.join(tmp_path, 'blob')
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+        client = LocalStorageClient(str(tmp_path))
+        cache_dir = os.path.join(tmp_path, 'cache')
+        cache = BlockCache(client, 'blob', cache_dir, read_ahead=0)
+        assert cache.read_range(0, 3) == b'xxx'
+        # 大小相同的新内容不读取旧的缓存块
+        with open(path, 'wb') as f:
+            f.write(b'y' * 100)
+        os.utime(path, ns=(0, 0))
+        cache = BlockCache(client, 'blob', cache_dir, read_ahead=0)
+        assert cache.read_range(0, 3) == b'yyy'
+
+    def test_read_ahead(self, tmp_path):
+        with open(os.path.join(tmp_path, 'blob'), 'wb') as f:
+            f.write(b'x' * 1000)
+        client = CountingClient(str(tmp_path))
+        cache = BlockCache(
+            client, 'blob', os.path.join(tmp_path, 'cache'),
+            block_size=100, read_ahead=2
+        )
+        cache.read_range(0, 10)
+        for future in list(cache._pending.values()):
+            future.result()
+        assert sorted(start for _, start, _ in client.ranges) == [
+            0, 100, 200
+        ]
+        assert cache.read_range(100, 110) == b'x' * 10
+
+    def test_read_ahead_jump(self, tmp_path):
+        with open(os.path.join(tmp_path, 'blob'), 'wb') as f:
+            f.write(b'x' * 1000)
+        cache = BlockCache(
+            LocalStorageClient(str(tmp_path)), 'blob',
+            os.path.join(tmp_path, 'cache'), block_size=100, read_ahead=2
+        )
+        cache.read_range(0, 10)
+        cache.read_range(800, 810)
+        cache._executor.shutdown(wait=True)
+        # 预取的块只写入磁盘, 顺序读取中断后不在内存中保留
+        assert not cache._pending
+        assert len(cache._memory) == 2
+        assert os.path.exists(cache._block_path(2))
+
+
+class TestRemoteRecordFileDataset:
+
+    def write(self, tmp_path, rec_file, writer_cls, **kwargs):
+        writer = writer_cls(
+            os.path.join(tmp_path, 'tmp.idx'),
+            os.path.join(tmp_path, rec_file), 'w', **kwargs
+        )
+        for i in range(50):
+            writer.write(f'record_{i}\t{i}'.encode('utf-8'))
+        writer.close()
+
+    def test_dataset(self, tmp_path):
+        self.write(tmp_path, 'tmp.rec', SimpleIndexedRecordIO)
+        dataset = RemoteRecordFileDataset(
+            'tmp.rec', LocalStorageClient(str(tmp_path)),
+            os.path.join(tmp_path, 'cache'), block_size=64
+        )
+        assert len(dataset) == 50
+        assert dataset[7] == 'record_7\t7'
+        assert dataset.read_batch([30, 2, 49]) == [
+            'record_30\t30', 'record_2\t2', 'record_49\t49'
+        ]
+        assert dataset.text_lengths[10] == len('record_10')
+        assert RemoteRecordFileDataset.count(
+            'tmp.rec', LocalStorageClient(str(tmp_path)),
+            os.path.join(tmp_path, 'cache')
+        ) == 50
+
+    def test_rewritten(self, tmp_path):
+        self.write(tmp_path, 'tmp.rec', SimpleIndexedRecordIO)
+        client = LocalStorageClient(str(tmp_path))
+        cache_dir = os.path.join(tmp_path, 'cache')
+        dataset = RemoteRecordFileDataset('tmp.rec', client, cache_dir)
+        assert dataset[7] == 'record_7\t7'
+        writer = SimpleIndexedRecordIO(
+            os.path.join(tmp_path, 'tmp.idx'),
+            os.path.join(tmp_path, 'tmp.rec'), 'w'
+        )
+        for i in range(50):
+            writer.write(f'RECORD_{i}\t{i}'.encode('utf-8'))
+        writer.close()
+        for name in ('tmp.idx', 'tmp.rec'):
+            os.utime(os.path.join(tmp_path, name), ns=(0, 0))
+        dataset = RemoteRecordFileDataset('tmp.rec', client, cache_dir)
+        assert dataset[7] == 'RECORD_7\t7'
+
+    def test_compressed_dataset(self, tmp_path):
+        self.write(
+            tmp_path, 'tmp.crec', BlockCompressedRecordIO, block_size=8
+        )
+        dataset = RemoteRecordFileDataset(
+            'tmp.crec', LocalStorageClient(str(tmp_path)),
+            os.path.join(tmp_path, 'cache'), block_size=64
+        )
+        assert len(dataset) == 50
+        assert dataset.read_batch([30, 2, 49]) == [
+            'record_30\t30', 'record_2\t2', 'record_49\t49'
+        ]
+        assert RemoteRecordFileDataset.count(
+            'tmp.crec', LocalStorageClient(str(tmp_path)),
+            os.path.join(tmp_path, 'cache')
+        ) == 50
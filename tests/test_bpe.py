@@ -0,0 +1,44 @@
+import pickle
+
+from sknlp.bpe import BPE
+from sknlp.data import ColumnarDataset
+from sknlp.segmenter import Segmenter
+
+
+class TestBPE:
+
+    texts = ['低价好评 低价', '好评如潮, 低价', '价格低']
+
+    def test_train(self):
+        bpe = BPE.train(self.texts, vocab_size=11)
+        assert bpe.merges == [('低', '价'), ('好', '评')]
+        assert bpe.encode('低价好评!') == ['低价', '好评', '!']
+        assert bpe.encode('价格低') == ['价', '格', '低']
+        assert bpe.encode_batch(['低价', '好']) == [['低价'], ['好']]
+        bpe = BPE.train(self.texts, vocab_size=11, min_freq=1)
+        assert len(bpe.merges) == 11 - len(set(''.join(self.texts)) - {' '})
+
+    def test_min_freq(self):
+        bpe = BPE.train(self.texts, vocab_size=100, min_freq=3)
+        assert bpe.merges == [('低', '价')]
+
+    def test_config(self):
+        bpe = BPE.train(self.texts, vocab_size=11)
+        restored = BPE.from_config(bpe.to_config())
+        assert restored.merges == bpe.merges
+        assert pickle.loads(pickle.dumps(bpe)).encode('低价好评') == [
+            '低价', '好评'
+        ]
+
+
+class TestSegmenter:
+
+    def test_train_bpe(self):
+        dataset = ColumnarDataset(['低价好评', '低价'], ['1', '2'])
+        segmenter = Segmenter.train_bpe(dataset, vocab_size=5)
+        assert segmenter.cut('低价好评') == ['低价', '好', '评']
+        restored = Segmenter(segmenter.config)
+        assert restored.method == 'bpe'
+        assert restored.cut('低价好评') == ['低价', '好', '评']
+        assert Segmenter('space').config == 'space'
+        assert Segmenter().config == 'char'
@@ -0,0 +1,35 @@
+from collections import Counter
+
+from sknlp.maxmatch import MaxMatch
+from sknlp.segmenter import Segmenter
+from sknlp.vocab import Vocab
+
+
+class TestMaxMatch:
+
+    tokens = ['研究', '研究生', '生命', '命', '起源']
+
+    def test_forward(self):
+        matcher = MaxMatch(self.tokens)
+        assert matcher.cut('研究生命起源x') == [
+            '研究生', '命', '起源', 'x'
+        ]
+
+    def test_backward(self):
+        matcher = MaxMatch(self.tokens, direction='backward')
+        assert matcher.cut('研究生命起源') == ['研究', '生命', '起源']
+
+    def test_bidirectional(self):
+        matcher = MaxMatch(self.tokens, direction='bidirectional')
+        assert matcher.cut('研究生命起源') == ['研究', '生命', '起源']
+        assert matcher.cut('') == []
+
+    def test_segmenter(self):
+        vocab = Vocab(Counter(self.tokens))
+        config = {'method': 'maxmatch', 'direction': 'backward'}
+        segmenter = Segmenter(config, vocab=vocab)
+        assert segmenter.config == config
+        assert segmenter.cut('研究生命') == ['研究', '生命']
+        assert Segmenter('maxmatch', vocab=vocab).cut('研究生命') == [
+            '研究生', '命'
+        ]
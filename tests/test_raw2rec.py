@@ -0,0 +1,131 @@
+import json
+import os
+
+import pytest
+from click.testing import CliRunner
+
+import raw2rec
+from raw2rec import (
+    convert_shard, read_columns, read_lines, read_records, split_file
+)
+from sknlp.data import RecordFileDataset, ShardedRecordFileDataset
+
+
+WAIMAI = (
+    'label,review\n'
+    '1,"好吃\n下次还点"\n'
+    '0,太慢了\n'
+    '1,"他说""不错"""\n'
+    '0\n'
+)
+
+
+def write(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return str(path)
+
+
+class TestSplitFile:
+
+    def test_lines(self, tmp_path):
+        filename = write(tmp_path / 'a.txt', 'ab\ncd\n\nefg\nh')
+        for num_shards in range(1, 8):
+            ranges = split_file(filename, num_shards)
+            assert len(ranges) == num_shards
+            assert ranges[0][0] == 0
+            assert ranges[-1][1] == os.path.getsize(filename)
+            assert all(s == e for (_, e), (s, _) in zip(ranges, ranges[1:]))
+            # 每个范围都从行首开始, 所有范围合起来每行恰好读到一次
+            assert [
+                line for start, end in ranges
+                for line in read_lines(filename, start, end)
+            ] == ['ab\n', 'cd\n', '\n', 'efg\n', 'h']
+
+    def test_quoted_newline(self, tmp_path):
+        filename = write(tmp_path / 'waimai.csv', WAIMAI)
+        columns = read_columns(filename, ',', ('label', 'review'))
+        expected = ['好吃\n下次还点\t1', '太慢了\t0', '他说"不错"\t1', '\t0']
+        for num_shards in range(1, 10):
+            ranges = split_file(filename, num_shards, ',', header=True)
+            assert len(ranges) == num_shards
+            assert ranges[0][0] == len('label,review\n')
+            assert [
+                record for start, end in ranges
+                for record in read_records(
+                    filename, 'waimai', start, end, columns
+                )
+            ] == expected
+
+    def test_columns(self, tmp_path):
+        filename = write(
+            tmp_path / 'intent.tsv', '\ufeffid\tintent\ttext\n1\tnonsense\t嗯\n2\n'
+        )
+        columns = read_columns(filename, '\t', ('text', 'intent'))
+        assert columns == [2, 1]
+        (start, end), = split_file(filename, 1, '\t', header=True)
+        assert list(read_records(filename, 'intent', start, end, columns)) == [
+            '嗯\t', '\t'
+        ]
+        with pytest.raises(ValueError):
+            read_columns(filename, '\t', ('label', 'review'))
+
+
+class TestConvertShard:
+
+    def task(self, tmp_path, test_ratio=0.0, seed='0:0'):
+        filename = write(tmp_path / 'a.tsv', 'a\t1\nb\t2\nc\t3\nd\t4\n')
+        prefixes = ['out'] if test_ratio == 0 else ['train', 'test']
+        outputs = [
+            (str(tmp_path / f'{p}.rec'), str(tmp_path / f'{p}.idx'))
+            for p in prefixes
+        ]
+        return (
+            filename, 'tsv', 0, os.path.getsize(filename), outputs, None,
+            None, test_ratio, seed
+        )
+
+    def test_resume(self, tmp_path, monkeypatch):
+        task = self.task(tmp_path)
+        # 上次转换中断时留下的临时文件被覆盖
+        write(tmp_path / 'out.rec.tmp', 'garbage')
+        assert convert_shard(task) == [(str(tmp_path / 'out.rec'), 4)]
+        assert not os.path.exists(tmp_path / 'out.rec.tmp')
+        dataset = RecordFileDataset(str(tmp_path / 'out.rec'))
+        assert [dataset[i] for i in range(4)] == [
+            'a\t1', 'b\t2', 'c\t3', 'd\t4'
+        ]
+
+        def read_records(*args):
+            raise AssertionError('converted again')
+
+        monkeypatch.setattr(raw2rec, 'read_records', read_records)
+        assert convert_shard(task) == [(str(tmp_path / 'out.rec'), 4)]
+
+    def test_test_ratio(self, tmp_path):
+        task = self.task(tmp_path, test_ratio=0.5)
+        (_, train_count), (_, test_count) = convert_shard(task)
+        assert train_count + test_count == 4
+        train = RecordFileDataset(str(tmp_path / 'train.rec'))
+        test = RecordFileDataset(str(tmp_path / 'test.rec'))
+        assert sorted(
+            [train[i] for i in range(len(train))]
+            + [test[i] for i in range(len(test))]
+        ) == ['a\t1', 'b\t2', 'c\t3', 'd\t4']
+
+
+def test_cli(tmp_path):
+    filename = write(tmp_path / 'waimai.csv', WAIMAI)
+    prefix = str(tmp_path / 'out' / 'waimai')
+    result = CliRunner().invoke(raw2rec.raw2rec, [
+        filename, prefix, '--format', 'waimai', '--num-shards', '2',
+        '--n-jobs', '1'
+    ])
+    assert result.exit_code == 0, result.output
+    counts = []
+    for split in ('train', 'test'):
+        with open(f'{prefix}-{split}.manifest.json') as f:
+            counts.append(json.loads(f.read())['count'])
+        dataset = ShardedRecordFileDataset(f'{prefix}-{split}.manifest.json')
+        assert len(dataset) == counts[-1]
+    assert sum(counts) == 4
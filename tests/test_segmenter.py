@@ -0,0 +1,75 @@
+import os
+import threading
+
+from sknlp.segmenter import Segmenter
+
+
+class TestSegmenter:
+
+    def test_cache(self, tmp_path):
+        segmenter = Segmenter('space', cache_size=2)
+        assert segmenter.cut('a b') == ['a', 'b']
+        segmenter.cut('a b').append('c')
+        assert segmenter.cut('a b') == ['a', 'b']
+        segmenter.cut('c')
+        segmenter.cut('d')
+        info = segmenter.cache_info()
+        assert (info['hits'], info['misses'], info['size']) == (2, 3, 2)
+
+        cache_file = os.path.join(tmp_path, 'cut.json')
+        segmenter.save_cache(cache_file)
+        restored = Segmenter('space', cache_size=1, cache_file=cache_file)
+        assert restored.cache_info()['size'] == 1
+        assert restored.cut('d') == ['d']
+        assert restored.cache_info()['hits'] == 1
+
+    def test_cache_file_mismatch(self, tmp_path):
+        cache_file = os.path.join(tmp_path, 'cut.json')
+        segmenter = Segmenter('space', cache_size=10)
+        segmenter.cut('a b')
+        segmenter.save_cache(cache_file)
+        restored = Segmenter(cache_size=10, cache_file=cache_file)
+        assert restored.cache_info()['size'] == 0
+        assert restored.cut('a b') == ['a', ' ', 'b']
+
+    def test_threads(self):
+        segmenter = Segmenter('space', cache_size=4)
+        texts = [f'{i} {i + 1}' for i in range(50)]
+        errors = []
+
+        def cut():
+            try:
+                for _ in range(20):
+                    for text in texts:
+                        assert segmenter.cut(text) == text.split()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=cut) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert segmenter.cache_info()['size'] == 4
+
+    def test_no_cache(self):
+        segmenter = Segmenter()
+        assert segmenter.cut('你好') == ['你', '好']
+        assert segmenter.cache_info()['misses'] == 0
+
+    def test_cut_batch(self):
+        segmenter = Segmenter('space', cache_size=100)
+        segmenter.MIN_PARALLEL_TEXTS = 2
+        texts = ['a b', 'c', 'a b', 'd e f'] * 3
+        try:
+            assert segmenter.cut_batch(texts, n_jobs=2, chunk_size=2) == [
+                text.split() for text in texts
+            ]
+            info = segmenter.cache_info()
+            assert (info['hits'], info['misses']) == (9, 3)
+            assert segmenter.cut_batch(['c', 'g h'], n_jobs=2) == [
+                ['c'], ['g', 'h']
+            ]
+        finally:
+            segmenter.close()
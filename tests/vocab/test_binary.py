@@ -0,0 +1,73 @@
+import os
+import pickle
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from sknlp.vocab import Vocab, MMapVocab
+
+
+class TestMMapVocab:
+
+    def build(self, tmp_path):
+        vocab = Vocab(Counter(['大', '大', '好', 'abc', '', 'x\ty']))
+        path = os.path.join(tmp_path, 'vocab.bin')
+        MMapVocab.save(vocab, path)
+        return vocab, MMapVocab(path)
+
+    def test_lookup(self, tmp_path):
+        vocab, mmap_vocab = self.build(tmp_path)
+        assert len(mmap_vocab) == len(vocab)
+        assert list(mmap_vocab.idx_to_token) == vocab.idx_to_token
+        tokens = ['大', '好', 'abc', '', 'x\ty', '<pad>', '不存在']
+        assert mmap_vocab[tokens] == vocab[tokens]
+        assert mmap_vocab['不存在'] == vocab[vocab.unknown_token]
+        assert mmap_vocab.to_tokens([4, 0]) == vocab.to_tokens([4, 0])
+        assert '好' in mmap_vocab and '不存在' not in mmap_vocab
+        assert mmap_vocab.token_to_idx['abc'] == vocab.token_to_idx['abc']
+        with pytest.raises(KeyError):
+            mmap_vocab.token_to_idx['不存在']
+        assert mmap_vocab.padding_token == vocab.padding_token
+        assert mmap_vocab.bos_token == vocab.bos_token
+
+    def test_lookup_batch(self, tmp_path):
+        vocab, mmap_vocab = self.build(tmp_path)
+        token_lists = [['大', '好'], [], ['abc', '不存在', '大']]
+        ids, offsets = mmap_vocab.lookup_batch(token_lists)
+        assert ids.dtype == np.int32
+        assert offsets.tolist() == [0, 2, 2, 5]
+        assert ids.tolist() == [i for t in token_lists for i in vocab[t]]
+
+    def test_json_and_pickle(self, tmp_path):
+        vocab, mmap_vocab = self.build(tmp_path)
+        restored = Vocab.from_json(mmap_vocab.to_json())
+        assert restored.idx_to_token == vocab.idx_to_token
+        assert restored.token_to_idx == vocab.token_to_idx
+        copied = pickle.loads(pickle.dumps(mmap_vocab))
+        assert copied[['好', 'abc']] == vocab[['好', 'abc']]
+
+    def test_oov_buckets(self, tmp_path):
+        vocab = Vocab(Counter('aaabbc'), max_size=2, num_buckets=3)
+        path = os.path.join(tmp_path, 'vocab.bin')
+        MMapVocab.save(vocab, path)
+        mmap_vocab = MMapVocab(path)
+        tokens = ['a', 'c', 'z', '不存在']
+        assert len(mmap_vocab) == len(vocab)
+        assert mmap_vocab[tokens] == vocab[tokens]
+        assert mmap_vocab.to_tokens(vocab[tokens]) == vocab.to_tokens(
+            vocab[tokens]
+        )
+        assert Vocab.from_json(mmap_vocab.to_json())[tokens] == vocab[tokens]
+        assert mmap_vocab.pad_batch([tokens, ['a']])[0].tolist() == (
+            vocab.pad_batch([tokens, ['a']])[0].tolist()
+        )
+
+    def test_digest(self, tmp_path):
+        vocab, mmap_vocab = self.build(tmp_path)
+        assert mmap_vocab.digest() == vocab.digest()
+        assert vocab.digest() == Vocab.from_json(vocab.to_json()).digest()
+        assert vocab.digest() != Vocab(Counter(['大', '好'])).digest()
+        assert vocab.digest() != Vocab(
+            Counter(['大', '大', '好', 'abc', '', 'x\ty']), num_buckets=2
+        ).digest()
@@ -0,0 +1,47 @@
+from collections import Counter
+
+import numpy as np
+
+from sknlp.vocab import Vocab, MMapVocab, CharTable
+
+
+class TestCharTable:
+
+    text = '大家好😀, 𠀀好'
+    vocab = Vocab(Counter('大家好好😀'))
+
+    def test_encode(self):
+        table = CharTable(self.vocab)
+        ids = table.encode(self.text)
+        assert ids.dtype == np.int32
+        assert ids.tolist() == self.vocab[list(self.text)]
+
+    def test_lone_surrogate(self):
+        text = 'a\ud800b\udfff大'
+        table = CharTable(self.vocab)
+        assert table.encode(text).tolist() == self.vocab[list(text)]
+        table = CharTable(Vocab(Counter('大家'), num_buckets=3))
+        assert table.encode('\ud800').tolist() == [0]
+
+    def test_oov_buckets(self, tmp_path):
+        vocab = Vocab(Counter('大家好好'), num_buckets=3)
+        path = tmp_path / 'vocab.bin'
+        MMapVocab.save(vocab, str(path))
+        for v in (vocab, MMapVocab(str(path))):
+            table = CharTable(v)
+            assert table.encode(self.text).tolist() == vocab[list(self.text)]
+
+    def test_batch(self):
+        table = CharTable(self.vocab)
+        texts = ['大家好', '', '好😀']
+        ids, offsets = table.lookup_batch(texts)
+        assert offsets.tolist() == [0, 3, 3, 5]
+        assert ids.tolist() == self.vocab[list('大家好好😀')]
+        assert [a.tolist() for a in table.split_batch(texts, 2)] == [
+            self.vocab[list('大家')], [], self.vocab[list('好😀')]
+        ]
+        matrix, lengths = table.pad_batch(texts, pad_val=1, max_length=2)
+        assert lengths.tolist() == [2, 0, 2]
+        assert matrix.tolist() == [
+            self.vocab[list('大家')], [1, 1], self.vocab[list('好😀')]
+        ]
@@ -0,0 +1,54 @@
+from collections import Counter
+
+import numpy as np
+
+from sknlp.vocab import TokenSketch
+
+
+class TestTokenSketch:
+
+    def corpus(self):
+        rng = np.random.RandomState(0)
+        heavy = ['a'] * 500 + ['b'] * 300 + ['c'] * 200
+        tail = [f't{i}' for i in rng.randint(0, 2000, size=1000)]
+        tokens = heavy + tail
+        rng.shuffle(tokens)
+        return tokens
+
+    def test_exact_without_pruning(self):
+        sketch = TokenSketch(10)
+        sketch.update(['a', 'b', 'a'])
+        sketch.update(Counter({'c': 2}))
+        assert sketch.error == 0
+        assert sketch.counter() == Counter({'a': 2, 'c': 2, 'b': 1})
+        assert sketch.counter(top_k=1) == Counter({'a': 2})
+        assert sketch.counter(min_freq=2) == Counter({'a': 2, 'c': 2})
+
+    def test_heavy_hitters(self):
+        tokens = self.corpus()
+        exact = Counter(tokens)
+        sketch = TokenSketch(20)
+        for i in range(0, len(tokens), 10):
+            sketch.update(tokens[i:i + 10])
+        assert len(sketch) <= 40
+        assert sketch.total == len(tokens)
+        assert sketch.error <= len(tokens) / 21
+        for token, count in sketch.most_common():
+            assert exact[token] - sketch.error <= count <= exact[token]
+        assert [token for token, _ in sketch.most_common(3)] == [
+            'a', 'b', 'c'
+        ]
+
+    def test_merge(self):
+        tokens = self.corpus()
+        exact = Counter(tokens)
+        merged = TokenSketch(20)
+        for i in range(4):
+            sketch = TokenSketch(20)
+            sketch.update(tokens[i::4])
+            merged.update(sketch)
+        assert merged.total == len(tokens)
+        assert len(merged) <= 40
+        for token in ('a', 'b', 'c'):
+            assert exact[token] - merged.error <= merged[token]
+            assert merged[token] <= exact[token]
@@ -0,0 +1,52 @@
+from collections import Counter
+
+import numpy as np
+
+from sknlp.vocab import Vocab
+
+
+class TestVocab:
+
+    counter = Counter('aaabbc')
+
+    def test_budget(self):
+        vocab = Vocab(self.counter, max_size=2)
+        assert vocab.idx_to_token[4:] == ['a', 'b']
+        vocab = Vocab(self.counter, min_freq=2)
+        assert vocab.idx_to_token[4:] == ['a', 'b']
+        assert vocab['c'] == vocab[vocab.unknown_token]
+
+    def test_oov_buckets(self):
+        vocab = Vocab(self.counter, max_size=2, num_buckets=3)
+        assert len(vocab) == 9
+        ids = vocab[['a', 'c', 'z', 'c']]
+        assert ids[0] == 4
+        assert all(6 <= i < 9 for i in ids[1:])
+        assert ids[1] == ids[3]
+        assert vocab.to_tokens(ids) == ['a', '<unk>', '<unk>', '<unk>']
+
+    def test_json(self):
+        vocab = Vocab(self.counter, max_size=2, num_buckets=3)
+        restored = Vocab.from_json(vocab.to_json())
+        assert len(restored) == len(vocab)
+        assert restored[['a', 'c', 'z']] == vocab[['a', 'c', 'z']]
+        assert 'num_buckets' not in Vocab(self.counter).to_json()
+
+    def test_lookup_batch(self):
+        vocab = Vocab(self.counter, max_size=2, num_buckets=3)
+        token_lists = [['a', 'c'], [], ['b', 'z', 'a']]
+        ids, offsets = vocab.lookup_batch(token_lists)
+        assert ids.dtype == np.int32
+        assert offsets.tolist() == [0, 2, 2, 5]
+        assert ids.tolist() == vocab[['a', 'c', 'b', 'z', 'a']]
+        assert Vocab(self.counter).lookup_batch(token_lists)[0].tolist() == [
+            4, 6, 5, 0, 4
+        ]
+
+    def test_pad_batch(self):
+        vocab = Vocab(self.counter)
+        matrix, lengths = vocab.pad_batch([['a', 'b'], ['c']])
+        assert matrix.tolist() == [[4, 5], [6, 1]]
+        assert lengths.tolist() == [2, 1]
+        matrix, _ = vocab.pad_batch([['a', 'b'], ['c']], time_major=True)
+        assert matrix.tolist() == [[4, 6], [5, 1]]
@@ -0,0 +1,87 @@
+from collections import Counter
+import os
+
+import mxnet as mx
+import numpy as np
+
+from sknlp.embedding import Token2vec
+from sknlp.vocab import Vocab, load_word2vec
+
+
+tokens = ['的', '好', '<unk>', '不错', '的']
+vectors = np.arange(15, dtype=np.float32).reshape((5, 3)) / 10
+
+
+def write_word2vec(path, binary, tokens=tokens, vectors=vectors):
+    with open(path, 'wb') as f:
+        f.write(f'{len(tokens)} 3\n'.encode('utf-8'))
+        for token, vector in zip(tokens, vectors):
+            f.write(token.encode('utf-8') + b' ')
+            if binary:
+                f.write(vector.astype('<f4').tobytes() + b'\n')
+            else:
+                f.write(' '.join(map(str, vector)).encode('utf-8') + b'\n')
+
+
+class TestLoadWord2vec:
+
+    def test_vocab(self, tmp_path):
+        vocab = Vocab(Counter(['好', '差', '不错']), num_buckets=2)
+        for binary in (True, False):
+            path = os.path.join(tmp_path, 'w2v')
+            write_word2vec(path, binary)
+            _, weight = load_word2vec(
+                path, os.path.join(tmp_path, 'embed.npy'), vocab=vocab,
+                binary=binary
+            )
+            assert isinstance(weight, np.memmap)
+            assert weight.shape == (len(vocab), 3)
+            np.testing.assert_allclose(weight[vocab['好']], vectors[1])
+            np.testing.assert_allclose(weight[vocab['不错']], vectors[3])
+            np.testing.assert_allclose(weight[0], vectors[2])
+            assert not weight[vocab['差']].any()
+
+    def test_repeated_token(self, tmp_path):
+        repeated = ['<unk>', '<pad>', '<bos>', '<eos>', 'a', 'a', 'b']
+        repeated_vectors = np.arange(21, dtype=np.float32).reshape((7, 3))
+        vocab = Vocab(Counter(['a', 'b']))
+        path = os.path.join(tmp_path, 'w2v')
+        write_word2vec(path, True, repeated, repeated_vectors)
+        _, weight = load_word2vec(
+            path, os.path.join(tmp_path, 'embed.npy'), vocab=vocab
+        )
+        np.testing.assert_allclose(weight[vocab['a']], repeated_vectors[4])
+        np.testing.assert_allclose(weight[vocab['b']], repeated_vectors[6])
+
+    def test_early_exit(self, tmp_path):
+        vocab = Vocab(Counter(['好', '不错']))
+        path = os.path.join(tmp_path, 'w2v')
+        write_word2vec(path, True)
+        # 文件头的记录数多于实际行数, 读到文件末尾时报错
+        with open(path, 'r+b') as f:
+            f.write(b'6')
+        _, weight = load_word2vec(
+            path, os.path.join(tmp_path, 'embed.npy'), vocab=vocab
+        )
+        np.testing.assert_allclose(weight[vocab['不错']], vectors[3])
+        np.testing.assert_allclose(weight[0], vectors[2])
+
+    def test_top_n(self, tmp_path):
+        path = os.path.join(tmp_path, 'w2v')
+        write_word2vec(path, True)
+        vocab, weight = load_word2vec(
+            path, os.path.join(tmp_path, 'embed.npy'), top_n=3
+        )
+        assert vocab.idx_to_token[4:] == ['的', '好']
+        np.testing.assert_allclose(weight[4:], vectors[:2])
+        np.testing.assert_allclose(weight[0], vectors[2])
+
+    def test_token2vec(self, tmp_path):
+        path = os.path.join(tmp_path, 'w2v')
+        write_word2vec(path, False)
+        token2vec = Token2vec.from_word2vec(
+            path, os.path.join(tmp_path, 'embed.npy'), binary=False
+        )
+        token2vec._build(mx.cpu())
+        weight = token2vec.model.weight.data().asnumpy()
+        np.testing.assert_allclose(weight[4:7], vectors[[0, 1, 3]])